@@ -1,19 +1,126 @@
 import os
-from dotenv import load_dotenv
-from flask import Flask, g, json, jsonify, make_response
-from flask import render_template, request
-from database import Database
-import data_sync
-from apscheduler.schedulers.background import BackgroundScheduler
-from datetime import datetime
-import xml.etree.ElementTree as ET
+import hashlib
+import sqlite3
+from functools import wraps
+from itertools import chain
+from flask import Blueprint, Flask, current_app, g, json, jsonify
+from flask import make_response, render_template, request, send_file
+from flask import stream_with_context, url_for
+from database import ConnectionPool, Database, batched
+from database import RANKING_COLUMNS, VIOLATION_COLUMNS
+from database import load_database_settings
+import artifacts
+from artifacts import iter_establishments_xml
+import metrics
+from events import EVENT_STREAM_MIMETYPE, EventBroadcaster
+from events import load_events_settings, parse_event_id
+import settings
+from settings import SYNC_HOUR, SYNC_MINUTE
+from suggestions import DEFAULT_SUGGESTIONS, MAX_SUGGESTIONS
+from suggestions import SuggestionIndex
+from datetime import datetime, timedelta
 
-load_dotenv()
+# Routes de l'application, enregistrées par create_app(). La
+# synchronisation (data_sync), les notifications et APScheduler ne sont
+# importés que si l'application web s'en charge (sync.run_in_web) : un
+# worker qui ne fait que servir les requêtes ne les charge jamais.
+bp = Blueprint('main', __name__)
 
-app = Flask(__name__, static_url_path='', static_folder='static')
+# Pagination par curseur de /contrevenants et des résultats de recherche
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+SEARCH_PAGE_SIZE = 50
 
+# Réponses JSON diffusées par blocs de lignes, dans l'un des formats
+# demandés par le client (voir response_format())
+NDJSON_MIMETYPE = 'application/x-ndjson'
+FORMAT_JSON = 'json'
+FORMAT_NDJSON = 'ndjson'
+FORMAT_COLUMNAR = 'colonnes'
+STREAM_BATCH_SIZE = 500
 
-@app.template_filter('format_date')
+
+def create_app(config=None):
+    """
+    Crée l'application web. L'import du module n'a aucun effet : la
+    configuration est lue, le pool de connexions créé et, si
+    sync.run_in_web est vrai, la synchronisation planifiée et l'envoi des
+    notifications démarrés ici seulement.
+
+    :param config: Configuration (settings.load_config() par défaut)
+    :return: Application Flask
+    """
+    if config is None:
+        config = settings.load_config()
+    app = Flask(__name__, static_url_path='', static_folder='static')
+    sync_settings = settings.load_sync_settings(config)
+    db_settings = load_database_settings()
+    app.config['SYNC_SETTINGS'] = sync_settings
+    app.config['DATABASE_SETTINGS'] = db_settings
+    # Les connexions de lecture (query_only) ne peuvent pas créer les
+    # tables et colonnes ajoutées depuis la création de la base
+    upgrade_schema(db_settings)
+
+    # Durée, statut et taille de chaque réponse et durée des méthodes de
+    # Database, exposées au format Prometheus sur /metrics
+    metrics_settings = metrics.load_metrics_settings(config)
+    app.config['METRICS_SETTINGS'] = metrics_settings
+    metrics.configure(metrics_settings)
+    if metrics_settings['enabled']:
+        app.wsgi_app = metrics.WsgiMetrics(app.wsgi_app)
+
+    # Connexions en lecture partagées par les requêtes (voir config.yaml)
+    app.extensions['db_pool'] = ConnectionPool(
+        db_settings['path'],
+        size=db_settings['pool_size'],
+        pragmas=db_settings['read_pragmas'],
+        timeout=db_settings['pool_timeout'])
+    # Noms d'établissements de l'autocomplétion, reconstruits à chaque
+    # nouvelle version du jeu de données
+    app.extensions['suggestion_index'] = SuggestionIndex()
+    # Flux /evenements : un thread par processus, démarré au premier
+    # abonné, diffuse les nouvelles violations à tous les abonnés
+    events_settings = load_events_settings(config)
+    if events_settings['enabled']:
+        app.extensions['event_broadcaster'] = EventBroadcaster(
+            db_settings['path'], events_settings,
+            pragmas=db_settings['read_pragmas'])
+
+    app.register_blueprint(bp)
+    app.teardown_appcontext(close_connection)
+
+    # La synchronisation et l'envoi des notifications peuvent être
+    # confiés à un processus dédié (sync.run_in_web: false dans
+    # config.yaml)
+    if sync_settings['run_in_web']:
+        init_outbox_worker(app, config)
+        init_scheduler(app)
+    else:
+        print("Synchronisation déléguée à un processus dédié "
+              "(python data_sync.py --daemon).")
+    return app
+
+
+def upgrade_schema(db_settings):
+    """
+    Met à niveau le schéma d'une base créée par une version antérieure
+    (ex. base pré-remplie copiée sur le serveur) avant de servir les
+    requêtes. Sans effet si le schéma est à jour.
+
+    :param db_settings: Paramètres issus de load_database_settings()
+    """
+    db = Database.for_writing(db_settings)
+    try:
+        db.ensure_schema()
+    except (OSError, sqlite3.Error) as e:
+        print(f"ERREUR: Mise à niveau du schéma de '{db_settings['path']}' "
+              f"impossible : {e}. Les endpoints de l'API échoueront tant "
+              "que python data_sync.py n'aura pas été exécuté.")
+    finally:
+        db.close_connection()
+
+
+@bp.app_template_filter('format_date')
 def format_date_string(date_str):
     """
     Filtre pour formater une date string 'YYYYMMDD' en 'YYYY-MM-DD'.
@@ -31,14 +138,17 @@ def format_date_string(date_str):
         return date_str
 
 
-def init_scheduler():
-    global scheduler
+def init_scheduler(app):
+    from apscheduler.schedulers.background import BackgroundScheduler
     scheduler = BackgroundScheduler()
+    app.extensions['scheduler'] = scheduler
     if not scheduler.get_job('update_db'):
         print("Ajout de la tâche de synchronisation...")
         scheduler.add_job(update_db,
-                          'interval',
-                          days=1,
+                          'cron',
+                          args=[app],
+                          hour=SYNC_HOUR,
+                          minute=SYNC_MINUTE,
                           id='update_db',
                           replace_existing=True)
     if not scheduler.running:
@@ -46,46 +156,141 @@ def init_scheduler():
         scheduler.start()
 
 
-def update_db():
+def update_db(app):
+    import data_sync
     print("Début de la synchronisation des violations...")
     try:
-        data_sync.update_db()
-        print("Synchronisation terminée avec succès.")
+        # Un seul des processus web synchronise (voir data_sync.run_sync)
+        if data_sync.run_sync(app.config['SYNC_SETTINGS']):
+            print("Synchronisation terminée avec succès.")
     except Exception as e:
         print(f"Erreur lors de la synchronisation : {e}")
+    # Les notifications mises en file sont envoyées sans attendre
+    app.extensions['outbox_worker'].wake()
+    app.extensions['suggestion_index'].expire()
+    if 'event_broadcaster' in app.extensions:
+        app.extensions['event_broadcaster'].wake()
 
 
-init_scheduler()
+def init_outbox_worker(app, config):
+    from notifications import OutboxWorker
+    outbox_worker = OutboxWorker(config, app.config['DATABASE_SETTINGS'])
+    app.extensions['outbox_worker'] = outbox_worker
+    outbox_worker.start()
 
 
 def get_db():
     db = getattr(g, '_database', None)
     if db is None:
-        g._database = Database()
+        g._database = Database(
+            current_app.config['DATABASE_SETTINGS']['path'],
+            pool=current_app.extensions['db_pool'])
     return g._database
 
 
-@app.teardown_appcontext
+@bp.before_app_request
+def tag_request_route():
+    """
+    Transmet la route de la requête (ex. /infractions/<path:...>) au
+    middleware des métriques, pour regrouper les URL d'une même route.
+    """
+    if request.url_rule is not None:
+        request.environ[metrics.ROUTE_ENVIRON_KEY] = request.url_rule.rule
+
+
 def close_connection(exception):
     db = getattr(g, '_database', None)
     if db is not None:
         db.close_connection()
 
 
-@app.route('/', methods=['GET', 'POST'])
+def seconds_until_next_sync(now=None):
+    """
+    Calcule le nombre de secondes avant la prochaine synchronisation
+    planifiée (heure locale du serveur).
+    """
+    now = now or datetime.now()
+    next_sync = now.replace(hour=SYNC_HOUR, minute=SYNC_MINUTE,
+                            second=0, microsecond=0)
+    if next_sync <= now:
+        next_sync += timedelta(days=1)
+    return int((next_sync - now).total_seconds())
+
+
+def dataset_cached(view):
+    """
+    Décorateur des endpoints de l'API : ajoute aux réponses 200 un ETag
+    et un Last-Modified dérivés de la version du jeu de données et des
+    paramètres de la requête ainsi que la version elle-même
+    (X-Dataset-Version), et répond 304 sans exécuter la vue si le
+    client possède déjà cette version. Les réponses peuvent être mises
+    en cache jusqu'à la prochaine synchronisation planifiée.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        version, synced_at = get_db().get_dataset_version()
+        g.dataset_version = version
+        accept = request.headers.get('Accept', '')
+        accept_encoding = request.headers.get('Accept-Encoding', '')
+        etag = hashlib.sha1(
+            f"{version}:{request.full_path}:{accept}:{accept_encoding}"
+            .encode('utf-8')).hexdigest()
+
+        def add_cache_headers(response):
+            response.set_etag(etag)
+            # Version à passer à /changements?depuis= pour la suite
+            response.headers['X-Dataset-Version'] = str(version)
+            response.vary.add('Accept')
+            response.vary.add('Accept-Encoding')
+            if synced_at is not None:
+                response.last_modified = synced_at
+            response.cache_control.public = True
+            response.cache_control.max_age = seconds_until_next_sync()
+            return response
+
+        if request.if_none_match:
+            # Comparaison faible (RFC 9110) : un proxy qui compresse la
+            # réponse transmet l'ETag au client sous la forme W/"..."
+            not_modified = request.if_none_match.contains_weak(etag)
+        else:
+            not_modified = (synced_at is not None and
+                            request.if_modified_since is not None and
+                            synced_at.replace(microsecond=0) <=
+                            request.if_modified_since)
+        if not_modified:
+            return add_cache_headers(current_app.response_class(status=304))
+
+        response = make_response(view(*args, **kwargs))
+        if response.status_code == 200:
+            add_cache_headers(response)
+        return response
+    return wrapper
+
+
+@bp.route('/', methods=['GET', 'POST'])
 def index():
     db = get_db()
     error_search_violation = None
-    # Rechercher des contraventions
-    if request.method == 'POST':
-        search_type = request.form.get('search_type')
-        query = request.form.get('query')
+    # Rechercher des contraventions (GET : navigation entre les pages)
+    params = request.form if request.method == 'POST' else request.args
+    search_type = params.get('search_type')
+    query = params.get('query')
+    if request.method == 'POST' or search_type or query:
         if search_type and query and len(query) >= 3:
-            results = db.search_violation(search_type, query)
+            try:
+                results, next_cursor, previous_cursor = \
+                    db.search_violation_page(search_type, query,
+                                             SEARCH_PAGE_SIZE,
+                                             after=params.get('after'),
+                                             before=params.get('before'))
+            except ValueError:
+                results, next_cursor, previous_cursor = [], None, None
             return render_template('search_result.html',
                                    results=results,
                                    search_type=search_type,
-                                   query=query)
+                                   query=query,
+                                   next_cursor=next_cursor,
+                                   previous_cursor=previous_cursor)
         else:
             error_search_violation = """
             La recherche doit contenir au moins 3 caractères.
@@ -96,10 +301,149 @@ def index():
     return render_template("index.html", title="Accueil")
 
 
-@app.route('/contrevenants', methods=['GET'])
+def response_format():
+    """
+    Détermine le format de réponse demandé par le client :
+    - FORMAT_NDJSON : ?format=ndjson ou Accept: application/x-ndjson,
+      un objet JSON par ligne ;
+    - FORMAT_COLUMNAR : ?format=colonnes, un objet
+      {"columns": [...], "rows": [[...], ...]} où les noms des colonnes
+      ne sont pas répétés à chaque ligne ;
+    - FORMAT_JSON sinon : un tableau d'objets.
+    """
+    requested = request.args.get('format')
+    if requested in (FORMAT_NDJSON, FORMAT_COLUMNAR):
+        return requested
+    best = request.accept_mimetypes.best_match(['application/json',
+                                                NDJSON_MIMETYPE])
+    return FORMAT_NDJSON if best == NDJSON_MIMETYPE else FORMAT_JSON
+
+
+def json_stream_response(rows, output_format=FORMAT_JSON, columns=None):
+    """
+    Construit une réponse JSON diffusée au fur et à mesure de la lecture
+    des lignes, par blocs de STREAM_BATCH_SIZE : la mémoire utilisée et
+    le délai avant le premier octet ne dépendent pas de la taille du
+    résultat. En FORMAT_JSON, le corps est le même tableau JSON que
+    celui produit par json.dumps(list(rows)).
+    :param rows: Itérable de dictionnaires, ou de tuples dans l'ordre de
+    columns en FORMAT_COLUMNAR
+    :param output_format: Format de la réponse (voir response_format())
+    :param columns: Noms des colonnes, requis en FORMAT_COLUMNAR
+    :return: Réponse Flask diffusée
+    """
+    def generate():
+        if output_format == FORMAT_NDJSON:
+            for batch in batched(rows, STREAM_BATCH_SIZE):
+                yield "".join(json.dumps(row, ensure_ascii=False) + "\n"
+                              for row in batch)
+            return
+        if output_format == FORMAT_COLUMNAR:
+            opening = f'{{"columns": {json.dumps(list(columns))}, "rows": ['
+            closing = "]}"
+        else:
+            opening, closing = "[", "]"
+        separator = opening
+        for batch in batched(rows, STREAM_BATCH_SIZE):
+            yield separator + ", ".join(
+                json.dumps(row, ensure_ascii=False) for row in batch)
+            separator = ", "
+        yield (opening if separator == opening else "") + closing
+
+    if output_format == FORMAT_NDJSON:
+        mimetype = NDJSON_MIMETYPE
+    else:
+        mimetype = 'application/json'
+    # stream_with_context garde la connexion de la requête ouverte
+    # jusqu'à la fin de la diffusion
+    return current_app.response_class(
+        response=stream_with_context(generate()),
+        status=200,
+        mimetype=f'{mimetype}; charset=utf-8'
+    )
+
+
+def send_artifact(name, mimetype):
+    """
+    Sert, si elle existe, la réponse précalculée lors de la
+    synchronisation pour la version courante du jeu de données (voir
+    artifacts.build_artifacts()), dans l'encodage le mieux accepté par
+    le client : un simple envoi de fichier, sans sérialisation ni
+    compression à la requête.
+    :param name: Nom de l'artefact
+    :param mimetype: Type de contenu de la réponse
+    :return: Réponse Flask, ou None si l'artefact n'existe pas
+    """
+    version = g.get('dataset_version')
+    if not version:
+        return None
+    artifact = artifacts.find_artifact(
+        current_app.config['DATABASE_SETTINGS']['path'], version, name,
+        request.accept_encodings)
+    if artifact is None:
+        return None
+    path, encoding = artifact
+    # Un chemin relatif serait résolu par Flask depuis le dossier de
+    # l'application, et non depuis le dossier courant comme la base
+    response = send_file(os.path.abspath(path), mimetype=mimetype, etag=False,
+                         conditional=False, max_age=None)
+    # Les en-têtes de cache sont ceux de dataset_cached()
+    response.cache_control.no_cache = None
+    if encoding:
+        response.content_encoding = encoding
+    return response
+
+
+def get_page_arguments():
+    """
+    Lit les paramètres de pagination par curseur de la requête.
+    :return: Tuple (limit, after, before)
+    :raises ValueError: Si les paramètres sont invalides
+    """
+    after = request.args.get('after')
+    before = request.args.get('before')
+    if after and before:
+        raise ValueError("Les paramètres 'after' et 'before' "
+                         "sont mutuellement exclusifs.")
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE)
+    try:
+        limit = int(limit)
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError("Le paramètre 'limit' doit être un entier "
+                         f"entre 1 et {MAX_PAGE_SIZE}.")
+    return limit, after, before
+
+
+def page_links(next_cursor, previous_cursor):
+    """
+    Construit l'en-tête Link (RFC 8288) vers les pages voisines.
+    :return: Valeur de l'en-tête, ou None s'il n'y a qu'une page
+    """
+    links = []
+    for cursor, key, rel in ((next_cursor, 'after', 'next'),
+                             (previous_cursor, 'before', 'prev')):
+        if cursor:
+            args = request.args.to_dict()
+            args.pop('after', None)
+            args.pop('before', None)
+            args[key] = cursor
+            url = url_for(request.endpoint, _external=True,
+                          **request.view_args, **args)
+            links.append(f'<{url}>; rel="{rel}"')
+    return ", ".join(links) or None
+
+
+@bp.route('/contrevenants', methods=['GET'])
+@dataset_cached
 def get_contraventions():
     """
     API endpoint pour obtenir toutes les infractions pour une période donnée.
+    Si 'limit', 'after' ou 'before' est fourni, la réponse est paginée :
+    seule la page demandée est lue et l'en-tête Link donne les curseurs
+    des pages suivante et précédente. La réponse est diffusée, dans le
+    format demandé par le client (voir response_format()).
     :return: Liste d'infractions au format JSON
     """
     db = get_db()
@@ -108,25 +452,168 @@ def get_contraventions():
     is_valid, error_message = validate_date_period(start_date, end_date)
     if not is_valid:
         return jsonify({"error": error_message}), 400
-    results = db.get_violations_by_date(start_date, end_date)
-    # app.response_class gère l'encodage UTF-8 correctement
-    return app.response_class(
+    links = None
+    output_format = response_format()
+    columnar = output_format == FORMAT_COLUMNAR
+    if {'limit', 'after', 'before'} & request.args.keys():
+        try:
+            limit, after, before = get_page_arguments()
+            results, next_cursor, previous_cursor = \
+                db.get_violations_by_date_page(normalize_iso_date(start_date),
+                                               normalize_iso_date(end_date),
+                                               limit, after, before)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        links = page_links(next_cursor, previous_cursor)
+        if columnar:
+            results = [[row[column] for column in VIOLATION_COLUMNS]
+                       for row in results]
+    else:
+        if output_format == FORMAT_JSON:
+            # Les périodes récentes sont précalculées à la synchronisation
+            artifact = send_artifact(
+                artifacts.contraventions_artifact_name(
+                    normalize_iso_date(start_date),
+                    normalize_iso_date(end_date)),
+                'application/json; charset=utf-8')
+            if artifact is not None:
+                return artifact
+        results = db.iter_violations_by_date(normalize_iso_date(start_date),
+                                             normalize_iso_date(end_date),
+                                             columnar=columnar)
+    response = json_stream_response(results, output_format,
+                                    VIOLATION_COLUMNS)
+    if links:
+        response.headers['Link'] = links
+    return response
+
+
+@bp.route('/contrevenants/resume', methods=['GET'])
+@dataset_cached
+def get_contraventions_summary():
+    """
+    API endpoint pour obtenir, pour une période donnée, le nombre
+    d'infractions, le montant total et la date de la plus récente
+    infraction de chaque établissement.
+    :return: Liste d'établissements au format JSON
+    """
+    db = get_db()
+    start_date = request.args.get('du')
+    end_date = request.args.get('au')
+    is_valid, error_message = validate_date_period(start_date, end_date)
+    if not is_valid:
+        return jsonify({"error": error_message}), 400
+    results = db.get_violations_summary_by_date(normalize_iso_date(start_date),
+                                                normalize_iso_date(end_date))
+    return current_app.response_class(
         response=json.dumps(results, ensure_ascii=False),
         status=200,
         mimetype='application/json; charset=utf-8'
     )
 
 
-@app.route('/doc', methods=['GET'])
+@bp.route('/changements', methods=['GET'])
+@dataset_cached
+def get_changes():
+    """
+    API endpoint pour obtenir les modifications des contraventions
+    depuis une version du jeu de données (en-tête X-Dataset-Version des
+    réponses de l'API) : violations ajoutées et modifiées, IDs des
+    violations supprimées. Un client à jour n'a ainsi à télécharger que
+    les différences.
+    :return: Modifications au format JSON
+    """
+    try:
+        since = int(request.args.get('depuis', ''))
+    except ValueError:
+        since = -1
+    if since < 0:
+        return jsonify({"error": "Le paramètre 'depuis' doit être un "
+                        "numéro de version (entier positif)."}), 400
+    changes = get_db().get_changes_since(since)
+    if changes is None:
+        return jsonify({"error": "Les modifications antérieures à cette "
+                        "version ne sont plus disponibles : "
+                        "téléchargez à nouveau /contrevenants."}), 410
+    if since > changes['version']:
+        return jsonify({"error": f"Version {since} inconnue (version "
+                        f"courante : {changes['version']})."}), 400
+    return current_app.response_class(
+        response=json.dumps({
+            'depuis': since,
+            'version': changes['version'],
+            'ajouts': changes['inserted'],
+            'modifications': changes['updated'],
+            'suppressions': changes['deleted'],
+        }, ensure_ascii=False),
+        status=200,
+        mimetype='application/json; charset=utf-8'
+    )
+
+
+@bp.route('/evenements', methods=['GET'])
+def get_events():
+    """
+    Flux Server-Sent Events des nouvelles violations : un événement
+    'nouvelles_violations' par version du jeu de données qui en ajoute,
+    dont l'identifiant est la version. Un client qui se reconnecte
+    (en-tête Last-Event-ID, ou paramètre depuis) reçoit d'abord les
+    événements manqués.
+    :return: Flux text/event-stream
+    """
+    broadcaster = current_app.extensions.get('event_broadcaster')
+    if broadcaster is None:
+        return jsonify({"error": "Flux d'événements désactivé."}), 404
+    last_event_id = parse_event_id(request.headers.get('Last-Event-ID') or
+                                   request.args.get('depuis'))
+    subscriber = broadcaster.subscribe(last_event_id)
+    if subscriber is None:
+        response = jsonify({"error": "Trop d'abonnés au flux "
+                            "d'événements, réessayez plus tard."})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(
+            broadcaster.settings['retry_ms'] // 1000)
+        return response
+    response = current_app.response_class(broadcaster.stream(subscriber),
+                                          mimetype=EVENT_STREAM_MIMETYPE)
+    # Un flux jamais lu (client déjà parti) est aussi désinscrit
+    response.call_on_close(lambda: broadcaster.unsubscribe(subscriber))
+    response.cache_control.no_cache = True
+    # Pas de mise en tampon par un proxy nginx
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Métriques du processus au format texte de Prometheus : latence,
+    statut et taille des réponses par route, durée et nombre de lignes
+    des méthodes de Database, connexions SQLite ouvertes.
+    :return: Métriques au format texte
+    """
+    if not current_app.config['METRICS_SETTINGS']['enabled']:
+        return jsonify({"error": "Métriques désactivées."}), 404
+    response = current_app.response_class(metrics.REGISTRY.render(),
+                                          status=200)
+    response.headers['Content-Type'] = metrics.CONTENT_TYPE
+    response.cache_control.no_store = True
+    return response
+
+
+@bp.route('/doc', methods=['GET'])
 def documentation():
-    return app.send_static_file('docs/doc.html')
+    return current_app.send_static_file('docs/doc.html')
 
 
-@app.route('/infractions/<path:establishment_name>', methods=['GET'])
+@bp.route('/infractions/<path:establishment_name>', methods=['GET'])
+@dataset_cached
 def get_infractions_by_establishment_name(establishment_name):
     """
     API endpoint pour obternir toutes les infractions d'un établissement donné.
-    Le nom de l'établissement est passé dans l'URL.
+    Le nom de l'établissement est passé dans l'URL. La réponse est
+    diffusée, dans le format demandé par le client (voir
+    response_format()).
     :param establishment_name: Nom de l'établissement
     :return: Liste d'infractions au format JSON
     """
@@ -136,18 +623,19 @@ def get_infractions_by_establishment_name(establishment_name):
     is_valid, error_message = validate_date_period(start_date, end_date)
     if not is_valid:
         return jsonify({"error": error_message}), 400
-    results = db.get_infractions_by_establishment(establishment_name,
-                                                  start_date,
-                                                  end_date)
-    if not results:
+    output_format = response_format()
+    results = db.iter_infractions_by_establishment(
+        establishment_name, normalize_iso_date(start_date),
+        normalize_iso_date(end_date),
+        columnar=output_format == FORMAT_COLUMNAR)
+    # La première ligne est lue d'avance pour pouvoir répondre 404
+    first = next(results, None)
+    if first is None:
         return jsonify({"error":
                         "Aucune infraction trouvée "
                         "pour cet établissement. "}), 404
-    return app.response_class(
-        response=json.dumps(results, ensure_ascii=False),
-        status=200,
-        mimetype='application/json; charset=utf-8'
-    )
+    return json_stream_response(chain([first], results), output_format,
+                                VIOLATION_COLUMNS)
 
 
 def validate_date_period(start_date_str, end_date_str):
@@ -174,15 +662,37 @@ def validate_date_period(start_date_str, end_date_str):
     return True, None
 
 
-@app.route('/etablissements', methods=['GET'])
+def normalize_iso_date(date_str):
+    """
+    Normalise une date ISO 8601 validée en chaîne 'YYYY-MM-DD',
+    format de la colonne indexée date_iso.
+    """
+    return datetime.fromisoformat(date_str).date().isoformat()
+
+
+@bp.route('/etablissements', methods=['GET'])
+@dataset_cached
 def get_sorted_establishments():
     """
     API endpoint pour obtenir une liste triée en ordre décroissant
     des établissements par nombre d'infractions.
+    Avec ?format=colonnes, la réponse est diffusée en format colonnaire
+    (voir response_format()).
     :return:Liste d'établissements au format JSON
     """
     db = get_db()
     try:
+        if response_format() == FORMAT_COLUMNAR:
+            establishments = db.iter_establishments_by_infraction_count(
+                columnar=True)
+            first = next(establishments, None)
+            assert first is not None, "Aucun établissement trouvé."
+            return json_stream_response(chain([first], establishments),
+                                        FORMAT_COLUMNAR, RANKING_COLUMNS)
+        artifact = send_artifact(artifacts.ESTABLISHMENTS_JSON,
+                                 'application/json')
+        if artifact is not None:
+            return artifact
         establishments = db.get_establishments_by_infraction_count()
         assert establishments, "Aucun établissement trouvé."
         return jsonify(establishments)
@@ -191,7 +701,8 @@ def get_sorted_establishments():
         return jsonify({"error": "Erreur interne du serveur"}), 500
 
 
-@app.route('/etablissements.xml', methods=['GET'])
+@bp.route('/etablissements.xml', methods=['GET'])
+@dataset_cached
 def get_sorted_establishments_xml():
     """
     API endpoint pour obtenir une liste triée en ordre décroissant
@@ -200,24 +711,17 @@ def get_sorted_establishments_xml():
     """
     db = get_db()
     try:
-        establishments = db.get_establishments_by_infraction_count()
-        assert establishments, "Aucun établissement trouvé."
-        # Création de l'arbre XML
-        # Création de l'élément racine
-        root = ET.Element("etablissements")
-        for establishment in establishments:
-            # Création d'un élément pour chaque établissement
-            etablissement_elem = ET.SubElement(root, "etablissement")
-            name_elem = ET.SubElement(etablissement_elem, "nom")
-            name_elem.text = str(establishment["etablissement"])
-            count_elem = ET.SubElement(etablissement_elem,
-                                       "nombre_infractions")
-            count_elem.text = str(establishment["nombre_infractions"])
-        # Conversion de l'arbre XML en UTF-8
-        xml_str = ET.tostring(root, encoding='utf-8', method='xml',
-                              xml_declaration=True).decode('utf-8')
-        return app.response_class(
-            response=xml_str,
+        artifact = send_artifact(artifacts.ESTABLISHMENTS_XML,
+                                 'application/xml')
+        if artifact is not None:
+            return artifact
+        establishments = db.iter_establishments_by_infraction_count()
+        # Le premier établissement est lu d'avance pour pouvoir répondre 500
+        first = next(establishments, None)
+        assert first is not None, "Aucun établissement trouvé."
+        return current_app.response_class(
+            response=stream_with_context(
+                iter_establishments_xml(chain([first], establishments))),
             status=200,
             mimetype='application/xml'
         )
@@ -229,3 +733,36 @@ def get_sorted_establishments_xml():
         response = make_response(error_xml)
         response.headers['Content-Type'] = 'application/xml; charset=utf-8'
         return response, 500
+
+
+@bp.route('/etablissements/suggestions', methods=['GET'])
+def get_establishment_suggestions():
+    """
+    API endpoint d'autocomplétion des noms d'établissements : noms dont
+    le début, ou le début d'un des mots, correspond au paramètre q
+    (accents et casse ignorés). Les recherches sont faites dans un index
+    en mémoire (voir SuggestionIndex), sans requête SQLite.
+    :return: Liste de noms au format JSON
+    """
+    limit = request.args.get('limit', DEFAULT_SUGGESTIONS)
+    try:
+        limit = int(limit)
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= MAX_SUGGESTIONS:
+        return jsonify({"error": "Le paramètre 'limit' doit être un entier "
+                        f"entre 1 et {MAX_SUGGESTIONS}."}), 400
+    index = current_app.extensions['suggestion_index']
+    if index.is_stale():
+        index.refresh(get_db())
+    names = index.lookup(request.args.get('q', ''), limit)
+    response = current_app.response_class(
+        response=json.dumps(names, ensure_ascii=False),
+        status=200,
+        mimetype='application/json; charset=utf-8'
+    )
+    # Les suggestions changent au plus une fois par vérification de
+    # la version du jeu de données
+    response.cache_control.public = True
+    response.cache_control.max_age = index.check_interval
+    return response
@@ -0,0 +1,189 @@
+import os
+import gzip
+import json
+import shutil
+from datetime import date, timedelta
+from xml.sax.saxutils import escape as xml_escape
+from database import batched
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Les artefacts sont rangés à côté de la base, dans un dossier par version
+# du jeu de données : ils ne peuvent donc jamais être servis pour une
+# autre version que celle dont ils proviennent.
+ARTIFACTS_DIRNAME = "artifacts"
+# Nombre de versions conservées (la précédente peut encore être servie
+# à une requête en cours pendant la synchronisation)
+KEPT_VERSIONS = 2
+
+ESTABLISHMENTS_JSON = "etablissements.json"
+ESTABLISHMENTS_XML = "etablissements.xml"
+# Périodes récentes de /contrevenants précalculées, en jours avant la
+# date de la synchronisation
+RECENT_WINDOWS_DAYS = (30, 90, 365)
+
+XML_BATCH_SIZE = 500
+
+
+def _zstd_compress(data):
+    return zstandard.ZstdCompressor(level=19).compress(data)
+
+
+# Encodages produits (Content-Encoding -> extension, compression), par
+# ordre de préférence. brotli et zstandard sont optionnels.
+COMPRESSORS = {}
+if brotli is not None:
+    COMPRESSORS['br'] = ('.br', lambda data: brotli.compress(data,
+                                                             quality=11))
+if zstandard is not None:
+    COMPRESSORS['zstd'] = ('.zst', _zstd_compress)
+COMPRESSORS['gzip'] = ('.gz', lambda data: gzip.compress(data, 9, mtime=0))
+
+
+def artifacts_dir(db_path):
+    """
+    :param db_path: Chemin de la base de données
+    :return: Dossier des artefacts, à côté de la base
+    """
+    return os.path.join(os.path.dirname(db_path), ARTIFACTS_DIRNAME)
+
+
+def version_dir(db_path, version):
+    """
+    :param db_path: Chemin de la base de données
+    :param version: Version du jeu de données
+    :return: Dossier des artefacts de cette version
+    """
+    return os.path.join(artifacts_dir(db_path), str(version))
+
+
+def contraventions_artifact_name(start_date, end_date):
+    """
+    :param start_date: Date de début au format ISO 8601 (YYYY-MM-DD)
+    :param end_date: Date de fin au format ISO 8601 (YYYY-MM-DD)
+    :return: Nom de l'artefact de /contrevenants pour cette période
+    """
+    return f"contrevenants_{start_date}_{end_date}.json"
+
+
+def iter_establishments_xml(establishments):
+    """
+    Produit le document XML des établissements par morceaux, sans
+    construire d'arbre en mémoire. Le document est identique à celui
+    de ElementTree.tostring(..., encoding='utf-8', xml_declaration=True).
+    :param establishments: Itérable de dictionnaires (etablissement,
+    nombre_infractions)
+    :return: Générateur de fragments XML
+    """
+    yield "<?xml version='1.0' encoding='utf-8'?>\n<etablissements>"
+    for batch in batched(establishments, XML_BATCH_SIZE):
+        yield "".join(
+            "<etablissement><nom>{}</nom><nombre_infractions>{}"
+            "</nombre_infractions></etablissement>".format(
+                xml_escape(str(establishment["etablissement"])),
+                xml_escape(str(establishment["nombre_infractions"])))
+            for establishment in batch)
+    yield "</etablissements>"
+
+
+def write_artifact(directory, name, content):
+    """
+    Écrit un artefact et ses versions compressées. Chaque fichier est
+    écrit à côté puis renommé, pour ne jamais servir un fichier partiel.
+    :param directory: Dossier de la version du jeu de données
+    :param name: Nom de l'artefact
+    :param content: Contenu (str)
+    """
+    data = content.encode('utf-8')
+    variants = [(name, data)]
+    for suffix, compress in COMPRESSORS.values():
+        variants.append((name + suffix, compress(data)))
+    for filename, payload in variants:
+        path = os.path.join(directory, filename)
+        with open(path + ".part", 'wb') as artifact_file:
+            artifact_file.write(payload)
+        os.replace(path + ".part", path)
+
+
+def build_artifacts(db, today=None):
+    """
+    Précalcule les réponses les plus demandées de l'API pour la version
+    courante du jeu de données, en clair et compressées : le classement
+    des établissements (JSON et XML) et les périodes récentes de
+    /contrevenants. Le contenu est identique à celui des endpoints.
+    :param db: Instance de Database
+    :param today: Date de fin des périodes récentes (aujourd'hui par
+    défaut)
+    :return: Dossier des artefacts, ou None si la base est vide
+    """
+    version, _ = db.get_dataset_version()
+    if not version:
+        return None
+    today = today or date.today()
+    directory = version_dir(db.db_path, version)
+    os.makedirs(directory, exist_ok=True)
+
+    establishments = db.get_establishments_by_infraction_count()
+    if establishments:
+        # Même sérialisation que jsonify() (hors mode debug)
+        write_artifact(directory, ESTABLISHMENTS_JSON,
+                       json.dumps(establishments, sort_keys=True,
+                                  separators=(',', ':')) + "\n")
+        write_artifact(directory, ESTABLISHMENTS_XML,
+                       "".join(iter_establishments_xml(establishments)))
+
+    end_date = today.isoformat()
+    for days in RECENT_WINDOWS_DAYS:
+        start_date = (today - timedelta(days=days)).isoformat()
+        violations = db.get_violations_by_date(start_date, end_date)
+        write_artifact(directory,
+                       contraventions_artifact_name(start_date, end_date),
+                       json.dumps(violations, ensure_ascii=False,
+                                  sort_keys=True))
+
+    prune_artifacts(db.db_path, version)
+    print(f"Artefacts de la version {version} écrits dans {directory}.")
+    return directory
+
+
+def prune_artifacts(db_path, current_version):
+    """
+    Supprime les artefacts des anciennes versions du jeu de données, en
+    conservant les KEPT_VERSIONS plus récentes.
+    :param db_path: Chemin de la base de données
+    :param current_version: Version courante du jeu de données
+    """
+    base = artifacts_dir(db_path)
+    versions = sorted(int(name) for name in os.listdir(base)
+                      if name.isdigit() and int(name) <= current_version)
+    for version in versions[:-KEPT_VERSIONS]:
+        shutil.rmtree(os.path.join(base, str(version)), ignore_errors=True)
+
+
+def find_artifact(db_path, version, name, accept_encodings):
+    """
+    Cherche l'artefact à servir selon l'en-tête Accept-Encoding.
+    :param db_path: Chemin de la base de données
+    :param version: Version du jeu de données
+    :param name: Nom de l'artefact
+    :param accept_encodings: request.accept_encodings
+    :return: Tuple (chemin, Content-Encoding ou None), ou None si
+    l'artefact n'existe pas
+    """
+    path = os.path.join(version_dir(db_path, version), name)
+    available = [encoding for encoding, (suffix, _) in COMPRESSORS.items()
+                 if os.path.exists(path + suffix)]
+    encoding = accept_encodings.best_match(available)
+    if encoding is not None:
+        return path + COMPRESSORS[encoding][0], encoding
+    if os.path.exists(path):
+        return path, None
+    return None
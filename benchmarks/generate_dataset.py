@@ -0,0 +1,157 @@
+"""
+Génère un fichier violations.csv synthétique, au format du jeu de données
+de la Ville de Montréal, pour les mesures de performance.
+
+Le contenu est entièrement déterminé par l'échelle et la graine : deux
+exécutions identiques produisent le même fichier.
+
+Exemple :
+    python benchmarks/generate_dataset.py --scale 10 -o /tmp/violations.csv
+"""
+import argparse
+import csv
+import random
+from datetime import date, timedelta
+
+# Colonnes du CSV, dans l'ordre du fichier publié
+CSV_COLUMNS = ('id_poursuite', 'business_id', 'date', 'description',
+               'adresse', 'date_jugement', 'etablissement', 'montant',
+               'proprietaire', 'ville', 'statut', 'date_statut', 'categorie')
+
+# Taille approximative du jeu de données réel (échelle 1)
+BASE_ROWS = 7700
+# Nombre moyen de contraventions par établissement
+VIOLATIONS_PER_ESTABLISHMENT = 3
+FIRST_DATE = date(2006, 1, 1)
+LAST_DATE = date(2025, 12, 31)
+DEFAULT_SEED = 42
+
+NAME_PREFIXES = ('Restaurant', 'Café', 'Épicerie', 'Boulangerie', 'Pizzeria',
+                 'Marché', 'Dépanneur', 'Traiteur', 'Brasserie', 'Sushi',
+                 'Pâtisserie', 'Boucherie', 'Bistro', 'Casse-croûte')
+NAME_WORDS = ('du Plateau', 'Saint-Denis', 'Chez Gérard', 'Ô Délices',
+              'Hochelaga', 'Le Petit Québec', 'Mont-Royal', 'Villeray',
+              'La Belle Province', "L'Érable", 'Côte-des-Neiges', 'Jean-Talon',
+              'Rosemont', 'Verdun', 'Atwater', 'Maisonneuve', 'Lachine')
+STREETS = ('Rue Sainte-Catherine', 'Boulevard Saint-Laurent', 'Rue Ontario',
+           'Avenue du Mont-Royal', 'Rue Hochelaga', 'Rue Jean-Talon',
+           'Boulevard Décarie', "Rue de l'Église", 'Avenue Papineau',
+           'Rue Wellington', 'Rue Beaubien', 'Boulevard Pie-IX')
+CITIES = ('Montréal', 'Montréal-Nord', 'Verdun', 'Lachine', 'Saint-Laurent',
+          'Anjou', 'LaSalle', 'Outremont')
+CATEGORIES = ('Restaurant', 'Épicerie avec préparation', 'Boulangerie',
+              'Restaurant service rapide', 'Supermarché', 'Traiteur',
+              'Pâtisserie', 'Boucherie-épicerie', 'Bar salon, taverne')
+DESCRIPTIONS = (
+    "Le produit altérable à la chaleur n'a pas été maintenu à une "
+    "température interne et constante de 4 °C ou moins, ou de 60 °C ou "
+    "plus, jusqu'à sa livraison au consommateur.",
+    "Les lieux, l'équipement, le matériel et les ustensiles servant à la "
+    "préparation des aliments n'étaient pas propres.",
+    "L'exploitant n'a pas pris les mesures nécessaires pour prévenir la "
+    "présence de rongeurs, d'insectes ou d'autres animaux.",
+    "Le produit a été préparé, conservé ou offert en vente dans des "
+    "conditions insalubres, « contrairement » au règlement.",
+    "Un aliment impropre à la consommation humaine a été détenu ou "
+    "offert en vente.",
+)
+AMOUNTS = (250, 300, 500, 750, 1000, 1500, 2000, 3000, 5000)
+STATUSES = ('Fermé', 'Ouvert', 'Sous inspection fédérale', 'Changement de '
+            'propriétaire')
+
+
+def random_date(rng, start=FIRST_DATE, end=LAST_DATE):
+    return start + timedelta(days=rng.randrange((end - start).days + 1))
+
+
+def make_establishments(rng, count):
+    """
+    :return: Liste de tuples (business_id, nom, adresse, ville,
+    propriétaire, catégorie, statut)
+    """
+    establishments = []
+    for index in range(count):
+        name = f"{rng.choice(NAME_PREFIXES)} {rng.choice(NAME_WORDS)}"
+        if index >= len(NAME_PREFIXES) * len(NAME_WORDS) // 2:
+            # Plusieurs succursales peuvent porter le même nom
+            name = f"{name} {index % 97}" if rng.random() < 0.7 else name
+        street = f"{rng.randint(1, 9999)}, {rng.choice(STREETS)}"
+        city = rng.choice(CITIES)
+        owner = rng.choice((f"{rng.randint(1000, 9999)}-"
+                            f"{rng.randint(1000, 9999)} QUÉBEC INC.",
+                            f"{name.upper()} INC.",
+                            f"{rng.choice(NAME_WORDS)} S.E.N.C."))
+        establishments.append((100000 + index, name,
+                               f"{street}, {city}, Québec", city, owner,
+                               rng.choice(CATEGORIES),
+                               rng.choice(STATUSES)))
+    return establishments
+
+
+def generate_rows(scale=1, seed=DEFAULT_SEED):
+    """
+    Produit les lignes du CSV synthétique, dans l'ordre du fichier.
+
+    :param scale: Multiple de la taille du jeu de données réel
+    :param seed: Graine du générateur pseudo-aléatoire
+    :return: Générateur de listes de valeurs (voir CSV_COLUMNS)
+    """
+    rng = random.Random(seed)
+    row_count = int(BASE_ROWS * scale)
+    establishments = make_establishments(
+        rng, max(1, row_count // VIOLATIONS_PER_ESTABLISHMENT))
+    # Quelques établissements concentrent beaucoup de contraventions
+    weights = [1 / (rank + 1) ** 0.8 for rank in range(len(establishments))]
+    chosen = rng.choices(establishments, weights=weights, k=row_count)
+    for index, establishment in enumerate(chosen):
+        (business_id, name, address, city, owner, category,
+         status) = establishment
+        violation_date = random_date(rng)
+        judgment_date = violation_date + timedelta(days=rng.randint(30, 720))
+        status_date = random_date(rng, violation_date)
+        yield [
+            1000 + index,
+            business_id,
+            violation_date.strftime('%Y%m%d'),
+            rng.choice(DESCRIPTIONS),
+            address,
+            judgment_date.strftime('%Y%m%d'),
+            name,
+            rng.choice(AMOUNTS),
+            owner,
+            city,
+            status,
+            status_date.strftime('%Y%m%d'),
+            category,
+        ]
+
+
+def write_dataset(path, scale=1, seed=DEFAULT_SEED):
+    """
+    Écrit le CSV synthétique.
+
+    :param path: Fichier à écrire
+    :param scale: Multiple de la taille du jeu de données réel
+    :param seed: Graine du générateur pseudo-aléatoire
+    :return: Nombre de lignes écrites
+    """
+    count = 0
+    with open(path, 'w', encoding='utf-8', newline='') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(CSV_COLUMNS)
+        for row in generate_rows(scale, seed):
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().split(
+        "\n")[0])
+    parser.add_argument('--scale', type=float, default=1,
+                        help=f"multiple de {BASE_ROWS} lignes (défaut : 1)")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('-o', '--output', default="violations.csv")
+    args = parser.parse_args()
+    rows = write_dataset(args.output, args.scale, args.seed)
+    print(f"{rows} lignes écrites dans {args.output}.")
@@ -0,0 +1,457 @@
+"""
+Mesure les performances de la synchronisation, des requêtes de la classe
+Database et des endpoints Flask sur des jeux de données synthétiques
+(voir generate_dataset.py), et écrit les résultats en JSON pour suivre
+les régressions d'un commit à l'autre.
+
+Exemples (depuis la racine du dépôt) :
+    python benchmarks/run_benchmarks.py --scales 1,10
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/a.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta, timezone
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+import generate_dataset  # noqa: E402
+
+RESULTS_DIR = os.path.join(BENCHMARKS_DIR, "results")
+DEFAULT_SCALES = (1, 10)
+# Nombre de mesures par requête et par endpoint
+DEFAULT_REPEAT = 20
+# Part des lignes modifiées entre deux synchronisations incrémentales
+CHANGED_ROWS_RATIO = 100
+# Écart (en %) au-delà duquel --compare signale une régression
+REGRESSION_THRESHOLD = 10
+# Endpoints servis depuis les artefacts précalculés, lorsqu'ils existent
+ARTIFACT_ENDPOINTS = ('contrevenants_30j', 'contrevenants_365j',
+                      'etablissements', 'etablissements_xml')
+
+# Configuration de l'application dans le dossier de travail temporaire :
+# ni planificateur ni envoi de notifications pendant les mesures
+BENCHMARK_CONFIG = """\
+sync_mode: "incremental"
+sync:
+  run_in_web: false
+  lock_file: "db/sync.lock"
+database:
+  path: "db/database.db"
+"""
+
+
+def timed(function, repeat):
+    """
+    :param function: Fonction sans argument à mesurer
+    :param repeat: Nombre d'exécutions
+    :return: Statistiques des durées, en millisecondes
+    """
+    durations = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        function()
+        durations.append((time.perf_counter() - start) * 1000)
+    durations.sort()
+    return {
+        'repeat': repeat,
+        'min_ms': round(durations[0], 3),
+        'median_ms': round(statistics.median(durations), 3),
+        'p95_ms': round(durations[int(0.95 * (repeat - 1))], 3),
+        'max_ms': round(durations[-1], 3),
+    }
+
+
+def peak_memory(function):
+    """
+    Exécute la fonction une fois de plus sous tracemalloc, à part des
+    mesures de durée que le traçage ralentirait.
+
+    :return: Pic des allocations Python, en Kio
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / 1024, 1)
+
+
+def measure(function, repeat):
+    result = timed(function, repeat)
+    result['peak_kib'] = peak_memory(function)
+    return result
+
+
+def consume(iterable):
+    count = 0
+    for _ in iterable:
+        count += 1
+    return count
+
+
+def changed_rows(csv_path, marker):
+    """
+    Relit le CSV en modifiant une ligne sur CHANGED_ROWS_RATIO, pour
+    qu'une synchronisation incrémentale ait des mises à jour à écrire.
+    """
+    from data_sync import parse_csv_content
+    with open(csv_path, 'r', encoding='utf-8', newline='') as csv_file:
+        for index, row in enumerate(parse_csv_content(csv_file)):
+            if index % CHANGED_ROWS_RATIO == 0:
+                row['statut'] = f"{row['statut']} ({marker})"
+            yield row
+
+
+def benchmark_sync(csv_path, db_settings):
+    """
+    :return: Mesures du parsing du CSV, du chargement complet, des
+    synchronisations incrémentales et de la génération des artefacts
+    """
+    import artifacts
+    from data_sync import parse_csv_content
+    from database import Database
+
+    def read_csv():
+        with open(csv_path, 'r', encoding='utf-8', newline='') as csv_file:
+            return consume(parse_csv_content(csv_file))
+
+    def full_load():
+        db = Database.for_writing(db_settings)
+        try:
+            db.ensure_schema()
+            with open(csv_path, 'r', encoding='utf-8',
+                      newline='') as csv_file:
+                db.insert_data_to_db(parse_csv_content(csv_file))
+        finally:
+            db.close_connection()
+
+    def sync(rows):
+        db = Database.for_writing(db_settings)
+        try:
+            db.sync_violations(rows)
+        finally:
+            db.close_connection()
+
+    markers = iter(range(1000))
+
+    def sync_changed():
+        sync(changed_rows(csv_path, next(markers)))
+
+    def sync_unchanged():
+        with open(csv_path, 'r', encoding='utf-8', newline='') as csv_file:
+            sync(parse_csv_content(csv_file))
+
+    def build():
+        db = Database.for_writing(db_settings)
+        try:
+            artifacts.build_artifacts(db, today=generate_dataset.LAST_DATE)
+        finally:
+            db.close_connection()
+
+    results = {'parse_csv_content': measure(read_csv, 3),
+               'insert_data_to_db': measure(full_load, 1),
+               'sync_violations_changed': measure(sync_changed, 1),
+               'sync_violations_unchanged': measure(sync_unchanged, 1),
+               'build_artifacts': measure(build, 1)}
+    # Le traçage de sync_changed a laissé des lignes modifiées : le
+    # jeu de données mesuré ensuite est celui du CSV
+    full_load()
+    return results
+
+
+def query_cases(db):
+    """
+    :param db: Instance de Database sur le jeu de données chargé
+    :return: Liste de tuples (nom, fonction sans argument)
+    """
+    end = generate_dataset.LAST_DATE
+    year = ((end - timedelta(days=365)).isoformat(), end.isoformat())
+    month = ((end - timedelta(days=30)).isoformat(), end.isoformat())
+    everything = (generate_dataset.FIRST_DATE.isoformat(), end.isoformat())
+    top = db.get_establishments_by_infraction_count()[0]['etablissement']
+    cursor = db.get_connection().execute(
+        "SELECT id_poursuite FROM violations ORDER BY id_poursuite LIMIT 100")
+    ids = [row[0] for row in cursor.fetchall()]
+    return [
+        ('has_violations', db.has_violations),
+        ('get_dataset_version', db.get_dataset_version),
+        ('get_violations_by_ids_100',
+         lambda: db.get_violations_by_ids(ids)),
+        ('search_violation_etablissement',
+         lambda: db.search_violation('etablissement', 'Plateau')),
+        ('search_violation_rue',
+         lambda: db.search_violation('rue', 'Sainte-Catherine')),
+        ('search_violation_page',
+         lambda: db.search_violation_page('proprietaire', 'Québec', 50,
+                                          None, None)),
+        ('get_violations_by_date_30j',
+         lambda: db.get_violations_by_date(*month)),
+        ('get_violations_by_date_365j',
+         lambda: db.get_violations_by_date(*year)),
+        ('iter_violations_by_date_365j_colonnes',
+         lambda: consume(db.iter_violations_by_date(*year, columnar=True))),
+        ('get_violations_summary_by_date_365j',
+         lambda: db.get_violations_summary_by_date(*year)),
+        ('get_violations_by_date_page_100',
+         lambda: db.get_violations_by_date_page(*everything, 100, None,
+                                                None)),
+        ('get_establishment_names', db.get_establishment_names),
+        ('get_infractions_by_establishment',
+         lambda: db.get_infractions_by_establishment(top, *everything)),
+        ('get_establishments_by_infraction_count',
+         db.get_establishments_by_infraction_count),
+    ]
+
+
+def benchmark_queries(db_settings, repeat):
+    from database import Database
+    db = Database(db_settings['path'], pragmas=db_settings['read_pragmas'])
+    try:
+        return {name: measure(function, repeat)
+                for name, function in query_cases(db)}
+    finally:
+        db.close_connection()
+
+
+def endpoint_cases(top_establishment):
+    """
+    :return: Liste de tuples (nom, méthode, URL, données du formulaire)
+    """
+    end = generate_dataset.LAST_DATE
+    year = f"du={end - timedelta(days=365)}&au={end}"
+    month = f"du={end - timedelta(days=30)}&au={end}"
+    return [
+        ('index', 'GET', "/", None),
+        ('recherche', 'POST', "/",
+         {'search_type': 'etablissement', 'query': 'Plateau'}),
+        ('contrevenants_30j', 'GET', f"/contrevenants?{month}", None),
+        ('contrevenants_365j', 'GET', f"/contrevenants?{year}", None),
+        ('contrevenants_365j_ndjson', 'GET',
+         f"/contrevenants?{year}&format=ndjson", None),
+        ('contrevenants_365j_colonnes', 'GET',
+         f"/contrevenants?{year}&format=colonnes", None),
+        ('contrevenants_page_100', 'GET',
+         f"/contrevenants?{year}&limit=100", None),
+        ('contrevenants_resume_365j', 'GET',
+         f"/contrevenants/resume?{year}", None),
+        ('infractions', 'GET',
+         f"/infractions/{top_establishment}?du=2000-01-01&au={end}", None),
+        ('etablissements', 'GET', "/etablissements", None),
+        ('etablissements_colonnes', 'GET',
+         "/etablissements?format=colonnes", None),
+        ('etablissements_xml', 'GET', "/etablissements.xml", None),
+        ('suggestions', 'GET', "/etablissements/suggestions?q=caf", None),
+    ]
+
+
+def benchmark_endpoints(flask_app, top_establishment, repeat, names=None):
+    """
+    Mesure chaque endpoint par le client de test de Flask, corps de la
+    réponse compris (les réponses diffusées sont lues jusqu'au bout).
+
+    :param names: Noms des endpoints à mesurer (tous par défaut)
+    """
+    client = flask_app.test_client()
+    results = {}
+    for name, method, url, data in endpoint_cases(top_establishment):
+        if names is not None and name not in names:
+            continue
+
+        def request(method=method, url=url, data=data):
+            response = client.open(url, method=method, data=data,
+                                   headers={'Accept-Encoding': 'gzip'})
+            body = response.get_data()
+            response.close()
+            if response.status_code != 200:
+                raise RuntimeError(f"{url} : HTTP {response.status_code}")
+            return body
+        results[name] = measure(request, repeat)
+        results[name]['bytes'] = len(request())
+    return results
+
+
+def benchmark_scale(scale, seed, repeat, workdir):
+    """
+    :return: Résultats pour un jeu de données de cette échelle
+    """
+    import artifacts
+    from app import create_app
+    from database import Database, load_database_settings
+
+    for name in os.listdir("db"):
+        if name != "db.sql":
+            path = os.path.join("db", name)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+    csv_path = os.path.join(workdir, "violations.csv")
+    start = time.perf_counter()
+    rows = generate_dataset.write_dataset(csv_path, scale, seed)
+    print(f"Échelle {scale} : {rows} lignes générées en "
+          f"{time.perf_counter() - start:.1f} s.")
+
+    db_settings = load_database_settings()
+    results = {'rows': rows,
+               'csv_bytes': os.path.getsize(csv_path),
+               'sync': benchmark_sync(csv_path, db_settings)}
+    results['db_bytes'] = os.path.getsize(db_settings['path'])
+    print(f"Échelle {scale} : synchronisation mesurée.")
+    results['queries'] = benchmark_queries(db_settings, repeat)
+    print(f"Échelle {scale} : requêtes mesurées.")
+
+    # Application neuve, avec son pool de connexions, sur la base de
+    # cette échelle
+    flask_app = create_app()
+    db = Database(db_settings['path'])
+    try:
+        top = db.get_establishments_by_infraction_count()[0]['etablissement']
+    finally:
+        db.close_connection()
+    # Réponses calculées par l'application, puis servies depuis les
+    # artefacts générés à la synchronisation (cas de la production)
+    shutil.rmtree(artifacts.artifacts_dir(db_settings['path']),
+                  ignore_errors=True)
+    results['endpoints'] = benchmark_endpoints(flask_app, top, repeat)
+    db = Database.for_writing(db_settings)
+    try:
+        artifacts.build_artifacts(db, today=generate_dataset.LAST_DATE)
+    finally:
+        db.close_connection()
+    results['endpoints_artifacts'] = benchmark_endpoints(
+        flask_app, top, repeat, ARTIFACT_ENDPOINTS)
+    print(f"Échelle {scale} : endpoints mesurés.")
+    os.remove(csv_path)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(scales, seed, repeat):
+    """
+    Mesure chaque échelle dans un dossier de travail temporaire, qui
+    contient la configuration et la base de données des mesures.
+
+    :return: Résultats (dictionnaire sérialisable en JSON)
+    """
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'seed': seed,
+            'repeat': repeat,
+        },
+        'scales': {},
+    }
+    previous_dir = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="checktonresto-bench-")
+    try:
+        os.chdir(workdir)
+        os.makedirs("db")
+        shutil.copy(os.path.join(REPO_DIR, "db", "db.sql"), "db")
+        with open("config.yaml", 'w') as config_file:
+            config_file.write(BENCHMARK_CONFIG)
+        for scale in scales:
+            report['scales'][str(scale)] = benchmark_scale(scale, seed,
+                                                           repeat, workdir)
+    finally:
+        os.chdir(previous_dir)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+def iter_metrics(report):
+    """
+    :return: Générateur de tuples (chemin de la mesure, durée médiane)
+    """
+    for scale, results in report['scales'].items():
+        for group in ('sync', 'queries', 'endpoints', 'endpoints_artifacts'):
+            for name, result in results.get(group, {}).items():
+                yield f"{scale}x/{group}/{name}", result['median_ms']
+
+
+def compare(previous, current, threshold=REGRESSION_THRESHOLD):
+    """
+    Affiche l'écart des durées médianes entre deux résultats.
+
+    :return: Nombre de mesures plus lentes de plus de 'threshold' %
+    """
+    before = dict(iter_metrics(previous))
+    regressions = 0
+    for metric, median in iter_metrics(current):
+        if not before.get(metric):
+            continue
+        change = (median - before[metric]) / before[metric] * 100
+        flag = ""
+        if change > threshold:
+            flag = "  <-- régression"
+            regressions += 1
+        print(f"{metric:70} {before[metric]:10.2f} -> {median:10.2f} ms "
+              f"({change:+.0f} %){flag}")
+    return regressions
+
+
+def parse_scales(value):
+    return [float(scale) if '.' in scale else int(scale)
+            for scale in value.split(',')]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().split(
+        "\n")[0])
+    parser.add_argument('--scales', type=parse_scales,
+                        default=list(DEFAULT_SCALES),
+                        help="échelles séparées par des virgules, en "
+                             f"multiples de {generate_dataset.BASE_ROWS} "
+                             "lignes (ex. 1,10,100,1000)")
+    parser.add_argument('--seed', type=int,
+                        default=generate_dataset.DEFAULT_SEED)
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    parser.add_argument('-o', '--output',
+                        help="fichier de résultats (défaut : "
+                             "benchmarks/results/<date>_<commit>.json)")
+    parser.add_argument('--compare', metavar='RESULTATS',
+                        help="résultats précédents à comparer")
+    args = parser.parse_args()
+
+    report = run(args.scales, args.seed, args.repeat)
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(
+            RESULTS_DIR, f"{date.today():%Y%m%d}_"
+                         f"{report['meta']['commit'] or 'local'}.json")
+    with open(output, 'w') as results_file:
+        json.dump(report, results_file, indent=2)
+    print(f"Résultats écrits dans {output}.")
+    if args.compare:
+        with open(args.compare, 'r') as previous_file:
+            if compare(json.load(previous_file), report):
+                sys.exit(1)
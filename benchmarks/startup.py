@@ -0,0 +1,254 @@
+"""
+Mesure le démarrage d'un worker web : durée de l'import de app.py et de
+la création de l'application, mémoire résidente une fois l'application
+créée, modules chargés et imports les plus coûteux (python -X
+importtime). Chaque mesure est faite dans un nouveau processus.
+
+Exemples (depuis la racine du dépôt) :
+    python benchmarks/startup.py
+    python benchmarks/startup.py --ref HEAD~1   # avant / après
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import date, datetime, timezone
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARKS_DIR)
+RESULTS_DIR = os.path.join(BENCHMARKS_DIR, "results")
+DEFAULT_REPEAT = 5
+# Nombre d'imports les plus coûteux conservés
+TOP_IMPORTS = 10
+RESULT_PREFIX = "RESULTAT "
+
+# Modes de démarrage mesurés : valeur de sync.run_in_web
+MODES = {
+    'web': False,
+    'web+sync': True,
+}
+# Modules dont la présence après le démarrage est signalée
+WATCHED_MODULES = ('data_sync', 'notifications', 'tweepy', 'requests',
+                   'apscheduler', 'smtplib', 'yaml')
+
+CONFIG_TEMPLATE = """\
+sync:
+  run_in_web: {run_in_web}
+  lock_file: "db/sync.lock"
+database:
+  path: "db/database.db"
+"""
+
+# Code exécuté dans le processus mesuré. Les versions antérieures de
+# app.py créent l'application à l'import (pas de create_app()).
+CHILD_CODE = """
+import json, os, sys, time
+start = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+import app
+imported = time.perf_counter()
+factory = getattr(app, 'create_app', None)
+if factory is not None:
+    factory()
+created = time.perf_counter()
+rss = None
+try:
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                rss = int(line.split()[1])
+except OSError:
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+watched = sys.argv[2].split(',')
+print(%r + json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'create_ms': (created - imported) * 1000,
+    'rss_kib': rss,
+    'modules': len(sys.modules),
+    'loaded': [name for name in watched if name in sys.modules],
+}))
+sys.stdout.flush()
+# Le planificateur et le worker d'envoi ne doivent pas retarder la sortie
+os._exit(0)
+""" % RESULT_PREFIX
+
+
+def prepare_workdir(source_dir, run_in_web):
+    """
+    :return: Dossier de travail contenant config.yaml et le schéma
+    """
+    workdir = tempfile.mkdtemp(prefix="checktonresto-startup-")
+    os.makedirs(os.path.join(workdir, "db"))
+    shutil.copy(os.path.join(source_dir, "db", "db.sql"),
+                os.path.join(workdir, "db"))
+    with open(os.path.join(workdir, "config.yaml"), 'w') as config_file:
+        config_file.write(CONFIG_TEMPLATE.format(
+            run_in_web=str(run_in_web).lower()))
+    return workdir
+
+
+def run_child(source_dir, workdir, importtime=False):
+    command = [sys.executable]
+    if importtime:
+        command += ["-X", "importtime"]
+    command += ["-c", CHILD_CODE, source_dir, ",".join(WATCHED_MODULES)]
+    completed = subprocess.run(command, cwd=workdir, capture_output=True,
+                               text=True, timeout=120)
+    for line in completed.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):]), completed.stderr
+    raise RuntimeError(f"Démarrage impossible :\n{completed.stdout}"
+                       f"{completed.stderr}")
+
+
+def top_imports(importtime_output):
+    """
+    :param importtime_output: Sortie d'erreur de python -X importtime
+    :return: Imports les plus coûteux faits directement par app.py ou
+    par create_app(), (module, durée cumulée en ms)
+    """
+    imports = []
+    pending = []
+    after_app = False
+    for line in importtime_output.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        # Un module est affiché après ses propres imports, indentés de
+        # deux espaces par niveau
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        name = name.strip()
+        entry = (name, int(cumulative) / 1000)
+        if after_app:
+            if depth == 0:
+                imports.append(entry)
+        elif depth == 1:
+            pending.append(entry)
+        elif depth == 0:
+            if name == 'app':
+                imports.extend(pending)
+                after_app = True
+            pending = []
+    imports.sort(key=lambda item: item[1], reverse=True)
+    return [[name, round(ms, 1)] for name, ms in imports[:TOP_IMPORTS]]
+
+
+def measure(source_dir, repeat):
+    """
+    :return: Mesures de chaque mode de démarrage
+    """
+    results = {}
+    for mode, run_in_web in MODES.items():
+        workdir = prepare_workdir(source_dir, run_in_web)
+        try:
+            runs = [run_child(source_dir, workdir)[0]
+                    for _ in range(repeat)]
+            _, importtime = run_child(source_dir, workdir, importtime=True)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        results[mode] = {
+            'import_ms': round(statistics.median(
+                run['import_ms'] for run in runs), 1),
+            'create_ms': round(statistics.median(
+                run['create_ms'] for run in runs), 1),
+            'rss_kib': statistics.median(run['rss_kib'] for run in runs),
+            'modules': runs[-1]['modules'],
+            'loaded': runs[-1]['loaded'],
+            'top_imports': top_imports(importtime),
+        }
+    return results
+
+
+def export_ref(ref):
+    """
+    Extrait une version du dépôt dans un dossier temporaire.
+
+    :return: Dossier de l'extraction
+    """
+    directory = tempfile.mkdtemp(prefix="checktonresto-ref-")
+    archive = subprocess.run(["git", "archive", ref], cwd=REPO_DIR,
+                             capture_output=True, check=True).stdout
+    subprocess.run(["tar", "-x", "-C", directory], input=archive,
+                   check=True)
+    return directory
+
+
+def git_commit(ref="HEAD"):
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', ref], cwd=REPO_DIR,
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(label, results, reference=None):
+    print(f"\n{label}")
+    for mode, result in results.items():
+        line = (f"  {mode:<9} import {result['import_ms']:7.1f} ms, "
+                f"create_app {result['create_ms']:6.1f} ms, "
+                f"RSS {result['rss_kib'] / 1024:6.1f} Mio, "
+                f"{result['modules']} modules")
+        if reference is not None:
+            before = reference[mode]
+            line += (f" (avant : {before['import_ms']:.1f} ms, "
+                     f"{before['create_ms']:.1f} ms, "
+                     f"{before['rss_kib'] / 1024:.1f} Mio)")
+        print(line)
+        print(f"            chargés : {', '.join(result['loaded']) or '-'}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().split(
+        "\n")[0])
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    parser.add_argument('--ref',
+                        help="version du dépôt à mesurer aussi, pour "
+                             "comparaison (ex. HEAD~1)")
+    parser.add_argument('-o', '--output',
+                        help="fichier de résultats (défaut : benchmarks/"
+                             "results/startup_<date>_<commit>.json)")
+    args = parser.parse_args()
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': sys.version.split()[0],
+            'repeat': args.repeat,
+        },
+        'current': measure(REPO_DIR, args.repeat),
+    }
+    if args.ref:
+        source_dir = export_ref(args.ref)
+        try:
+            report['reference'] = {'ref': args.ref,
+                                   'commit': git_commit(args.ref),
+                                   **measure(source_dir, args.repeat)}
+        finally:
+            shutil.rmtree(source_dir, ignore_errors=True)
+    reference = report.get('reference')
+    if reference is not None:
+        print_results(f"Référence {reference['ref']} "
+                      f"({reference['commit']})",
+                      {mode: reference[mode] for mode in MODES})
+    print_results("Arbre de travail", report['current'],
+                  {mode: reference[mode] for mode in MODES}
+                  if reference is not None else None)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(
+            RESULTS_DIR, f"startup_{date.today():%Y%m%d}_"
+                         f"{report['meta']['commit'] or 'local'}.json")
+    with open(output, 'w') as results_file:
+        json.dump(report, results_file, indent=2)
+    print(f"\nRésultats écrits dans {output}.")
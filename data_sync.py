@@ -1,372 +1,406 @@
 from database import Database
+import artifacts
+import metrics
+from sync_stats import RUN_FAILED, RUN_SUCCESS, RUN_UNCHANGED
+from sync_stats import REPORT_HISTORY, SyncRun, format_report
+from sync_stats import profiling_requested
+from locks import FileLock
+from settings import CONFIG_FILE, SYNC_HOUR, SYNC_MINUTE
+from settings import load_config, load_sync_settings
+from notifications import NOTIFICATION_CHANNELS, OutboxWorker
+import argparse
 import requests
-import yaml
-import smtplib
-from email.message import EmailMessage
 import os
-from io import StringIO
 import csv
+import hashlib
+import json
 import sqlite3
-import tweepy
-from dotenv import load_dotenv
-
-# Charge les variables d'environnement si le fichier .env existe.
-# Pour la version déployée, elles seront définies sur
-# le server d'hébergement.
-load_dotenv()
+from datetime import datetime
 
 # URL du fichier CSV
 CSV_URL = "https://data.montreal.ca/dataset/" \
           "05a9e718-6810-4e73-8bb9-5955efeb91a0/" \
           "resource/7f939a08-be8a-45e1-b208-d8744dc" \
           "a8fc6/download/violations.csv"
-CONFIG_FILE = "config.yaml"
-KNOWN_IDS_FILEPATH = "db/known_ids.txt"
-
-
-def download_csv(url):
-    """Télécharge le fichier CSV depuis l'URL et retourne son contenu."""
+# Copie locale du dernier CSV téléchargé et cache de ses validateurs HTTP
+DATASET_FILEPATH = "db/violations.csv"
+DATASET_CACHE_FILEPATH = "db/dataset_cache.json"
+# Profils des synchronisations profilées (--profile ou SYNC_PROFILE=1)
+PROFILE_DIR = "db/profiles"
+# Taille des morceaux lus lors du téléchargement (octets)
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# Modes de synchronisation de la table violations
+SYNC_MODE_INCREMENTAL = "incremental"
+SYNC_MODE_FULL = "full"
+
+
+def download_csv(url, cache=None, destination=DATASET_FILEPATH,
+                 chunk_size=DOWNLOAD_CHUNK_SIZE):
+    """Télécharge le fichier CSV par morceaux dans un fichier local en
+    calculant sa somme de contrôle.
+
+    Les validateurs du dernier téléchargement (ETag, Last-Modified) sont
+    envoyés avec la requête. Retourne None si le serveur répond 304 ou
+    si le fichier reçu est identique au précédent, sinon le dictionnaire
+    des nouveaux validateurs à enregistrer dans le cache.
+
+    url peut aussi être le chemin d'un fichier CSV local (source de
+    remplacement pour les essais, voir --source)."""
+    cache = cache or {}
+    if not url.startswith(('http://', 'https://')):
+        return copy_local_csv(url, cache, destination, chunk_size)
+    headers = {}
+    if cache.get('etag'):
+        headers['If-None-Match'] = cache['etag']
+    if cache.get('last_modified'):
+        headers['If-Modified-Since'] = cache['last_modified']
+    partial_path = destination + ".part"
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        response.encoding = 'utf-8'
-        print("Données téléchargées avec succès.")
-        return response.text
+        with requests.get(url, headers=headers, stream=True) as response:
+            if response.status_code == 304:
+                print("Données non modifiées depuis le dernier "
+                      "téléchargement (304).")
+                return None
+            response.raise_for_status()
+            print("Téléchargement des données en continu...")
+            checksum = hashlib.sha256()
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            with open(partial_path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    checksum.update(chunk)
+                    f.write(chunk)
+            new_cache = {
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'sha256': checksum.hexdigest()
+            }
     except requests.RequestException as e:
         print(f"Erreur lors du téléchargement : {e}")
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
         raise
+    print("Données téléchargées avec succès.")
+    return replace_dataset(partial_path, destination, new_cache, cache)
+
+
+def copy_local_csv(path, cache, destination=DATASET_FILEPATH,
+                   chunk_size=DOWNLOAD_CHUNK_SIZE):
+    """Copie un fichier CSV local à la place du téléchargement, en
+    calculant sa somme de contrôle. Retourne None si le fichier est
+    identique au précédent, sinon le dictionnaire à enregistrer dans
+    le cache."""
+    partial_path = destination + ".part"
+    checksum = hashlib.sha256()
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    with open(path, 'rb') as source, open(partial_path, 'wb') as f:
+        for chunk in iter(lambda: source.read(chunk_size), b""):
+            checksum.update(chunk)
+            f.write(chunk)
+    print(f"Données copiées depuis '{path}'.")
+    new_cache = {'etag': None, 'last_modified': None,
+                 'sha256': checksum.hexdigest()}
+    return replace_dataset(partial_path, destination, new_cache, cache)
+
+
+def replace_dataset(partial_path, destination, new_cache, cache):
+    """Remplace la copie locale du CSV par le fichier reçu, sauf s'il
+    est identique au précédent (retourne alors None)."""
+    if (new_cache['sha256'] == cache.get('sha256')
+            and os.path.exists(destination)):
+        print("Somme de contrôle inchangée depuis le dernier "
+              "téléchargement.")
+        os.remove(partial_path)
+        # Les validateurs ont pu changer sans que le contenu change
+        save_dataset_cache(new_cache)
+        return None
+    os.replace(partial_path, destination)
+    return new_cache
 
 
-def parse_csv_content(csv_content):
-    """Parse le contenu CSV et retourne une liste
-    de dictionnaires et un set d'IDs."""
-    csv_file = StringIO(csv_content)
-    reader = csv.DictReader(csv_file)
-    violations_list = []
-    ids_set = set()
+def load_dataset_cache(filepath=DATASET_CACHE_FILEPATH):
+    """Charge les validateurs et la somme de contrôle du dernier
+    téléchargement depuis le cache local."""
     try:
-        for row in reader:
-            violations_list.append(row)
-            ids_set.add(row['id_poursuite'])
-    except KeyError as e:
-        print(f"ERREUR: Colonne manquante dans le CSV lors du parsing : {e}")
-        raise
-    return violations_list, ids_set
+        with open(filepath, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        print(f"Cache du jeu de données '{filepath}' non trouvé.")
+    except ValueError as e:
+        print(f"Cache du jeu de données '{filepath}' illisible : {e}")
+    return {}
+
+
+def save_dataset_cache(cache, filepath=DATASET_CACHE_FILEPATH):
+    """Sauvegarde les validateurs et la somme de contrôle
+    du dernier téléchargement."""
+    try:
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        with open(filepath, 'w') as f:
+            json.dump(cache, f, indent=2)
+        print(f"Cache du jeu de données sauvegardé dans '{filepath}'.")
+    except IOError as e:
+        print(f"""Erreur lors de la sauvegarde du cache
+              du jeu de données dans '{filepath}': {e}""")
+
+
+def parse_csv_content(csv_lines):
+    """Parse les lignes du CSV (fichier ouvert ou itérable de lignes) en
+    un seul passage et produit un dictionnaire par contravention."""
+    reader = csv.DictReader(csv_lines)
+    if 'id_poursuite' not in (reader.fieldnames or []):
+        print("ERREUR: Colonne manquante dans le CSV lors du parsing : "
+              "'id_poursuite'")
+        raise KeyError('id_poursuite')
+    yield from reader
 
 
-def update_db():
-    """Télécharge, compare, notifie et met à jour la base de données."""
-    db = Database()
+def update_db(profile=False, source=None):
+    """Télécharge, compare, met à jour la base de données et met en file
+    d'envoi les notifications des nouvelles contraventions.
+
+    Chaque étape est mesurée et la synchronisation est enregistrée dans
+    la table sync_runs (voir sync_stats.py et python data_sync.py
+    --report).
+
+    :param profile: Profile la synchronisation avec cProfile et
+    tracemalloc (voir aussi la variable d'environnement SYNC_PROFILE)
+    :param source: URL ou chemin local du CSV (CSV_URL par défaut)"""
+    db = Database.for_writing()
     config = load_config()
+    sync_settings = load_sync_settings(config)
+    metrics.configure(metrics.load_metrics_settings(config))
+    run = SyncRun(profiling_requested(profile), PROFILE_DIR).start()
+    status, error = RUN_FAILED, None
 
     try:
         print("Début de la mise à jour...")
-        csv_content = download_csv(CSV_URL)
-
-        # Parser les données actuelles
-        current_violations_list, current_ids_set = parse_csv_content(
-                                                    csv_content)
-        print(f"""{len(current_ids_set)}
-              IDs uniques trouvés dans les données téléchargées.""")
-
-        # Charger les anciens IDs connus
-        old_ids_set = load_known_ids()
-        print(f"{len(old_ids_set)} IDs étaient connus précédemment.")
-
-        # Trouver les nouveaux IDs
-        new_ids_set = current_ids_set - old_ids_set
-        print(f"{len(new_ids_set)} nouveaux IDs détectés.")
-
-        # Si de nouveaux IDs sont trouvés, préparer et envoyer l'email
-        if new_ids_set:
-            print("Préparation de la notification "
-                  "pour les nouvelles contraventions...")
-            # Filtrer la liste complète pour obtenir
-            # les détails des nouvelles violations
-            new_violations_details = [
-                violation for violation in current_violations_list
-                if violation['id_poursuite'] in new_ids_set
-            ]
-            # Envoyer l'email
-            if config:
-                print("Tentative d'envoi de l'email...")
-                send_notification_email(new_violations_details, config)
+        db.ensure_schema()
+
+        # Télécharger seulement si le jeu de données a été republié
+        with run.stage("download"):
+            dataset_cache = download_csv(source or CSV_URL,
+                                         load_dataset_cache())
+        if dataset_cache is None:
+            print("Jeu de données inchangé : mise à jour ignorée.")
+            # Les périodes récentes avancent d'un jour à chaque exécution
+            with run.stage("artifacts"):
+                refresh_artifacts(db)
+            status = RUN_UNCHANGED
+            return
+
+        # Chaque ligne est parsée une seule fois et écrite en base au fil
+        # de l'eau. Les nouveaux IDs sont ceux absents de la table avant
+        # le chargement, relevés et mis en file d'envoi des notifications
+        # dans la même transaction.
+        initial_load = not db.has_violations()
+        if initial_load:
+            print("Importation initiale : aucune notification envoyée.")
+        notify_channels = () if initial_load else NOTIFICATION_CHANNELS
+        sync_mode = get_sync_mode(config)
+        with open(DATASET_FILEPATH, 'r', encoding='utf-8',
+                  newline='') as csv_file, run.stage("load") as load:
+            # Le temps du parsing est mesuré à part de celui du chargement
+            rows = run.iter_stage("parse", parse_csv_content(csv_file))
+            if sync_mode == SYNC_MODE_FULL:
+                print("Insertion des données actuelles "
+                      "dans la base de données...")
+                changes = db.insert_data_to_db(
+                    rows, notify_channels, sync_settings['keep_versions'])
             else:
-                print("Notification non envoyée car "
-                      "la configuration n'a pas pu être chargée.")
-            # Publier sur Twitter
-            if config:
-                print("Tentative de publication sur Twitter...")
-                post_new_violations_to_twitter(new_violations_details, config)
-            else:
-                print("Tweet non envoyé car "
-                      "la configuration n'a pas pu être chargée.")
-
-        # Insérer les données actuelles dans la BDD
-        print("Insertion des données actuelles dans la base de données...")
-        db.insert_data_to_db(csv_content)
+                print("Synchronisation incrémentale "
+                      "de la base de données...")
+                changes = db.sync_violations(
+                    rows, notify_channels, sync_settings['keep_versions'])
+            load['rows'] = sum(len(changes[kind]) for kind
+                               in ('inserted', 'updated', 'deleted'))
+        run.counts.update({kind: len(changes[kind]) for kind
+                           in ('inserted', 'updated', 'deleted')})
+        run.counts.update(mode=sync_mode, version=changes['version'],
+                          rows=run.get_stage("parse")['rows'])
         print("Insertion terminée.")
+        print(f"{len(changes['inserted'])} nouveaux IDs détectés.")
+        with run.stage("artifacts"):
+            refresh_artifacts(db)
 
-        # Si l'insertion a réussi, sauvegarder l'état actuel des IDs
-        print("Sauvegarde des IDs actuels...")
-        save_known_ids(current_ids_set)
+        if changes['inserted'] and notify_channels:
+            print("Notifications des nouvelles contraventions "
+                  "mises en file d'envoi.")
+
+        # Le cache n'est enregistré qu'une fois les données chargées
+        save_dataset_cache(dataset_cache)
+        status = RUN_SUCCESS
 
         print("Mise à jour terminée avec succès !")
 
     except requests.RequestException as e:
-        print(f"Échec de la mise à jour : Erreur de téléchargement - {e}")
+        error = f"Erreur de téléchargement - {e}"
+        print(f"Échec de la mise à jour : {error}")
     except sqlite3.Error as e:
-        print(f"Échec de la mise à jour : Erreur de base de données - {e}")
+        error = f"Erreur de base de données - {e}"
+        print(f"Échec de la mise à jour : {error}")
     except Exception as e:
-        print(f"Échec de la mise à jour : Erreur inattendue - {e}")
+        error = f"Erreur inattendue - {e}"
+        print(f"Échec de la mise à jour : {error}")
     finally:
+        run.finish(status, error)
+        record_sync_run(db, run, sync_settings['keep_runs'])
         db.close_connection()
 
 
-def load_known_ids(filepath=KNOWN_IDS_FILEPATH):
-    """Charge les IDs connus depuis un fichier texte dans un set."""
-    known_ids = set()
+def record_sync_run(db, run, keep_runs=None):
+    """
+    Enregistre la synchronisation dans l'historique. Un échec
+    n'interrompt pas la synchronisation.
+
+    :param db: Instance de Database
+    :param run: SyncRun terminée
+    :param keep_runs: Nombre de synchronisations gardées dans
+    l'historique
+    """
     try:
-        with open(filepath, 'r') as f:
-            for line in f:
-                cleaned_line = line.strip()
-                if cleaned_line:
-                    known_ids.add(cleaned_line)
-    except FileNotFoundError:
-        print(f"""Fichier des IDs connus '{filepath}' non trouvé.
-              Création d'un nouveau fichier.""")
-    return known_ids
+        db.record_sync_run(run.as_record(), keep_runs)
+    except sqlite3.Error as e:
+        print(f"Historique de la synchronisation non enregistré : {e}")
 
 
-def save_known_ids(ids_set, filepath=KNOWN_IDS_FILEPATH):
-    """Sauvegarde un set d'IDs dans un fichier texte, un ID par ligne."""
+def print_sync_report(history=REPORT_HISTORY):
+    """
+    Affiche les mesures de la dernière synchronisation, comparées à la
+    médiane des précédentes.
+
+    :param history: Nombre de synchronisations précédentes comparées
+    """
+    db = Database.for_writing()
     try:
-        # S'assure que le répertoire existe
-        os.makedirs(os.path.dirname(filepath), exist_ok=True)
-        with open(filepath, 'w') as f:
-            list_ids = sorted(list(ids_set))
-            for violation_id in list_ids:
-                f.write(f"{violation_id}\n")
-        print(f"IDs connus sauvegardés dans '{filepath}'.")
-    except IOError as e:
-        print(f"""Erreur lors de la sauvegarde des IDs
-              connus dans '{filepath}': {e}""")
+        db.ensure_schema()
+        print(format_report(db.get_sync_runs(history + 1)))
+    finally:
+        db.close_connection()
 
 
-def load_config():
+def refresh_artifacts(db):
     """
-    Charge la configuration :
-    - Paramètres non sensibles depuis config.yaml.
-    - Secrets (SMTP Auth, Twitter API) depuis les variables d'environnement.
+    Régénère les réponses précompressées de l'API. Un échec n'interrompt
+    pas la synchronisation : l'API calcule alors les réponses elle-même.
+
+    :param db: Instance de Database
     """
-    config = {}
-    # Charge la config non sensible depuis config.yaml
     try:
-        with open(CONFIG_FILE, 'r') as f:
-            yaml_config = yaml.safe_load(f)
-            if yaml_config:
-                config.update(yaml_config)
-                if 'email_recipient' not in config:
-                    print(f"""ATTENTION: 'email_recipient'
-                          non trouvé dans '{CONFIG_FILE}'.""")
-                if ('smtp_settings' not in config or
-                    not all(k in config['smtp_settings']
-                            for k in ['host', 'port', 'use_tls'])):
-                    print(f"ATTENTION: Section 'smtp_settings' incomplète "
-                          f"(host, port, use_tls requis) dans '{CONFIG_FILE}'")
-            else:
-                print(f"ATTENTION: Fichier '{CONFIG_FILE}' est vide.")
-        print(f"Configuration non sensible chargée depuis '{CONFIG_FILE}'.")
-    except FileNotFoundError:
-        print(f"""ERREUR: Fichier de configuration '{CONFIG_FILE}' non trouvé.
-              Il est nécessaire pour les paramètres de base.""")
-        return None
-    except yaml.YAMLError as e:
-        print(f"""ERREUR: Impossible de parser le fichier YAML
-              '{CONFIG_FILE}': {e}""")
-        return None
-    except Exception as e:
-        print(f"Erreur inattendue lors de la lecture de '{CONFIG_FILE}': {e}")
-        return None
-    # Lecture des secrets depuis les variables d'environnement
-    print("Chargement des secrets depuis les variables d'environnement...")
-    smtp_settings = config.get('smtp_settings', {})
-    smtp_settings['username'] = os.environ.get('SMTP_USERNAME')
-    smtp_settings['password'] = os.environ.get('SMTP_PASSWORD')
-    config['smtp_settings'] = smtp_settings
-    # Crée le dict pour les clés Twitter s'il n'existe pas
-    twitter_creds = config.get('twitter_api_credentials', {})
-    twitter_creds['api_key'] = os.environ.get('TWITTER_API_KEY')
-    twitter_creds['api_secret'] = os.environ.get('TWITTER_API_SECRET')
-    twitter_creds['access_token'] = os.environ.get('TWITTER_ACCESS_TOKEN')
-    twitter_creds['access_token_secret'] = os.environ.get(
-        'TWITTER_ACCESS_TOKEN_SECRET'
-    )
-    config['twitter_api_credentials'] = twitter_creds
-    # Conversion et vérifications
-    try:
-        config['smtp_settings']['port'] = int(
-            config['smtp_settings'].get('port', 587))
-    except (ValueError, TypeError):
-        print(f"""ATTENTION: Port SMTP('{config['smtp_settings'].get('port')}')
-              invalide dans config.yaml. Utilisation de 587.""")
-        config['smtp_settings']['port'] = 587
-    try:
-        config['smtp_settings']['use_tls'] = bool(
-            config['smtp_settings'].get('use_tls', True))
-    except Exception:
-        print(f"""ATTENTION: Valeur use_tls ('{config['smtp_settings'].get(
-            'use_tls')}') invalide dans config.yaml. Utilisation de True.""")
-        config['smtp_settings']['use_tls'] = True
-    # Vérifie la présence des secrets lus depuis l'environnement
-    if not smtp_settings.get('username') or not smtp_settings.get('password'):
-        print("""ATTENTION: Identifiants SMTP (SMTP_USERNAME, SMTP_PASSWORD)
-              manquants dans les variables d'environnement.
-              L'envoi d'email échouera.""")
-    required_keys = [
-        'api_key',
-        'api_secret',
-        'access_token',
-        'access_token_secret'
-    ]
-    if not all(twitter_creds.get(k) for k in required_keys):
-        print("""ATTENTION: Clés API Twitter manquantes dans les variables
-        d'environnement. La publication Twitter échouera.""")
-    print("Configuration chargée.")
-    return config
-
-
-def send_notification_email(new_violations_details, config):
-    """Envoie un email de notification avec
-     les détails des nouvelles violations."""
-    if not config:
-        print("Configuration non chargée, impossible d'envoyer l'email.")
-        return
-
-    recipient = config.get('email_recipient')
-    smtp_config = config.get('smtp_settings')
-
-    if not recipient or not smtp_config:
-        print("""Configuration email incomplète
-              (destinataire ou paramètres SMTP).""")
-        return
-
-    subject = "Nouvelles contraventions détectées"
-    body_intro = (
-        "Bonjour,\n\n"
-        f"{len(new_violations_details)} nouvelle(s) contravention(s) "
-        "ont été détectée(s) depuis la dernière mise à jour :\n\n"
-    )
-    body_details = ""
-    for violation in new_violations_details:
-        body_details += (
-            f"- Établissement: {violation.get('etablissement', 'N/A')}\n"
-            f"  Date: {violation.get('date', 'N/A')}\n"
-            f"  Description: {violation.get('description', 'N/A')}\n"
-            f"  Adresse: {violation.get('adresse', 'N/A')}\n\n"
-        )
-
-    msg = EmailMessage()
-    msg.set_content(body_intro + body_details)
-    msg['Subject'] = subject
-    msg['From'] = smtp_config.get('username')
-    msg['To'] = recipient
+        artifacts.build_artifacts(db)
+    except (OSError, sqlite3.Error) as e:
+        print(f"Artefacts non générés : {e}")
+
 
+def run_sync(settings=None, force=False, profile=False):
+    """
+    Lance update_db() si aucun autre processus de l'hôte n'est en train
+    de synchroniser et, sauf si force est vrai, si la dernière
+    synchronisation a commencé il y a plus de 'min_interval' secondes.
+    Quel que soit le nombre de workers web dont le planificateur se
+    déclenche, la synchronisation n'est donc faite qu'une fois.
+
+    :param settings: Paramètres de load_sync_settings()
+    :param force: Ignore le délai minimal (lancement manuel)
+    :param profile: Profile la synchronisation (voir update_db())
+    :return: True si la synchronisation a été lancée
+    """
+    settings = settings or load_sync_settings(load_config())
+    lock = FileLock(settings['lock_file'])
+    if not lock.acquire():
+        print("Synchronisation déjà en cours dans un autre processus : "
+              "ignorée.")
+        return False
     try:
-        server = None
-        host = smtp_config.get('host')
-        port = smtp_config.get('port')
-        use_tls = smtp_config.get('use_tls', False)
-        username = smtp_config.get('username')
-        password = smtp_config.get('password')
-
-        print(f"Tentative de connexion à {host}:{port}...")
-        server = smtplib.SMTP(host, port)
-        if use_tls:
-            server.starttls()
-
-        if username and password:
-            print("Authentification SMTP...")
-            server.login(username, password)
-        else:
-            print("Connexion SMTP sans authentification.")
-
-        print(f"Envoi de l'email à {recipient}...")
-        server.send_message(msg)
-        print("Email envoyé avec succès.")
-
-    except smtplib.SMTPAuthenticationError:
-        print("""ERREUR SMTP: Échec de l'authentification.
-              Vérifiez username/password/mot de passe d'application.""")
-    except smtplib.SMTPException as e:
-        print(f"ERREUR SMTP: Impossible d'envoyer l'email : {e}")
-    except Exception as e:
-        print(f"ERREUR inattendue lors de l'envoi de l'email: {e}")
+        now = datetime.now()
+        last_sync = lock.read_stamp()
+        if (not force and last_sync is not None and
+                (now - last_sync).total_seconds() <
+                settings['min_interval']):
+            print(f"Synchronisation déjà faite à {last_sync:%H:%M:%S} : "
+                  "ignorée.")
+            return False
+        lock.write_stamp(now)
+        update_db(profile, settings.get('source'))
+        return True
     finally:
-        if server:
-            server.quit()
-            print("Connexion SMTP fermée.")
-
-
-def post_new_violations_to_twitter(new_violations_details, config):
-    """Publie le nom des établissements ayant de nouvelles
-    contraventions sur Twitter."""
-    if not config or "twitter_api_credentials" not in config:
-        print("Configuration Twitter non chargée, impossible de tweeter.")
-        return
-    credentials = config.get("twitter_api_credentials")
-    required_keys = ["api_key",
-                     "api_secret",
-                     "access_token",
-                     "access_token_secret"]
-    if not credentials or not all(key in credentials for key in required_keys):
-        print("Configuration Twitter incomplète dans config.yaml.")
-        return
-    if not new_violations_details:
-        print("Aucune nouvelle contravention à tweeter.")
-        return
-    # Extraire les noms des établissements
-    establishment_names = set()
-    for violation in new_violations_details:
-        name = violation.get("etablissement")
-        if name:
-            establishment_names.add(name.strip())
-    if not establishment_names:
-        print("""Aucun nom d'établissement trouvé
-              dans les nouvelles violations.""")
-        return
-    # Construire le message Twitter
-    prefix_message = f"Nouvelle(s) contravention(s) détectées(s) pour : "
-    names_string = ""
-    char_limit = 250  # Limite de caractères pour Twitter moins une marge
-    names_list = sorted(list(establishment_names))
-    first_name = True
-    for name in names_list:
-        separator = "" if first_name else ", "
-        if len(names_string) + len(separator) + len(name) <= char_limit:
-            names_string += separator + name
-            first_name = False
-        else:
-            names_string += separator + "..."
-            break
-    tweet_text = prefix_message + names_string
-    # Authentification et publication via Tweepy
+        lock.release()
+
+
+def run_daemon(config):
+    """
+    Processus de synchronisation dédié : synchronise chaque jour à
+    SYNC_HOUR:SYNC_MINUTE et envoie les notifications en file, hors des
+    processus qui servent les requêtes web (voir 'run_in_web').
+    """
+    settings = load_sync_settings(config)
+    outbox_worker = OutboxWorker(config)
+    outbox_worker.start()
+
+    def scheduled_sync():
+        run_sync(settings)
+        outbox_worker.wake()
+
+    from apscheduler.schedulers.blocking import BlockingScheduler
+    scheduler = BlockingScheduler()
+    scheduler.add_job(scheduled_sync, 'cron', hour=SYNC_HOUR,
+                      minute=SYNC_MINUTE, id='update_db',
+                      replace_existing=True)
+    print(f"Synchronisation planifiée chaque jour à "
+          f"{SYNC_HOUR:02d}:{SYNC_MINUTE:02d}.")
     try:
-        client = tweepy.Client(
-            consumer_key=credentials["api_key"],
-            consumer_secret=credentials["api_secret"],
-            access_token=credentials["access_token"],
-            access_token_secret=credentials["access_token_secret"]
-        )
-        response = client.create_tweet(text=tweet_text)
-        print(f"Tweet publié avec succès : {response.data['text']}")
-        print(f"""Lien du Tweet :
-              https://twitter.com/MrTest4269/status/{response.data['id']}""")
-    except tweepy.TweepyException as e:
-        print(f"Erreur lors de la publication du Tweet : {e}")
-    except Exception as e:
-        print(f"Erreur inattendue lors de la publication du Tweet : {e}")
+        scheduler.start()
+    except (KeyboardInterrupt, SystemExit):
+        print("Arrêt du processus de synchronisation.")
+    finally:
+        outbox_worker.stop()
+
+
+def get_sync_mode(config):
+    """
+    Retourne le mode de synchronisation configuré ('incremental' par
+    défaut, 'full' pour vider et recharger la table à chaque exécution).
+    """
+    mode = (config or {}).get('sync_mode', SYNC_MODE_INCREMENTAL)
+    if mode not in (SYNC_MODE_INCREMENTAL, SYNC_MODE_FULL):
+        print(f"ATTENTION: sync_mode '{mode}' invalide dans "
+              f"'{CONFIG_FILE}'. Utilisation de '{SYNC_MODE_INCREMENTAL}'.")
+        return SYNC_MODE_INCREMENTAL
+    return mode
 
 
 if __name__ == "__main__":
-    update_db()
+    parser = argparse.ArgumentParser(
+        description="Synchronise la base avec le jeu de données des "
+                    "contraventions.")
+    parser.add_argument('--daemon', action='store_true',
+                        help="reste actif et synchronise chaque jour à "
+                             f"{SYNC_HOUR:02d}:{SYNC_MINUTE:02d}")
+    parser.add_argument('--profile', action='store_true',
+                        help="profile la synchronisation (cProfile, "
+                             "tracemalloc) ; équivaut à SYNC_PROFILE=1")
+    parser.add_argument('--report', action='store_true',
+                        help="compare la dernière synchronisation à la "
+                             "médiane des précédentes, sans synchroniser")
+    parser.add_argument('--source',
+                        help="URL ou chemin d'un CSV local à utiliser à la "
+                             "place du jeu de données de la Ville (essais)")
+    parser.add_argument('--history', type=int, default=REPORT_HISTORY,
+                        help="nombre de synchronisations précédentes "
+                             f"comparées par --report ({REPORT_HISTORY} "
+                             "par défaut)")
+    args = parser.parse_args()
+    if args.report:
+        print_sync_report(args.history)
+        raise SystemExit
+    config = load_config()
+    if args.source:
+        config = config or {}
+        config.setdefault('sync', {})['source'] = args.source
+    if args.daemon:
+        run_daemon(config)
+    else:
+        run_sync(load_sync_settings(config), force=True,
+                 profile=args.profile)
+        # Exécution autonome : les notifications en file sont envoyées
+        # une fois la mise à jour terminée
+        OutboxWorker(config).deliver_pending()
@@ -1,113 +1,1231 @@
 import sqlite3
-import csv
-from io import StringIO
+import base64
+import hashlib
+import json
+import queue
+import re
+import threading
+from datetime import datetime, timezone
+from itertools import islice
+import yaml
+from text_unidecode import unidecode
+from metrics import DB_CONNECTIONS_OPENED, timed_query
+
+SCHEMA_FILE = "db/db.sql"
+CONFIG_FILE = "config.yaml"
+
+# Paramètres par défaut des connexions, surchargés par la section
+# 'database' de config.yaml
+DEFAULT_DATABASE_SETTINGS = {
+    'path': 'db/database.db',
+    'pool_size': 8,
+    'pool_timeout': 10,
+    # Connexions en lecture de l'application web
+    'read_pragmas': {
+        'query_only': 1,
+        'mmap_size': 268435456,
+        'cache_size': -16000,
+    },
+    # Connexion d'écriture de la synchronisation
+    'write_pragmas': {
+        'journal_mode': 'wal',
+        'synchronous': 'normal',
+        'cache_size': -64000,
+    },
+}
+
+# Colonnes du CSV, dans l'ordre de la table violations
+VIOLATION_COLUMNS = (
+    'id_poursuite', 'business_id', 'date', 'description', 'adresse',
+    'date_jugement', 'etablissement', 'montant', 'proprietaire',
+    'ville', 'statut', 'date_statut', 'categorie'
+)
+
+# Colonnes exposées par les requêtes de lecture (sans l'empreinte interne)
+VIOLATION_FIELDS = ", ".join(VIOLATION_COLUMNS)
+# Colonnes des résultats qui ne proviennent pas de la table violations
+RANKING_COLUMNS = ('etablissement', 'nombre_infractions')
+SUMMARY_COLUMNS = ('etablissement', 'nombre_infractions', 'montant_total',
+                   'derniere_date')
+OUTBOX_COLUMNS = ('id', 'channel', 'version', 'violation_ids', 'attempts')
+# Colonnes de l'historique des synchronisations (hors id et run_id)
+SYNC_RUN_COLUMNS = ('started_at', 'status', 'mode', 'version', 'rows',
+                    'inserted', 'updated', 'deleted', 'wall_seconds',
+                    'cpu_seconds', 'max_rss_kib', 'profiled', 'error')
+SYNC_STAGE_COLUMNS = ('stage', 'wall_seconds', 'cpu_seconds', 'peak_kib',
+                      'max_rss_kib', 'rows')
+
+# Types de modifications d'un chargement (clés du dictionnaire des
+# changements et valeurs de dataset_changes.change)
+CHANGE_KINDS = ('inserted', 'updated', 'deleted')
+
+# États des notifications de la table notification_outbox
+NOTIFICATION_PENDING = "pending"
+NOTIFICATION_SENT = "sent"
+NOTIFICATION_FAILED = "failed"
+
+INSERT_VIOLATION_QUERY = """
+    INSERT INTO {table} (
+        id_poursuite, business_id, date, description, adresse,
+        date_jugement, etablissement, montant, proprietaire,
+        ville, statut, date_statut, categorie, date_iso, row_hash
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+UPDATE_VIOLATION_QUERY = """
+    UPDATE violations SET
+        business_id = ?, date = ?, description = ?, adresse = ?,
+        date_jugement = ?, etablissement = ?, montant = ?,
+        proprietaire = ?, ville = ?, statut = ?, date_statut = ?,
+        categorie = ?, date_iso = ?, row_hash = ?
+    WHERE id_poursuite = ?
+"""
+
+# Tables dans lesquelles le rechargement complet est préparé avant l'échange
+STAGING_TABLE = "violations_staging"
+FTS_TABLE = "violations_fts"
+FTS_STAGING_TABLE = "violations_fts_staging"
+# Taille des lots d'insertion (executemany)
+INSERT_BATCH_SIZE = 1000
+# Nombre d'IDs par requête IN (...), sous la limite de paramètres SQLite
+IDS_BATCH_SIZE = 500
+# Nombre de lignes lues à la fois par les itérateurs de résultats
+FETCH_CHUNK_SIZE = 500
+
+# Champ de l'index plein texte associé à chaque type de recherche
+SEARCH_COLUMNS = {
+    'etablissement': 'etablissement',
+    'proprietaire': 'proprietaire',
+    'rue': 'adresse'
+}
+
+INSERT_FTS_QUERY = """
+    INSERT INTO {table} (rowid, etablissement, proprietaire, adresse)
+    VALUES (?, ?, ?, ?)
+"""
+
+# Index secondaires de la table violations : (nom, colonnes). Ils sont
+# construits après le chargement de la table de staging, sous l'un des
+# deux jeux de noms alternés pour ne pas entrer en conflit avec ceux de
+# la table en service.
+VIOLATION_INDEXES = (
+    ('idx_violations_date', 'date_iso'),
+    ('idx_violations_etablissement_date', 'etablissement, date_iso'),
+    ('idx_violations_business_date', 'business_id, date_iso'),
+)
+# Index remplacés par les précédents, supprimés par ensure_schema
+OBSOLETE_INDEXES = ('idx_violations_etablissement',)
+INDEX_NAME_SUFFIXES = ('', '_b')
+
+
+def batched(iterable, size):
+    """
+    Découpe un itérable en listes d'au plus `size` éléments.
+
+    :param iterable: Itérable à découper
+    :param size: Taille maximale de chaque lot
+    :return: Générateur de listes
+    """
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def iter_tuples(cursor, chunk_size=FETCH_CHUNK_SIZE):
+    """
+    Parcourt les résultats d'une requête par blocs de chunk_size lignes,
+    sans charger tout le résultat en mémoire. Les lignes sont les tuples
+    produits par sqlite3, sans autre allocation.
+
+    :param cursor: Curseur sur lequel la requête a été exécutée
+    :param chunk_size: Nombre de lignes lues à la fois
+    :return: Générateur de tuples
+    """
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield from rows
+
+
+def iter_rows(cursor, columns=None, chunk_size=FETCH_CHUNK_SIZE):
+    """
+    Comme iter_tuples(), mais chaque ligne est convertie en dictionnaire.
+
+    :param cursor: Curseur sur lequel la requête a été exécutée
+    :param columns: Noms des colonnes, connus d'avance (par défaut, lus
+    dans cursor.description)
+    :param chunk_size: Nombre de lignes lues à la fois
+    :return: Générateur de dictionnaires (colonne -> valeur)
+    """
+    if columns is None:
+        columns = [desc[0] for desc in cursor.description]
+    for row in iter_tuples(cursor, chunk_size):
+        yield dict(zip(columns, row))
+
+
+def iter_result(cursor, columns, columnar=False):
+    """
+    Parcourt les résultats d'une requête dont les colonnes sont connues.
+
+    :param cursor: Curseur sur lequel la requête a été exécutée
+    :param columns: Noms des colonnes
+    :param columnar: Produit des tuples (dans l'ordre de columns)
+    plutôt que des dictionnaires
+    :return: Générateur de tuples ou de dictionnaires
+    """
+    if columnar:
+        return iter_tuples(cursor)
+    return iter_rows(cursor, columns)
+
+
+def encode_cursor(values):
+    """
+    Encode une position de pagination en curseur opaque.
+
+    :param values: Valeurs des clés de tri de la dernière ligne lue
+    :return: Curseur (base64 URL-safe)
+    """
+    payload = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    """
+    Décode un curseur produit par encode_cursor().
+
+    :param cursor: Curseur opaque
+    :param size: Nombre de valeurs attendues
+    :return: Liste des valeurs des clés de tri
+    :raises ValueError: Si le curseur est invalide
+    """
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(cursor + padding))
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        # Le détail du décodage n'est pas renvoyé au client de l'API
+        raise ValueError("Curseur invalide.") from e
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Curseur invalide.")
+    return values
+
+
+def fold_text(text):
+    """
+    Normalise un texte pour la recherche : sans accents et en minuscules.
+
+    :param text: Texte à normaliser
+    :return: Texte normalisé ("Café" devient "cafe")
+    """
+    return unidecode(text or "").lower()
+
+
+def to_iso_date(date_str):
+    """
+    Convertit une date du CSV au format 'YYYYMMDD' en 'YYYY-MM-DD'.
+
+    :param date_str: Date au format 'YYYYMMDD'
+    :return: Date au format ISO 8601 ou None si le format est invalide
+    """
+    if not date_str or len(date_str) != 8 or not date_str.isdigit():
+        return None
+    return f"{date_str[:4]}-{date_str[4:6]}-{date_str[6:]}"
+
+
+def compute_row_hash(row):
+    """
+    Calcule l'empreinte du contenu d'une ligne du CSV.
+    Deux lignes ayant la même empreinte sont considérées identiques.
+
+    :param row: Dictionnaire représentant une ligne du CSV
+    :return: Empreinte hexadécimale (SHA-1)
+    """
+    content = "\x1f".join(str(row[column]) for column in VIOLATION_COLUMNS)
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+def load_database_settings(config_file=CONFIG_FILE):
+    """
+    Charge la section 'database' de config.yaml, complétée par
+    les valeurs par défaut.
+
+    :param config_file: Chemin vers le fichier de configuration
+    :return: Dictionnaire des paramètres de connexion
+    """
+    settings = {key: (dict(value) if isinstance(value, dict) else value)
+                for key, value in DEFAULT_DATABASE_SETTINGS.items()}
+    try:
+        with open(config_file, 'r') as f:
+            yaml_config = yaml.safe_load(f) or {}
+    except (OSError, yaml.YAMLError) as e:
+        print(f"ATTENTION: Impossible de lire '{config_file}' ({e}). "
+              "Paramètres de base de données par défaut utilisés.")
+        return settings
+    for key, value in (yaml_config.get('database') or {}).items():
+        if isinstance(settings.get(key), dict) and isinstance(value, dict):
+            settings[key].update(value)
+        else:
+            settings[key] = value
+    return settings
+
+
+def connect(db_path, pragmas=None, check_same_thread=True):
+    """
+    Ouvre une connexion SQLite et lui applique des PRAGMAs.
+
+    :param db_path: Chemin vers le fichier de la base de données SQLite
+    :param pragmas: Dictionnaire {nom: valeur} des PRAGMAs à appliquer
+    :param check_same_thread: False pour partager la connexion entre threads
+    :return: Objet de connexion SQLite
+    """
+    connection = sqlite3.connect(db_path,
+                                 check_same_thread=check_same_thread)
+    for name, value in (pragmas or {}).items():
+        if not re.fullmatch(r'\w+', str(name)) or \
+                not re.fullmatch(r'-?\w+', str(value)):
+            raise ValueError(f"PRAGMA invalide : {name} = {value}")
+        connection.execute(f"PRAGMA {name} = {value}")
+    DB_CONNECTIONS_OPENED.inc()
+    return connection
+
+
+class ConnectionPool:
+    """
+    Pool de connexions SQLite réutilisées d'une requête à l'autre.
+    Les connexions sont ouvertes à la demande, jusqu'à `size`, et
+    gardent leur cache de pages entre les requêtes.
+    """
+    def __init__(self, db_path, size=8, pragmas=None, timeout=10):
+        """
+        :param db_path: Chemin vers le fichier de la base de données SQLite
+        :param size: Nombre maximal de connexions ouvertes
+        :param pragmas: PRAGMAs appliqués à chaque nouvelle connexion
+        :param timeout: Attente maximale (secondes) d'une connexion libre
+        """
+        self.db_path = db_path
+        self.size = size
+        self.pragmas = pragmas or {}
+        self.timeout = timeout
+        # LIFO : la connexion la plus récemment utilisée a le cache
+        # le plus chaud
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Emprunte une connexion au pool, en ouvre une nouvelle si la
+        limite n'est pas atteinte, sinon attend qu'une se libère.
+
+        :return: Objet de connexion SQLite
+        """
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._opened < self.size:
+                self._opened += 1
+                try:
+                    return connect(self.db_path, self.pragmas,
+                                   check_same_thread=False)
+                except Exception:
+                    self._opened -= 1
+                    raise
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError(
+                "Aucune connexion disponible dans le pool.")
+
+    def release(self, connection):
+        """
+        Rend une connexion au pool.
+
+        :param connection: Connexion empruntée avec acquire()
+        """
+        if connection.in_transaction:
+            connection.rollback()
+        self._idle.put(connection)
+
+    def close_all(self):
+        """
+        Ferme les connexions inactives du pool.
+        """
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            connection.close()
+            with self._lock:
+                self._opened -= 1
 
 
 class Database:
     """
     Classe pour gérer les interactions avec la base de données SQLite.
     """
-    def __init__(self, db_path='db/database.db'):
+    def __init__(self, db_path=DEFAULT_DATABASE_SETTINGS['path'],
+                 pool=None, pragmas=None):
         """
         Initialise la classe avec le chemin de la base de données.
 
         :param db_path: Chemin vers le fichier de la base de données SQLite
+        :param pool: ConnectionPool optionnel dans lequel emprunter
+        la connexion
+        :param pragmas: PRAGMAs appliqués à une connexion hors pool
         """
         self.db_path = db_path
+        self.pool = pool
+        self.pragmas = pragmas
         self.connection = None
 
+    @classmethod
+    def for_writing(cls, settings=None):
+        """
+        Crée l'instance utilisée par la synchronisation, avec sa propre
+        connexion d'écriture configurée (journal WAL, etc.).
+
+        :param settings: Paramètres issus de load_database_settings()
+        :return: Instance de Database
+        """
+        settings = settings or load_database_settings()
+        return cls(settings['path'], pragmas=settings['write_pragmas'])
+
     def get_connection(self):
         """
         Retourne une connexion à la base de données.
-        Crée une nouvelle connexion si nécessaire.
+        Emprunte une connexion au pool ou en crée une nouvelle
+        si nécessaire.
 
         :return: Objet de connexion SQLite
         """
         if self.connection is None:
-            self.connection = sqlite3.connect(self.db_path)
+            if self.pool is not None:
+                self.connection = self.pool.acquire()
+            else:
+                self.connection = connect(self.db_path, self.pragmas)
         return self.connection
 
     def close_connection(self):
         """
-        Ferme la connexion à la base de données si elle existe.
+        Ferme la connexion à la base de données si elle existe,
+        ou la rend au pool.
         """
         if self.connection is not None:
-            self.connection.close()
+            if self.pool is not None:
+                self.pool.release(self.connection)
+            else:
+                self.connection.close()
+            self.connection = None
+
+    @timed_query
+    def ensure_schema(self, schema_file=SCHEMA_FILE):
+        """
+        Crée les tables manquantes et ajoute les colonnes introduites
+        après la création initiale de la base.
+
+        :param schema_file: Chemin vers le script SQL du schéma
+        """
+        conn = self.get_connection()
+        with open(schema_file, 'r') as f:
+            conn.executescript(f.read())
+        columns = {row[1] for row in
+                   conn.execute("PRAGMA table_info(violations)")}
+        if 'row_hash' not in columns:
+            conn.execute("ALTER TABLE violations ADD COLUMN row_hash TEXT")
+        if 'date_iso' not in columns:
+            conn.execute("ALTER TABLE violations ADD COLUMN date_iso TEXT")
+            conn.execute("""
+                UPDATE violations
+                SET date_iso = substr(date, 1, 4) || '-' ||
+                               substr(date, 5, 2) || '-' ||
+                               substr(date, 7, 2)
+                WHERE length(date) = 8
+            """)
+        version_columns = {row[1] for row in
+                           conn.execute("PRAGMA table_info(dataset_versions)")}
+        if 'initial_load' not in version_columns:
+            conn.execute("ALTER TABLE dataset_versions ADD COLUMN "
+                         "initial_load INTEGER NOT NULL DEFAULT 0")
+            # Première version, si elle n'a fait qu'ajouter des lignes
+            conn.execute("""
+                UPDATE dataset_versions SET initial_load = 1
+                WHERE version = (SELECT MIN(version) FROM dataset_versions)
+                  AND updated = 0 AND deleted = 0
+            """)
+        cursor = conn.cursor()
+        self._drop_leftover_tables(cursor)
+        for name in OBSOLETE_INDEXES:
+            for suffix in INDEX_NAME_SUFFIXES:
+                cursor.execute(f"DROP INDEX IF EXISTS {name}{suffix}")
+        self._create_violation_indexes(cursor, 'violations',
+                                       self._live_index_suffix(cursor))
+        cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {FTS_TABLE})")
+        if not cursor.fetchone()[0]:
+            self._rebuild_search_index(cursor)
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM establishment_ranking)")
+        if not cursor.fetchone()[0]:
+            self._rebuild_ranking(cursor, 'violations')
+        conn.commit()
 
-    def insert_data_to_db(self, csv_content):
+    @timed_query
+    def insert_data_to_db(self, rows, notify_channels=(), keep_versions=None):
         """
-        Insère les données du CSV dans la table violations de la base SQLite.
+        Recharge entièrement la table violations à partir du CSV.
+        Les lignes sont insérées par lots dans une table de staging,
+        indexée après le chargement, puis échangée avec la table en
+        service dans une transaction de quelques millisecondes. Les
+        lecteurs ne voient donc jamais de données partielles.
 
-        :param csv_content: Contenu texte du fichier CSV
+        :param rows: Itérable de dictionnaires (lignes du CSV)
+        :param notify_channels: Canaux de notification (voir
+        notifications.py) des nouvelles violations, mises en file
+        d'envoi dans la transaction de l'échange
+        :param keep_versions: Nombre de versions gardées dans le journal
+        des modifications (None pour tout garder)
+        :return: Dictionnaire des listes d'IDs 'inserted', 'updated'
+        et 'deleted' par rapport à la table remplacée, et numéro de la
+        nouvelle 'version' du jeu de données (None si rien n'a changé)
         """
+        conn = self.get_connection()
+        cursor = conn.cursor()
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-
-            cursor.execute("DELETE FROM violations")
-            csv_file = StringIO(csv_content)
-            reader = csv.DictReader(csv_file)
-
-            insert_query = """
-                INSERT INTO violations (
-                    id_poursuite, business_id, date, description, adresse,
-                    date_jugement, etablissement, montant, proprietaire,
-                    ville, statut, date_statut, categorie
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """
+            # Chargement de la table de staging (hors de la table lue)
+            self._drop_leftover_tables(cursor)
+            cursor.execute(self._staging_table_ddl(
+                cursor, 'violations', STAGING_TABLE))
+            cursor.execute(self._staging_table_ddl(
+                cursor, FTS_TABLE, FTS_STAGING_TABLE))
+            insert_query = INSERT_VIOLATION_QUERY.format(table=STAGING_TABLE)
+            insert_fts_query = INSERT_FTS_QUERY.format(
+                table=FTS_STAGING_TABLE)
+            for batch in batched(rows, INSERT_BATCH_SIZE):
+                cursor.executemany(insert_query,
+                                   map(self._violation_values, batch))
+                cursor.executemany(insert_fts_query,
+                                   map(self._search_index_values, batch))
+            conn.commit()
 
-            for row in reader:
-                cursor.execute(insert_query, (
-                    row['id_poursuite'],
-                    row['business_id'],
-                    row['date'],
-                    row['description'],
-                    row['adresse'],
-                    row['date_jugement'],
-                    row['etablissement'],
-                    row['montant'],
-                    row['proprietaire'],
-                    row['ville'],
-                    row['statut'],
-                    row['date_statut'],
-                    row['categorie']
-                ))
+            # Index construits une fois les données chargées
+            live_suffix = self._live_index_suffix(cursor)
+            staging_suffix = next(suffix for suffix in INDEX_NAME_SUFFIXES
+                                  if suffix != live_suffix)
+            self._create_violation_indexes(cursor, STAGING_TABLE,
+                                           staging_suffix)
+            conn.commit()
 
+            # Échange atomique : seule cette transaction verrouille
+            # la table lue par l'application. Les différences avec la
+            # table en service sont relevées dans la même transaction.
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("SELECT NOT EXISTS (SELECT 1 FROM violations)")
+            initial_load = bool(cursor.fetchone()[0])
+            changes = self._staging_changes(cursor)
+            self._rebuild_ranking(cursor, STAGING_TABLE)
+            changes['version'] = self._stamp_dataset_version(
+                cursor, changes, initial_load)
+            self._record_changes(cursor, changes, keep_versions)
+            self._enqueue_notifications(cursor, changes, notify_channels)
+            cursor.execute("ALTER TABLE violations RENAME TO violations_old")
+            cursor.execute(f"ALTER TABLE {STAGING_TABLE} "
+                           "RENAME TO violations")
+            cursor.execute(f"ALTER TABLE {FTS_TABLE} "
+                           f"RENAME TO {FTS_TABLE}_old")
+            cursor.execute(f"ALTER TABLE {FTS_STAGING_TABLE} "
+                           f"RENAME TO {FTS_TABLE}")
+            conn.commit()
+            self._drop_leftover_tables(cursor)
             conn.commit()
             print("Données insérées dans la base avec succès.")
+            return changes
         except sqlite3.Error as e:
+            conn.rollback()
             print(f"Erreur SQLite lors de l'insertion : {e}")
             raise
         except KeyError as e:
+            conn.rollback()
             print(f"Colonne manquante dans le CSV : {e}")
             raise
+        except Exception:
+            # Erreur du flux de lignes (ex. téléchargement interrompu)
+            conn.rollback()
+            raise
 
-    def search_violation(self, search_type, query):
-        if len(query) < 3:
-            return []
+    @timed_query
+    def sync_violations(self, rows, notify_channels=(), keep_versions=None):
         """
-            Recherche les violations selon le type et la requête.
+        Synchronise la table violations avec les lignes du CSV en
+        n'écrivant que les différences. Chaque ligne est comparée à
+        la ligne stockée par id_poursuite et par empreinte de contenu.
 
-            :param search_type: Type de recherche (etablissement,
-            proprietaire, rue)
-            :param query: Chaîne de recherche
-            :return: Liste de violations correspondant à la recherche
+        :param rows: Itérable de dictionnaires (lignes du CSV)
+        :param notify_channels: Canaux de notification (voir
+        notifications.py) des nouvelles violations, mises en file
+        d'envoi dans la transaction de la synchronisation
+        :param keep_versions: Nombre de versions gardées dans le journal
+        des modifications (None pour tout garder)
+        :return: Dictionnaire des listes d'IDs 'inserted', 'updated'
+        et 'deleted', et numéro de la nouvelle 'version' du jeu de
+        données (None si rien n'a changé)
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT id_poursuite, row_hash FROM violations")
+            stored_hashes = dict(cursor.fetchall())
+            initial_load = not stored_hashes
+
+            insert_query = INSERT_VIOLATION_QUERY.format(table='violations')
+            fts_query = INSERT_FTS_QUERY.format(table=FTS_TABLE)
+            inserted_ids = []
+            updated_ids = []
+            # Les lignes sont comparées et écrites par lots au fil du flux
+            for batch in batched(rows, INSERT_BATCH_SIZE):
+                to_insert = []
+                to_update = []
+                to_index = []
+                for row in batch:
+                    values = self._violation_values(row)
+                    id_poursuite = int(values[0])
+                    if id_poursuite not in stored_hashes:
+                        to_insert.append(values)
+                        inserted_ids.append(id_poursuite)
+                    elif stored_hashes.pop(id_poursuite) != values[-1]:
+                        to_update.append(values[1:] + (id_poursuite,))
+                        updated_ids.append(id_poursuite)
+                    else:
+                        continue
+                    to_index.append(self._search_index_values(row))
+                cursor.executemany(insert_query, to_insert)
+                cursor.executemany(UPDATE_VIOLATION_QUERY, to_update)
+                # Index plein texte : les lignes écrites sont réindexées, y
+                # compris une entrée restée orpheline d'une ligne supprimée
+                # hors synchronisation
+                cursor.executemany(
+                    f"DELETE FROM {FTS_TABLE} WHERE rowid = ?",
+                    [(values[0],) for values in to_index])
+                cursor.executemany(fts_query, to_index)
+            # Les IDs restants ne sont plus présents dans le CSV
+            deleted_ids = list(stored_hashes)
+            for query in ("DELETE FROM violations WHERE id_poursuite = ?",
+                          f"DELETE FROM {FTS_TABLE} WHERE rowid = ?"):
+                cursor.executemany(
+                    query, [(id_poursuite,) for id_poursuite in deleted_ids])
+            changes = {
+                'inserted': inserted_ids,
+                'updated': updated_ids,
+                'deleted': deleted_ids
+            }
+            if inserted_ids or updated_ids or deleted_ids:
+                self._rebuild_ranking(cursor, 'violations')
+            changes['version'] = self._stamp_dataset_version(
+                cursor, changes, initial_load)
+            self._record_changes(cursor, changes, keep_versions)
+            self._enqueue_notifications(cursor, changes, notify_channels)
+
+            conn.commit()
+            print(f"Synchronisation incrémentale : "
+                  f"{len(changes['inserted'])} ajout(s), "
+                  f"{len(changes['updated'])} modification(s), "
+                  f"{len(changes['deleted'])} suppression(s).")
+            return changes
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"Erreur SQLite lors de la synchronisation : {e}")
+            raise
+        except KeyError as e:
+            conn.rollback()
+            print(f"Colonne manquante dans le CSV : {e}")
+            raise
+        except Exception:
+            # Erreur du flux de lignes (ex. téléchargement interrompu)
+            conn.rollback()
+            raise
+
+    @timed_query
+    def has_violations(self):
+        """
+        Indique si la table violations contient au moins une ligne.
+
+        :return: True si la table n'est pas vide
         """
         cursor = self.get_connection().cursor()
-        if search_type == "etablissement":
-            sql = "SELECT * FROM violations WHERE etablissement LIKE ?"
-        elif search_type == "proprietaire":
-            sql = "SELECT * FROM violations WHERE proprietaire LIKE ?"
-        elif search_type == "rue":
-            sql = "SELECT * FROM violations WHERE adresse LIKE ?"
-        else:
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM violations)")
+        return bool(cursor.fetchone()[0])
+
+    @timed_query
+    def get_violations_by_ids(self, violation_ids):
+        """
+        Récupère les violations correspondant à une liste d'IDs.
+
+        :param violation_ids: Itérable d'id_poursuite
+        :return: Liste de violations triées par id_poursuite
+        """
+        return self._fetch_violations_by_ids(
+            self.get_connection().cursor(), violation_ids)
+
+    @staticmethod
+    def _fetch_violations_by_ids(cursor, violation_ids):
+        """
+        :param cursor: Curseur SQLite
+        :param violation_ids: Itérable d'id_poursuite
+        :return: Liste de violations triées par id_poursuite
+        """
+        results = []
+        for batch in batched(violation_ids, IDS_BATCH_SIZE):
+            placeholders = ", ".join("?" * len(batch))
+            cursor.execute(f"SELECT {VIOLATION_FIELDS} FROM violations "
+                           f"WHERE id_poursuite IN ({placeholders})", batch)
+            results.extend(iter_rows(cursor, VIOLATION_COLUMNS))
+        return sorted(results, key=lambda row: row['id_poursuite'])
+
+    @timed_query
+    def get_changes_since(self, version):
+        """
+        Résume les modifications de la table violations depuis une
+        version du jeu de données : chaque ID modifié n'apparaît qu'une
+        fois, selon son état final. Une violation ajoutée puis supprimée
+        après cette version n'apparaît pas.
+
+        :param version: Version connue du client
+        :return: Dictionnaire 'version' (version courante), 'inserted' et
+        'updated' (violations actuelles), 'deleted' (IDs), ou None si le
+        journal ne remonte pas jusqu'à cette version
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        # Journal et violations lus dans le même instantané de la base
+        cursor.execute("BEGIN")
+        try:
+            cursor.execute("SELECT MAX(version) FROM dataset_versions")
+            current_version = cursor.fetchone()[0] or 0
+            cursor.execute("SELECT MIN(version) FROM dataset_changes")
+            first_logged = cursor.fetchone()[0]
+            if version < current_version and \
+                    (first_logged is None or version < first_logged - 1):
+                return None
+            cursor.execute("""
+                SELECT id_poursuite, change FROM dataset_changes
+                WHERE version > ?
+                ORDER BY version
+            """, (version,))
+            first_changes = {}
+            last_changes = {}
+            for id_poursuite, change in iter_tuples(cursor):
+                first_changes.setdefault(id_poursuite, change)
+                last_changes[id_poursuite] = change
+            # Le client possède déjà la violation si elle n'a pas été
+            # ajoutée après sa version
+            upserts = {'inserted': [], 'updated': []}
+            deleted_ids = []
+            for id_poursuite, change in last_changes.items():
+                known = first_changes[id_poursuite] != 'inserted'
+                if change == 'deleted':
+                    if known:
+                        deleted_ids.append(id_poursuite)
+                else:
+                    upserts['updated' if known else 'inserted'] \
+                        .append(id_poursuite)
+            return {
+                'version': current_version,
+                'inserted': self._fetch_violations_by_ids(
+                    cursor, upserts['inserted']),
+                'updated': self._fetch_violations_by_ids(
+                    cursor, upserts['updated']),
+                'deleted': sorted(deleted_ids),
+            }
+        finally:
+            conn.commit()
+
+    @timed_query
+    def get_change_log_start(self):
+        """
+        :return: Première version du journal des modifications, ou None
+        s'il est vide
+        """
+        cursor = self.get_connection().cursor()
+        cursor.execute("SELECT MIN(version) FROM dataset_changes")
+        return cursor.fetchone()[0]
+
+    @timed_query
+    def get_new_violations_by_version(self, after_version, limit=None,
+                                      max_violations=None):
+        """
+        Récupère, pour chaque version postérieure à after_version, les
+        violations qu'elle a ajoutées et qui sont toujours présentes.
+        L'importation initiale, qui ajoute toutes les violations, est
+        ignorée.
+
+        :param after_version: Dernière version déjà connue
+        :param limit: Nombre maximal de versions (les plus récentes)
+        :param max_violations: Nombre maximal de violations lues par
+        version (les plus petits id_poursuite)
+        :return: Liste de dictionnaires 'version', 'synced_at',
+        'count' (nombre de violations ajoutées toujours présentes) et
+        'violations', de la plus ancienne à la plus récente version
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("BEGIN")
+        try:
+            cursor.execute("""
+                SELECT version, synced_at FROM dataset_versions
+                WHERE version > ? AND NOT initial_load
+                ORDER BY version DESC
+                LIMIT ?
+            """, (after_version, -1 if limit is None else limit))
+            versions = cursor.fetchall()
+            results = []
+            for version, synced_at in reversed(versions):
+                cursor.execute("""
+                    SELECT c.id_poursuite FROM dataset_changes c
+                    JOIN violations v ON v.id_poursuite = c.id_poursuite
+                    WHERE c.version = ? AND c.change = 'inserted'
+                    ORDER BY c.id_poursuite
+                """, (version,))
+                inserted_ids = [row[0] for row in cursor.fetchall()]
+                results.append({
+                    'version': version,
+                    'synced_at': synced_at,
+                    'count': len(inserted_ids),
+                    'violations': self._fetch_violations_by_ids(
+                        cursor, inserted_ids[:max_violations]),
+                })
+            return results
+        finally:
+            conn.commit()
+
+    @staticmethod
+    def _staging_changes(cursor):
+        """
+        Compare la table de staging à la table violations en service.
+
+        :param cursor: Curseur SQLite
+        :return: Dictionnaire des listes d'IDs 'inserted', 'updated'
+        et 'deleted'
+        """
+        queries = {
+            'inserted': f"""
+                SELECT s.id_poursuite FROM {STAGING_TABLE} s
+                WHERE NOT EXISTS (SELECT 1 FROM violations v
+                                  WHERE v.id_poursuite = s.id_poursuite)
+            """,
+            'updated': f"""
+                SELECT s.id_poursuite FROM {STAGING_TABLE} s
+                JOIN violations v ON v.id_poursuite = s.id_poursuite
+                WHERE v.row_hash IS NOT s.row_hash
+            """,
+            'deleted': f"""
+                SELECT v.id_poursuite FROM violations v
+                WHERE NOT EXISTS (SELECT 1 FROM {STAGING_TABLE} s
+                                  WHERE s.id_poursuite = v.id_poursuite)
+            """
+        }
+        changes = {}
+        for kind, query in queries.items():
+            cursor.execute(query)
+            changes[kind] = [row[0] for row in cursor.fetchall()]
+        return changes
+
+    @timed_query
+    def get_dataset_version(self):
+        """
+        Récupère la dernière version du jeu de données.
+
+        :return: Tuple (version, synced_at), ou (0, None) si aucune
+        synchronisation n'a encore modifié les données. synced_at est
+        un datetime UTC.
+        """
+        cursor = self.get_connection().cursor()
+        cursor.execute("SELECT version, synced_at FROM dataset_versions "
+                       "ORDER BY version DESC LIMIT 1")
+        row = cursor.fetchone()
+        if row is None:
+            return 0, None
+        return row[0], datetime.fromisoformat(row[1])
+
+    @staticmethod
+    def _stamp_dataset_version(cursor, changes, initial_load=False):
+        """
+        Enregistre une nouvelle version du jeu de données si le
+        chargement a modifié des lignes. Doit être appelée dans la
+        transaction du chargement.
+
+        :param cursor: Curseur SQLite
+        :param changes: Dictionnaire des listes d'IDs 'inserted',
+        'updated' et 'deleted'
+        :param initial_load: Vrai si la table violations était vide
+        (importation initiale)
+        :return: Numéro de la nouvelle version, ou None
+        """
+        counts = [len(changes[kind]) for kind in CHANGE_KINDS]
+        if not any(counts):
+            return None
+        synced_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        cursor.execute("""
+            INSERT INTO dataset_versions (synced_at, inserted, updated,
+                                          deleted, initial_load)
+            VALUES (?, ?, ?, ?, ?)
+        """, (synced_at, *counts, int(initial_load)))
+        return cursor.lastrowid
+
+    @staticmethod
+    def _record_changes(cursor, changes, keep_versions=None):
+        """
+        Enregistre dans le journal dataset_changes les IDs modifiés par
+        la nouvelle version et en retire les versions plus anciennes que
+        les keep_versions dernières. Doit être appelée dans la
+        transaction du chargement, après _stamp_dataset_version().
+
+        :param cursor: Curseur SQLite
+        :param changes: Dictionnaire retourné par le chargement
+        :param keep_versions: Nombre de versions gardées dans le journal
+        (None pour tout garder)
+        """
+        if changes['version'] is None:
+            return
+        cursor.executemany("""
+            INSERT INTO dataset_changes (version, id_poursuite, change)
+            VALUES (?, ?, ?)
+        """, ((changes['version'], id_poursuite, kind)
+              for kind in CHANGE_KINDS for id_poursuite in changes[kind]))
+        if keep_versions is not None:
+            # Les clients d'une version retirée reçoivent 410 sur
+            # /changements et rechargent les données
+            cursor.execute("DELETE FROM dataset_changes WHERE version <= ?",
+                           (changes['version'] - max(keep_versions, 1),))
+
+    @staticmethod
+    def _enqueue_notifications(cursor, changes, channels):
+        """
+        Met en file d'envoi (table notification_outbox) la notification
+        des nouvelles violations sur chaque canal. Doit être appelée dans
+        la transaction du chargement : les notifications ne peuvent ni
+        être perdues ni précéder les données.
+
+        :param cursor: Curseur SQLite
+        :param changes: Dictionnaire retourné par le chargement
+        :param channels: Canaux de notification
+        :return: Nombre de notifications mises en file
+        """
+        if not changes['inserted'] or not channels:
+            return 0
+        created_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        violation_ids = json.dumps(sorted(changes['inserted']))
+        cursor.executemany("""
+            INSERT INTO notification_outbox (channel, version, violation_ids,
+                                             created_at, next_attempt_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, [(channel, changes['version'], violation_ids, created_at,
+               created_at) for channel in channels])
+        return len(channels)
+
+    @timed_query
+    def get_due_notifications(self, now, limit):
+        """
+        Récupère les notifications en attente dont l'envoi est dû.
+
+        :param now: Date courante (chaîne ISO 8601, UTC)
+        :param limit: Nombre maximal de notifications
+        :return: Liste de dictionnaires (id, channel, version,
+        violation_ids, attempts), les plus anciennes en premier
+        """
+        cursor = self.get_connection().cursor()
+        cursor.execute("""
+            SELECT id, channel, version, violation_ids, attempts
+            FROM notification_outbox
+            WHERE status = ? AND next_attempt_at <= ?
+            ORDER BY id
+            LIMIT ?
+        """, (NOTIFICATION_PENDING, now, limit))
+        notifications = list(iter_rows(cursor, OUTBOX_COLUMNS))
+        for notification in notifications:
+            notification['violation_ids'] = json.loads(
+                notification['violation_ids'])
+        return notifications
+
+    @timed_query
+    def mark_notifications_sent(self, notification_ids, sent_at):
+        """
+        Marque des notifications comme envoyées.
+
+        :param notification_ids: IDs des notifications
+        :param sent_at: Date de l'envoi (chaîne ISO 8601, UTC)
+        """
+        conn = self.get_connection()
+        conn.executemany("""
+            UPDATE notification_outbox
+            SET status = ?, sent_at = ?, attempts = attempts + 1,
+                last_error = NULL
+            WHERE id = ?
+        """, [(NOTIFICATION_SENT, sent_at, notification_id)
+              for notification_id in notification_ids])
+        conn.commit()
+
+    @timed_query
+    def mark_notifications_failed(self, notification_ids, error,
+                                  next_attempt_at, max_attempts):
+        """
+        Enregistre l'échec de l'envoi de notifications : elles seront
+        retentées à next_attempt_at, ou abandonnées après max_attempts
+        tentatives.
+
+        :param notification_ids: IDs des notifications
+        :param error: Message d'erreur
+        :param next_attempt_at: Date de la prochaine tentative (chaîne
+        ISO 8601, UTC)
+        :param max_attempts: Nombre maximal de tentatives
+        """
+        conn = self.get_connection()
+        conn.executemany("""
+            UPDATE notification_outbox
+            SET attempts = attempts + 1, last_error = ?,
+                next_attempt_at = ?,
+                status = CASE WHEN attempts + 1 >= ? THEN ? ELSE status END
+            WHERE id = ?
+        """, [(error, next_attempt_at, max_attempts, NOTIFICATION_FAILED,
+               notification_id) for notification_id in notification_ids])
+        conn.commit()
+
+    @timed_query
+    def record_sync_run(self, run, keep_runs=None):
+        """
+        Enregistre une synchronisation et ses étapes dans l'historique.
+        Les synchronisations plus anciennes que les keep_runs dernières
+        sont supprimées dans la même transaction.
+
+        :param run: Dictionnaire des colonnes de sync_runs, avec la liste
+        des étapes sous la clé 'stages' (voir SyncRun.as_record())
+        :param keep_runs: Nombre de synchronisations gardées (None pour
+        tout garder)
+        :return: ID de la synchronisation enregistrée
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            INSERT INTO sync_runs ({", ".join(SYNC_RUN_COLUMNS)})
+            VALUES ({", ".join("?" * len(SYNC_RUN_COLUMNS))})
+        """, [run.get(column) for column in SYNC_RUN_COLUMNS])
+        run_id = cursor.lastrowid
+        cursor.executemany(f"""
+            INSERT INTO sync_run_stages (run_id, position,
+                                         {", ".join(SYNC_STAGE_COLUMNS)})
+            VALUES (?, ?, {", ".join("?" * len(SYNC_STAGE_COLUMNS))})
+        """, [(run_id, position,
+               *[stage.get(column) for column in SYNC_STAGE_COLUMNS])
+              for position, stage in enumerate(run['stages'])])
+        if keep_runs is not None:
+            cursor.execute("""
+                SELECT id FROM sync_runs ORDER BY id DESC
+                LIMIT 1 OFFSET ?
+            """, (max(keep_runs, 1),))
+            row = cursor.fetchone()
+            if row is not None:
+                cursor.execute("DELETE FROM sync_run_stages WHERE run_id <= ?",
+                               row)
+                cursor.execute("DELETE FROM sync_runs WHERE id <= ?", row)
+        conn.commit()
+        return run_id
+
+    @timed_query
+    def get_sync_runs(self, limit):
+        """
+        Récupère les dernières synchronisations de l'historique.
+
+        :param limit: Nombre maximal de synchronisations
+        :return: Liste de dictionnaires (id et colonnes de sync_runs, avec
+        la liste des étapes sous la clé 'stages'), la plus récente en
+        premier
+        """
+        cursor = self.get_connection().cursor()
+        cursor.execute(f"""
+            SELECT id, {", ".join(SYNC_RUN_COLUMNS)} FROM sync_runs
+            ORDER BY id DESC LIMIT ?
+        """, (limit,))
+        runs = list(iter_rows(cursor, ('id',) + SYNC_RUN_COLUMNS))
+        for run in runs:
+            cursor.execute(f"""
+                SELECT {", ".join(SYNC_STAGE_COLUMNS)} FROM sync_run_stages
+                WHERE run_id = ? ORDER BY position
+            """, (run['id'],))
+            run['stages'] = list(iter_rows(cursor, SYNC_STAGE_COLUMNS))
+        return runs
+
+    @staticmethod
+    def _rebuild_ranking(cursor, source_table):
+        """
+        Reconstruit le classement des établissements par nombre
+        décroissant d'infractions. Doit être appelée dans la transaction
+        du chargement pour que le classement reste cohérent avec les
+        données.
+
+        :param cursor: Curseur SQLite
+        :param source_table: Table de violations à partir de laquelle
+        calculer le classement
+        """
+        cursor.execute("DELETE FROM establishment_ranking")
+        cursor.execute(f"""
+            INSERT INTO establishment_ranking (
+                rang, etablissement, nombre_infractions
+            )
+            SELECT ROW_NUMBER() OVER (
+                       ORDER BY COUNT(*) DESC, etablissement
+                   ),
+                   etablissement,
+                   COUNT(*)
+            FROM {source_table}
+            WHERE etablissement IS NOT NULL AND etablissement != ''
+            GROUP BY etablissement
+        """)
+
+    @staticmethod
+    def _drop_leftover_tables(cursor):
+        """
+        Supprime les tables laissées par un rechargement interrompu.
+
+        :param cursor: Curseur SQLite
+        """
+        for table in (STAGING_TABLE, "violations_old",
+                      FTS_STAGING_TABLE, f"{FTS_TABLE}_old"):
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+
+    @staticmethod
+    def _staging_table_ddl(cursor, table, staging_table):
+        """
+        Construit l'instruction de création d'une table de staging à
+        partir de la définition actuelle de la table en service.
+
+        :param cursor: Curseur SQLite
+        :param table: Nom de la table en service
+        :param staging_table: Nom de la table de staging
+        :return: Instruction CREATE (VIRTUAL) TABLE pour la table de staging
+        """
+        cursor.execute("SELECT sql FROM sqlite_master "
+                       "WHERE type = 'table' AND name = ?", (table,))
+        return re.sub(rf'^(CREATE (?:VIRTUAL )?TABLE)\s+"?{table}"?',
+                      rf'\1 {staging_table}',
+                      cursor.fetchone()[0])
+
+    @staticmethod
+    def _live_index_suffix(cursor):
+        """
+        Retourne le suffixe des noms d'index de la table violations.
+
+        :param cursor: Curseur SQLite
+        :return: Suffixe utilisé par les index en service
+        """
+        cursor.execute("SELECT name FROM sqlite_master "
+                       "WHERE type = 'index' AND tbl_name = 'violations'")
+        names = {row[0] for row in cursor.fetchall()}
+        for suffix in INDEX_NAME_SUFFIXES:
+            if any(name + suffix in names for name, _ in VIOLATION_INDEXES):
+                return suffix
+        return INDEX_NAME_SUFFIXES[0]
+
+    @staticmethod
+    def _create_violation_indexes(cursor, table, suffix):
+        """
+        Crée les index secondaires manquants sur une table de violations.
+
+        :param cursor: Curseur SQLite
+        :param table: Nom de la table à indexer
+        :param suffix: Suffixe ajouté aux noms d'index
+        """
+        for name, columns in VIOLATION_INDEXES:
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {name}{suffix} "
+                           f"ON {table} ({columns})")
+
+    @staticmethod
+    def _search_index_values(row):
+        """
+        Convertit une ligne du CSV en valeurs normalisées pour l'index
+        plein texte.
+
+        :param row: Dictionnaire représentant une ligne du CSV
+        :return: Tuple (id_poursuite, etablissement, proprietaire, adresse)
+        """
+        return (int(row['id_poursuite']),
+                fold_text(row['etablissement']),
+                fold_text(row['proprietaire']),
+                fold_text(row['adresse']))
+
+    def _rebuild_search_index(self, cursor):
+        """
+        Reconstruit l'index plein texte à partir de la table violations.
+
+        :param cursor: Curseur SQLite
+        """
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        rows = self.get_connection().execute(
+            "SELECT id_poursuite, etablissement, proprietaire, adresse "
+            "FROM violations")
+        columns = ('id_poursuite', 'etablissement', 'proprietaire', 'adresse')
+        for batch in batched(rows, INSERT_BATCH_SIZE):
+            cursor.executemany(
+                INSERT_FTS_QUERY.format(table=FTS_TABLE),
+                (self._search_index_values(dict(zip(columns, row)))
+                 for row in batch))
+
+    @staticmethod
+    def _violation_values(row):
+        """
+        Convertit une ligne du CSV en tuple de valeurs pour la table
+        violations, date normalisée et empreinte de contenu incluses.
+
+        :param row: Dictionnaire représentant une ligne du CSV
+        :return: Tuple (colonnes du CSV..., date_iso, row_hash)
+        """
+        return tuple(row[column] for column in VIOLATION_COLUMNS) + (
+            to_iso_date(row['date']), compute_row_hash(row))
+
+    @timed_query
+    def search_violation(self, search_type, query):
+        """
+        Recherche les violations selon le type et la requête, à l'aide
+        de l'index plein texte. La recherche ignore les accents et la
+        casse ("cafe" trouve "Café") et les résultats sont triés par
+        pertinence.
+
+        :param search_type: Type de recherche (etablissement,
+        proprietaire, rue)
+        :param query: Chaîne de recherche
+        :return: Liste de violations correspondant à la recherche
+        """
+        match = self._search_match(search_type, query)
+        if match is None:
             return []
-        cursor.execute(sql, (f"%{query}%",))
-        results = cursor.fetchall()
-        # Récupére les noms des colonnes
-        columns = [desc[0] for desc in cursor.description]
-        # Convertit chaque tuple en dictionnaire pour jsonify
-        return [dict(zip(columns, row)) for row in results]
+        cursor = self.get_connection().cursor()
+        cursor.execute(f"{self._search_sql()} ORDER BY score, id_poursuite",
+                       (match,))
+        # score est la dernière colonne : zip() l'écarte des dictionnaires
+        return list(iter_rows(cursor, VIOLATION_COLUMNS))
+
+    @timed_query
+    def search_violation_page(self, search_type, query, limit,
+                              after=None, before=None):
+        """
+        Retourne une page des résultats de search_violation(), paginée
+        par clé sur (pertinence, id_poursuite).
+
+        :param search_type: Type de recherche (etablissement,
+        proprietaire, rue)
+        :param query: Chaîne de recherche
+        :param limit: Nombre maximal de violations par page
+        :param after: Curseur de la page suivante
+        :param before: Curseur de la page précédente
+        :return: Tuple (violations, curseur suivant, curseur précédent)
+        """
+        match = self._search_match(search_type, query)
+        if match is None:
+            return [], None, None
+        return self._fetch_page(self._search_sql(), (match,),
+                                ('score', 'id_poursuite'),
+                                limit, after, before)
 
     def get_violations_by_date(self, start_date, end_date):
         """
@@ -115,15 +1233,169 @@ class Database:
 
         :param start_date: Date de début au format ISO 8601 (YYYY-MM-DD)
         :param end_date: Date de fin au format ISO 8601 (YYYY-MM-DD)
-        :return: Liste de violations
+        :return: Liste de violations triées par date
+        """
+        return list(self.iter_violations_by_date(start_date, end_date))
+
+    @timed_query
+    def iter_violations_by_date(self, start_date, end_date, columnar=False):
+        """
+        Comme get_violations_by_date(), mais parcourt les violations par
+        blocs au fur et à mesure de la lecture.
+
+        :param start_date: Date de début au format ISO 8601 (YYYY-MM-DD)
+        :param end_date: Date de fin au format ISO 8601 (YYYY-MM-DD)
+        :param columnar: Produit des tuples dans l'ordre de
+        VIOLATION_COLUMNS plutôt que des dictionnaires
+        :return: Générateur de violations triées par date
         """
         cursor = self.get_connection().cursor()
-        query = "SELECT * FROM violations WHERE date BETWEEN ? AND ?"
+        query = f"SELECT {VIOLATION_FIELDS} FROM violations " \
+            "WHERE date_iso BETWEEN ? AND ? " \
+            "ORDER BY date_iso, id_poursuite"
         cursor.execute(query, (start_date, end_date))
-        results = cursor.fetchall()
+        return iter_result(cursor, VIOLATION_COLUMNS, columnar)
+
+    @timed_query
+    def get_violations_summary_by_date(self, start_date, end_date):
+        """
+        Résume par établissement les violations entre deux dates : nombre
+        de violations, montant total et date de la plus récente.
+
+        :param start_date: Date de début au format ISO 8601 (YYYY-MM-DD)
+        :param end_date: Date de fin au format ISO 8601 (YYYY-MM-DD)
+        :return: Liste de dictionnaires triés par nom d'établissement
+        """
+        cursor = self.get_connection().cursor()
+        cursor.execute("""
+            SELECT etablissement,
+                   COUNT(*) AS nombre_infractions,
+                   SUM(montant) AS montant_total,
+                   MAX(date_iso) AS derniere_date
+            FROM violations
+            WHERE date_iso BETWEEN ? AND ?
+            GROUP BY etablissement
+            ORDER BY etablissement
+        """, (start_date, end_date))
+        return list(iter_rows(cursor, SUMMARY_COLUMNS))
+
+    @timed_query
+    def get_violations_by_date_page(self, start_date, end_date, limit,
+                                    after=None, before=None):
+        """
+        Retourne une page des violations entre deux dates, paginée par
+        clé sur (date, id_poursuite).
+
+        :param start_date: Date de début au format ISO 8601 (YYYY-MM-DD)
+        :param end_date: Date de fin au format ISO 8601 (YYYY-MM-DD)
+        :param limit: Nombre maximal de violations par page
+        :param after: Curseur de la page suivante
+        :param before: Curseur de la page précédente
+        :return: Tuple (violations, curseur suivant, curseur précédent)
+        """
+        sql = f"SELECT {VIOLATION_FIELDS}, date_iso FROM violations " \
+            "WHERE date_iso BETWEEN ? AND ?"
+        return self._fetch_page(sql, (start_date, end_date),
+                                ('date_iso', 'id_poursuite'),
+                                limit, after, before)
+
+    def _fetch_page(self, sql, params, sort_keys, limit,
+                    after=None, before=None):
+        """
+        Exécute une requête paginée par clé (keyset) : seule la page
+        demandée est lue, à partir de la position encodée dans le
+        curseur, sans OFFSET ni lecture des pages précédentes.
+
+        :param sql: Requête SELECT, sans ORDER BY ni LIMIT, dont les
+        colonnes incluent les clés de tri
+        :param params: Paramètres de la requête
+        :param sort_keys: Colonnes de tri, la dernière étant unique
+        :param limit: Nombre maximal de lignes par page
+        :param after: Curseur : lignes situées après cette position
+        :param before: Curseur : lignes situées avant cette position
+        :return: Tuple (lignes, curseur suivant, curseur précédent)
+        :raises ValueError: Si le curseur est invalide
+        """
+        keys = ", ".join(sort_keys)
+        position = after or before
+        where = ""
+        params = tuple(params)
+        if position:
+            values = decode_cursor(position, len(sort_keys))
+            operator = ">" if after else "<"
+            placeholders = ", ".join("?" * len(sort_keys))
+            where = f"WHERE ({keys}) {operator} ({placeholders})"
+            params += tuple(values)
+        direction = "DESC" if before else "ASC"
+        order = ", ".join(f"{key} {direction}" for key in sort_keys)
+        cursor = self.get_connection().cursor()
+        cursor.execute(f"SELECT * FROM ({sql}) {where} "
+                       f"ORDER BY {order} LIMIT ?", params + (limit + 1,))
+        rows = cursor.fetchall()
         columns = [desc[0] for desc in cursor.description]
-        return [dict(zip(columns, row)) for row in results]
+        # La ligne supplémentaire indique s'il reste une page plus loin
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if before:
+            rows.reverse()
+        results = [dict(zip(columns, row)) for row in rows]
+        if not results:
+            return [], None, None
+        has_next = True if before else has_more
+        has_previous = has_more if before else bool(after)
+        next_cursor = encode_cursor(
+            [results[-1][key] for key in sort_keys]) if has_next else None
+        previous_cursor = encode_cursor(
+            [results[0][key] for key in sort_keys]) if has_previous else None
+        return ([self._strip_sort_keys(row) for row in results],
+                next_cursor, previous_cursor)
+
+    @staticmethod
+    def _strip_sort_keys(row):
+        """
+        Retire d'une ligne les colonnes qui ne servent qu'au tri.
+
+        :param row: Dictionnaire représentant une violation
+        :return: Le même dictionnaire, limité aux colonnes du CSV
+        """
+        for key in ('score', 'date_iso'):
+            row.pop(key, None)
+        return row
+
+    @staticmethod
+    def _search_match(search_type, query):
+        """
+        Construit l'expression MATCH de l'index plein texte.
+
+        :param search_type: Type de recherche (etablissement,
+        proprietaire, rue)
+        :param query: Chaîne de recherche
+        :return: Expression MATCH, ou None si la recherche est invalide
+        """
+        column = SEARCH_COLUMNS.get(search_type)
+        folded_query = fold_text(query).strip()
+        # Le tokenizer trigram exige au moins 3 caractères
+        if column is None or len(folded_query) < 3:
+            return None
+        # Recherche de la sous-chaîne exacte dans le champ demandé
+        phrase = folded_query.replace('"', '""')
+        return f'{{{column}}} : "{phrase}"'
 
+    @staticmethod
+    def _search_sql():
+        """
+        :return: Requête de recherche plein texte (sans tri), dont la
+        colonne score est la pertinence bm25 (plus petit = meilleur)
+        """
+        return f"""
+            SELECT {", ".join("v." + c for c in VIOLATION_COLUMNS)},
+                   f.rank AS score
+            FROM {FTS_TABLE} f
+            JOIN violations v ON v.id_poursuite = f.rowid
+            WHERE {FTS_TABLE} MATCH ?
+        """
+
+    @timed_query
     def get_establishment_names(self):
         """
         Récupère une liste triée des noms d'établissements (distinct).
@@ -149,29 +1421,55 @@ class Database:
         :param end_date: Date de fin au format ISO 8601 (YYYY-MM-DD)
         :return: Liste de dictionnaires, chacun représentant une infraction.
         """
+        return list(self.iter_infractions_by_establishment(
+            establishment_name, start_date, end_date))
+
+    @timed_query
+    def iter_infractions_by_establishment(self,
+                                          establishment_name,
+                                          start_date,
+                                          end_date,
+                                          columnar=False):
+        """
+        Comme get_infractions_by_establishment(), mais parcourt les
+        infractions par blocs au fur et à mesure de la lecture.
+        :param establishment_name: Nom de l'établissement.
+        :param start_date: Date de début au format ISO 8601 (YYYY-MM-DD)
+        :param end_date: Date de fin au format ISO 8601 (YYYY-MM-DD)
+        :param columnar: Produit des tuples dans l'ordre de
+        VIOLATION_COLUMNS plutôt que des dictionnaires.
+        :return: Générateur d'infractions.
+        """
         cursor = self.get_connection().cursor()
-        query = "SELECT * FROM violations WHERE etablissement = ?" \
-            "AND date BETWEEN ? AND ? ORDER BY date DESC"
+        query = f"SELECT {VIOLATION_FIELDS} FROM violations " \
+            "WHERE etablissement = ? " \
+            "AND date_iso BETWEEN ? AND ? ORDER BY date_iso DESC"
         cursor.execute(query, (establishment_name, start_date, end_date))
-        results = cursor.fetchall()
-        columns = [desc[0] for desc in cursor.description]
-        return [dict(zip(columns, row)) for row in results]
+        return iter_result(cursor, VIOLATION_COLUMNS, columnar)
 
     def get_establishments_by_infraction_count(self):
         """Récupère les établissements triés par
-           nombre décroissant d'infractions.
+           nombre décroissant d'infractions, depuis le classement
+           précalculé lors de la synchronisation.
         :return: Liste de dictionnaires, chacun contenant
            le nom de l'établissement et le nombre d'infractions.
         """
+        return list(self.iter_establishments_by_infraction_count())
+
+    @timed_query
+    def iter_establishments_by_infraction_count(self, columnar=False):
+        """Comme get_establishments_by_infraction_count(), mais
+           parcourt le classement par blocs au fur et à mesure.
+        :param columnar: Produit des tuples dans l'ordre de
+           RANKING_COLUMNS plutôt que des dictionnaires.
+        :return: Générateur de dictionnaires, chacun contenant
+           le nom de l'établissement et le nombre d'infractions.
+        """
         cursor = self.get_connection().cursor()
         query = """
-            SELECT etablissement, COUNT(*) as nombre_infractions
-            FROM violations
-            WHERE etablissement IS NOT NULL AND etablissement != ''
-            GROUP BY etablissement
-            ORDER BY nombre_infractions DESC;
+            SELECT etablissement, nombre_infractions
+            FROM establishment_ranking
+            ORDER BY rang;
         """
         cursor.execute(query)
-        results = cursor.fetchall()
-        columns = ['etablissement', 'nombre_infractions']
-        return [dict(zip(columns, row)) for row in results]
+        return iter_result(cursor, RANKING_COLUMNS, columnar)
@@ -1,4 +1,4 @@
-CREATE TABLE violations (
+CREATE TABLE IF NOT EXISTS violations (
     id_poursuite INTEGER PRIMARY KEY,
     business_id INTEGER NOT NULL,
     date TEXT NOT NULL,
@@ -11,5 +11,101 @@ CREATE TABLE violations (
     ville TEXT NOT NULL,
     statut TEXT NOT NULL,
     date_statut TEXT NOT NULL,
-    categorie TEXT NOT NULL
-);
\ No newline at end of file
+    categorie TEXT NOT NULL,
+    -- Date de l'infraction normalisée (YYYY-MM-DD), remplie à l'import
+    date_iso TEXT,
+    row_hash TEXT
+);
+
+-- Index plein texte (trigrammes) des champs de recherche, dont le contenu
+-- est normalisé sans accents ni majuscules. rowid = id_poursuite.
+CREATE VIRTUAL TABLE IF NOT EXISTS violations_fts USING fts5(
+    etablissement,
+    proprietaire,
+    adresse,
+    tokenize = 'trigram'
+);
+
+-- Classement des établissements par nombre d'infractions, reconstruit
+-- dans la même transaction que le chargement des violations.
+CREATE TABLE IF NOT EXISTS establishment_ranking (
+    rang INTEGER PRIMARY KEY,
+    etablissement TEXT NOT NULL,
+    nombre_infractions INTEGER NOT NULL
+);
+
+-- Versions du jeu de données : une nouvelle version est enregistrée, dans
+-- la transaction du chargement, à chaque synchronisation qui modifie
+-- la table violations.
+CREATE TABLE IF NOT EXISTS dataset_versions (
+    version INTEGER PRIMARY KEY AUTOINCREMENT,
+    synced_at TEXT NOT NULL,
+    inserted INTEGER NOT NULL,
+    updated INTEGER NOT NULL,
+    deleted INTEGER NOT NULL,
+    -- 1 pour l'importation initiale (table violations vide), qui n'est
+    -- pas diffusée sur /evenements
+    initial_load INTEGER NOT NULL DEFAULT 0
+);
+
+-- Journal des modifications : IDs ajoutés ('inserted'), modifiés
+-- ('updated') et supprimés ('deleted') par chaque version, enregistrés
+-- dans la transaction du chargement (voir l'endpoint /changements).
+CREATE TABLE IF NOT EXISTS dataset_changes (
+    version INTEGER NOT NULL REFERENCES dataset_versions (version),
+    id_poursuite INTEGER NOT NULL,
+    change TEXT NOT NULL,
+    PRIMARY KEY (version, id_poursuite)
+) WITHOUT ROWID;
+
+-- File d'envoi des notifications de nouvelles violations (email, Twitter),
+-- alimentée dans la transaction du chargement et vidée par un worker
+-- en arrière-plan (voir notifications.py).
+CREATE TABLE IF NOT EXISTS notification_outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    channel TEXT NOT NULL,
+    version INTEGER,
+    violation_ids TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TEXT NOT NULL,
+    last_error TEXT,
+    sent_at TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_notification_outbox_due
+    ON notification_outbox (status, next_attempt_at);
+
+-- Historique des synchronisations (voir sync_stats.py) : durée, temps CPU,
+-- mémoire et nombre de lignes de la synchronisation et de chaque étape.
+CREATE TABLE IF NOT EXISTS sync_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at TEXT NOT NULL,
+    status TEXT NOT NULL,
+    mode TEXT,
+    version INTEGER,
+    rows INTEGER,
+    inserted INTEGER,
+    updated INTEGER,
+    deleted INTEGER,
+    wall_seconds REAL NOT NULL,
+    cpu_seconds REAL NOT NULL,
+    max_rss_kib INTEGER,
+    profiled INTEGER NOT NULL DEFAULT 0,
+    error TEXT
+);
+
+CREATE TABLE IF NOT EXISTS sync_run_stages (
+    run_id INTEGER NOT NULL REFERENCES sync_runs (id),
+    position INTEGER NOT NULL,
+    stage TEXT NOT NULL,
+    wall_seconds REAL NOT NULL,
+    cpu_seconds REAL NOT NULL,
+    -- Pic des allocations Python de l'étape (profilage seulement)
+    peak_kib INTEGER,
+    -- Pic de mémoire résidente du processus à la fin de l'étape
+    max_rss_kib INTEGER,
+    rows INTEGER,
+    PRIMARY KEY (run_id, position)
+);
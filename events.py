@@ -0,0 +1,296 @@
+import json
+import queue
+import sqlite3
+import threading
+from collections import deque
+
+from database import Database
+
+# Paramètres du flux /evenements, surchargés par la section 'events' de
+# config.yaml
+DEFAULT_EVENTS_SETTINGS = {
+    # Expose /evenements
+    'enabled': True,
+    # Délai maximal (secondes) avant qu'une nouvelle version du jeu de
+    # données soit diffusée, si la synchronisation a lieu dans un autre
+    # processus
+    'poll_interval': 5,
+    # Événements gardés en mémoire pour la reprise (Last-Event-ID)
+    'history': 50,
+    # Violations détaillées par événement : au-delà, le client obtient
+    # les autres avec /changements
+    'max_violations': 500,
+    # Abonnés simultanés par processus, chacun occupant un thread du
+    # serveur
+    'max_subscribers': 100,
+    # Commentaire envoyé aux abonnés en l'absence d'événement (secondes),
+    # pour garder la connexion ouverte à travers les proxys
+    'keepalive': 15,
+    # Délai de reconnexion conseillé aux clients (millisecondes)
+    'retry_ms': 10000,
+}
+
+EVENT_STREAM_MIMETYPE = "text/event-stream"
+# Types d'événements du flux
+EVENT_NEW_VIOLATIONS = "nouvelles_violations"
+EVENT_RESYNC = "resynchronisation"
+
+# Attente maximale du chargement de l'historique par un nouvel abonné
+READY_TIMEOUT = 10
+_CLOSED = None
+
+
+def load_events_settings(config):
+    """
+    Retourne les paramètres du flux d'événements
+    (DEFAULT_EVENTS_SETTINGS surchargés par la section 'events' de la
+    configuration).
+    """
+    settings = dict(DEFAULT_EVENTS_SETTINGS)
+    settings.update((config or {}).get('events') or {})
+    return settings
+
+
+def format_event(event_id, event_type, data):
+    """
+    :return: Événement au format Server-Sent Events
+    """
+    payload = json.dumps(data, ensure_ascii=False)
+    return f"id: {event_id}\nevent: {event_type}\ndata: {payload}\n\n"
+
+
+def parse_event_id(value):
+    """
+    :param value: En-tête Last-Event-ID
+    :return: Version du jeu de données, ou None si l'en-tête est absent
+    ou invalide
+    """
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+class EventBroadcaster:
+    """
+    Diffuse aux abonnés de /evenements les violations ajoutées par
+    chaque nouvelle version du jeu de données. Un seul thread par
+    processus lit la base, quel que soit le nombre d'abonnés : chaque
+    événement est lu et formaté une fois, puis copié dans la file de
+    chaque abonné.
+
+    L'identifiant d'un événement est la version du jeu de données. Les
+    derniers événements sont gardés en mémoire : un client qui se
+    reconnecte (Last-Event-ID) reçoit ceux qu'il a manqués, ou un
+    événement 'resynchronisation' s'ils ne sont plus disponibles.
+    """
+
+    def __init__(self, db_path, settings=None, pragmas=None):
+        """
+        :param db_path: Chemin de la base de données
+        :param settings: Paramètres de load_events_settings()
+        :param pragmas: PRAGMAs de la connexion de lecture du thread
+        """
+        self.db_path = db_path
+        self.pragmas = pragmas
+        self.settings = settings or dict(DEFAULT_EVENTS_SETTINGS)
+        self.version = None
+        # (version, événement formaté), du plus ancien au plus récent
+        self._events = deque()
+        # Les événements des versions postérieures à celle-ci sont tous
+        # dans _events
+        self._history_start = None
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._ready = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """
+        Démarre le thread de diffusion (au premier abonné).
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run,
+                                            name="event-broadcaster",
+                                            daemon=True)
+            self._thread.start()
+        print("Diffusion des événements démarrée.")
+
+    def wake(self):
+        """Demande une vérification immédiate (après une synchronisation)."""
+        self._wake.set()
+
+    def stop(self, timeout=None):
+        """Arrête la diffusion et termine les flux des abonnés."""
+        self._stop.set()
+        self._wake.set()
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self._subscribers.clear()
+        for subscriber in subscribers:
+            subscriber.put(_CLOSED)
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def subscribe(self, last_event_id=None):
+        """
+        Inscrit un abonné. Les événements postérieurs à last_event_id
+        encore en mémoire sont placés en tête de sa file.
+
+        :param last_event_id: Dernier événement reçu par le client
+        :return: File de l'abonné, ou None si le nombre maximal
+        d'abonnés est atteint
+        """
+        self.start()
+        self._ready.wait(READY_TIMEOUT)
+        subscriber = queue.Queue()
+        with self._lock:
+            if len(self._subscribers) >= self.settings['max_subscribers']:
+                return None
+            if last_event_id is not None and self.version is not None:
+                if self._history_start <= last_event_id <= self.version:
+                    for version, event in self._events:
+                        if version > last_event_id:
+                            subscriber.put(event)
+                else:
+                    subscriber.put(self._resync_event())
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def stream(self, subscriber):
+        """
+        :param subscriber: File retournée par subscribe()
+        :return: Générateur du flux Server-Sent Events de l'abonné,
+        désinscrit à la fermeture de la connexion
+        """
+        try:
+            yield f"retry: {self.settings['retry_ms']}\n\n"
+            while True:
+                try:
+                    event = subscriber.get(timeout=self.settings['keepalive'])
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if event is _CLOSED:
+                    return
+                yield event
+        finally:
+            self.unsubscribe(subscriber)
+
+    def _run(self):
+        db = Database(self.db_path, pragmas=self.pragmas)
+        try:
+            while not self._stop.is_set():
+                try:
+                    self._poll(db)
+                except sqlite3.Error as e:
+                    print(f"Erreur de la diffusion des événements : {e}")
+                finally:
+                    # L'historique est considéré comme chargé même en
+                    # cas d'erreur : les abonnés n'attendent pas
+                    self._ready.set()
+                self._wake.wait(self.settings['poll_interval'])
+                self._wake.clear()
+        finally:
+            db.close_connection()
+
+    def _poll(self, db):
+        """
+        Lit les versions du jeu de données apparues depuis le passage
+        précédent et diffuse leurs événements.
+        """
+        version, _ = db.get_dataset_version()
+        if self.version is None:
+            self._load_history(db, version)
+            return
+        if version < self.version:
+            # Base reconstruite ou restaurée : les versions déjà diffusées
+            # ne correspondent plus aux données
+            print(f"Version du jeu de données revenue de {self.version} à "
+                  f"{version} : historique des événements rechargé.")
+            self._load_history(db, version, resync=True)
+            return
+        if version == self.version:
+            return
+        updates = db.get_new_violations_by_version(
+            self.version, max_violations=self.settings['max_violations'])
+        with self._lock:
+            for update in updates:
+                if not update['count']:
+                    continue
+                event = self._format_update(update)
+                self._remember(update['version'], event)
+                for subscriber in self._subscribers:
+                    subscriber.put(event)
+            self.version = max([version] + [update['version']
+                                            for update in updates])
+        print(f"Version {self.version} du jeu de données diffusée à "
+              f"{self.subscriber_count()} abonné(s).")
+
+    def _load_history(self, db, version, resync=False):
+        """
+        Charge les derniers événements, à rejouer aux clients qui se
+        reconnectent, à la place de ceux gardés en mémoire.
+
+        :param resync: Envoie un événement 'resynchronisation' aux
+        abonnés (la version du jeu de données a reculé)
+        """
+        first_logged = db.get_change_log_start()
+        if first_logged is None:
+            history_start = version
+            updates = []
+        else:
+            history_start = first_logged - 1
+            updates = db.get_new_violations_by_version(
+                history_start, limit=self.settings['history'],
+                max_violations=self.settings['max_violations'])
+            if len(updates) == self.settings['history']:
+                history_start = updates[0]['version'] - 1
+        with self._lock:
+            self._events.clear()
+            self._history_start = history_start
+            for update in updates:
+                if update['count']:
+                    self._remember(update['version'],
+                                   self._format_update(update))
+            self.version = max([version] + [update['version']
+                                            for update in updates])
+            if resync:
+                event = self._resync_event()
+                for subscriber in self._subscribers:
+                    subscriber.put(event)
+
+    def _resync_event(self):
+        return format_event(self.version, EVENT_RESYNC, {
+            'version': self.version,
+            'message': "Événements manqués indisponibles : "
+                       "rechargez les données.",
+        })
+
+    def _remember(self, version, event):
+        self._events.append((version, event))
+        while len(self._events) > self.settings['history']:
+            self._history_start, _ = self._events.popleft()
+
+    @staticmethod
+    def _format_update(update):
+        return format_event(update['version'], EVENT_NEW_VIOLATIONS, {
+            'version': update['version'],
+            'date': update['synced_at'],
+            'nombre': update['count'],
+            'violations': update['violations'],
+        })
@@ -0,0 +1,82 @@
+import os
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """
+    Verrou exclusif non bloquant sur un fichier, partagé par tous les
+    processus de l'hôte (workers gunicorn/uwsgi, processus de
+    synchronisation). Le système le libère si le processus qui le
+    détient s'arrête, même brutalement.
+
+    Le fichier conserve aussi la date du dernier passage enregistré par
+    write_stamp(), lisible par les autres processus.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+
+    def acquire(self):
+        """
+        Tente de prendre le verrou, sans attendre.
+
+        :return: True si le verrou est pris, False s'il est détenu par
+        un autre processus
+        """
+        if self._fd is not None:
+            return True
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        except OSError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    def release(self):
+        """Libère le verrou s'il est détenu."""
+        if self._fd is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def read_stamp(self):
+        """
+        :return: Date enregistrée par write_stamp(), ou None
+        """
+        try:
+            with open(self.path, 'r') as f:
+                return datetime.fromisoformat(f.read().strip())
+        except (OSError, ValueError):
+            return None
+
+    def write_stamp(self, moment):
+        """
+        Enregistre une date dans le fichier. Le verrou doit être détenu.
+
+        :param moment: datetime à enregistrer
+        """
+        data = moment.isoformat().encode('utf-8')
+        os.ftruncate(self._fd, 0)
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        os.write(self._fd, data)
+        os.fsync(self._fd)
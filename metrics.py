@@ -0,0 +1,328 @@
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from types import GeneratorType
+
+# Paramètres de l'instrumentation, surchargés par la section 'metrics'
+# de config.yaml
+DEFAULT_METRICS_SETTINGS = {
+    # Expose /metrics et mesure chaque requête HTTP
+    'enabled': True,
+    # Durée (millisecondes) au-delà de laquelle une méthode de Database
+    # est journalisée ; None pour ne rien journaliser
+    'slow_query_ms': None,
+}
+
+# Type de contenu du format texte de Prometheus
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+METRIC_PREFIX = "checktonresto_"
+
+# Clé de l'environnement WSGI portant la route de la requête
+ROUTE_ENVIRON_KEY = "checktonresto.route"
+UNMATCHED_ROUTE = "non_routee"
+
+# Bornes des histogrammes : durées (secondes) et tailles (octets)
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                    0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = tuple(256 * 4 ** power for power in range(10))
+
+_slow_query_seconds = None
+
+
+def load_metrics_settings(config):
+    """
+    Retourne les paramètres de l'instrumentation
+    (DEFAULT_METRICS_SETTINGS surchargés par la section 'metrics' de
+    la configuration).
+    """
+    settings = dict(DEFAULT_METRICS_SETTINGS)
+    settings.update((config or {}).get('metrics') or {})
+    return settings
+
+
+def configure(settings):
+    """
+    Applique les paramètres de load_metrics_settings() au processus.
+    """
+    global _slow_query_seconds
+    threshold = settings.get('slow_query_ms')
+    _slow_query_seconds = None if threshold is None else threshold / 1000
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"') \
+        .replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"'
+             for name, value in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value):
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+class Counter:
+    """
+    Compteur cumulatif, par combinaison de valeurs des étiquettes.
+    """
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = METRIC_PREFIX + name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield self.name, _format_labels(self.labelnames, labels), value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}",
+                 f"# TYPE {self.name} counter"]
+        lines.extend(f"{name}{labels} {_format_number(value)}"
+                     for name, labels, value in self.samples())
+        return lines
+
+
+class Histogram:
+    """
+    Histogramme à bornes fixes (cumulatives au rendu, comme l'attend
+    Prometheus), par combinaison de valeurs des étiquettes.
+    """
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=DURATION_BUCKETS):
+        self.name = METRIC_PREFIX + name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # étiquettes -> [effectifs par borne (+Inf en dernier), somme]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [
+                    [0] * (len(self.buckets) + 1), 0]
+            state[0][index] += 1
+            state[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}",
+                 f"# TYPE {self.name} histogram"]
+        with self._lock:
+            values = sorted((labels, (list(counts), total))
+                            for labels, (counts, total)
+                            in self._values.items())
+        for labels, (counts, total) in values:
+            cumulative = 0
+            bounds = [_format_number(bound) for bound in self.buckets]
+            for bound, count in zip(bounds + ["+Inf"], counts):
+                cumulative += count
+                label_text = _format_labels(self.labelnames, labels,
+                                            [("le", bound)])
+                lines.append(f"{self.name}_bucket{label_text} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {total:.6f}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class Registry:
+    """
+    Ensemble des métriques du processus, rendues au format texte de
+    Prometheus. Chaque processus (worker web, synchronisation) a ses
+    propres valeurs.
+    """
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_DURATION = REGISTRY.register(Histogram(
+    "http_request_duration_seconds",
+    "Durée des requêtes HTTP, corps de la réponse compris.",
+    ("route", "method")))
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    "http_requests_total", "Requêtes HTTP traitées.",
+    ("route", "method", "status")))
+HTTP_RESPONSE_SIZE = REGISTRY.register(Histogram(
+    "http_response_size_bytes", "Taille du corps des réponses HTTP.",
+    ("route",), buckets=SIZE_BUCKETS))
+DB_QUERY_DURATION = REGISTRY.register(Histogram(
+    "db_query_duration_seconds",
+    "Durée des méthodes de Database, lecture des résultats comprise.",
+    ("method",)))
+DB_QUERY_ROWS = REGISTRY.register(Counter(
+    "db_query_rows_total",
+    "Lignes lues ou écrites par les méthodes de Database.", ("method",)))
+DB_SLOW_QUERIES = REGISTRY.register(Counter(
+    "db_slow_queries_total",
+    "Appels de méthodes de Database plus lents que slow_query_ms.",
+    ("method",)))
+DB_CONNECTIONS_OPENED = REGISTRY.register(Counter(
+    "db_connections_opened_total", "Connexions SQLite ouvertes."))
+
+
+def _result_rows(result):
+    """
+    :return: Nombre de lignes d'un résultat de Database, ou None s'il
+    ne s'agit pas d'une liste de lignes
+    """
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, tuple) and result and \
+            isinstance(result[0], list):
+        # Page : (lignes, curseur suivant, curseur précédent)
+        return len(result[0])
+    if isinstance(result, dict):
+        # Changements d'un chargement : listes d'IDs par type
+        return sum(len(ids) for ids in result.values()
+                   if isinstance(ids, list))
+    return None
+
+
+def _record_query(method, elapsed, rows):
+    DB_QUERY_DURATION.observe(elapsed, method)
+    if rows is not None:
+        DB_QUERY_ROWS.inc(method, amount=rows)
+    if _slow_query_seconds is not None and elapsed >= _slow_query_seconds:
+        DB_SLOW_QUERIES.inc(method)
+        print(f"Requête lente : Database.{method} {elapsed * 1000:.1f} ms"
+              + (f", {rows} lignes" if rows is not None else ""))
+
+
+def _timed_rows(method, rows, elapsed):
+    """
+    Parcourt un générateur de lignes en ne comptant que le temps passé
+    à les produire, et non celui de l'appelant entre deux lignes.
+    """
+    count = 0
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                row = next(rows)
+            except StopIteration:
+                elapsed += time.perf_counter() - start
+                break
+            elapsed += time.perf_counter() - start
+            count += 1
+            yield row
+    finally:
+        rows.close()
+        _record_query(method, elapsed, count)
+
+
+def timed_query(method):
+    """
+    Décorateur des méthodes de Database : mesure leur durée et le nombre
+    de lignes retournées. Pour les méthodes qui retournent un
+    générateur, la mesure se termine quand il est épuisé ou fermé.
+    """
+    name = method.__name__
+
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        result = method(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        if isinstance(result, GeneratorType):
+            return _timed_rows(name, result, elapsed)
+        _record_query(name, elapsed, _result_rows(result))
+        return result
+    return wrapper
+
+
+class _MeteredBody:
+    """
+    Corps d'une réponse diffusée : compte les octets envoyés et mesure
+    la requête quand le serveur ferme la réponse.
+    """
+
+    def __init__(self, body, record):
+        self._body = body
+        self._record = record
+        self._size = 0
+
+    def __iter__(self):
+        for chunk in self._body:
+            self._size += len(chunk)
+            yield chunk
+
+    def close(self):
+        try:
+            close = getattr(self._body, 'close', None)
+            if close is not None:
+                close()
+        finally:
+            self._record(self._size)
+
+
+class WsgiMetrics:
+    """
+    Middleware WSGI qui mesure la durée, le statut et la taille de
+    chaque réponse. La route est celle enregistrée dans l'environnement
+    sous ROUTE_ENVIRON_KEY par l'application (avant la requête).
+
+    Les réponses dont la taille est connue (Content-Length) sont
+    mesurées dès que l'application les retourne et transmises telles
+    quelles au serveur, qui peut ainsi envoyer les fichiers avec
+    sendfile. Les réponses diffusées sont mesurées à leur fermeture.
+    """
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        start = time.perf_counter()
+        response = {}
+
+        def capture_start_response(status, headers, exc_info=None):
+            response['status'] = status.split(" ", 1)[0]
+            response['length'] = next(
+                (value for name, value in headers
+                 if name.lower() == 'content-length'), None)
+            return start_response(status, headers, exc_info)
+
+        def record(size):
+            route = environ.get(ROUTE_ENVIRON_KEY, UNMATCHED_ROUTE)
+            method = environ.get('REQUEST_METHOD', "")
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - start,
+                                          route, method)
+            HTTP_REQUESTS.inc(route, method, response.get('status', ""))
+            HTTP_RESPONSE_SIZE.observe(size, route)
+
+        body = self.wsgi_app(environ, capture_start_response)
+        if response.get('length') is not None:
+            record(int(response['length']))
+            return body
+        return _MeteredBody(body, record)
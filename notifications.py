@@ -0,0 +1,340 @@
+import smtplib
+import threading
+from datetime import datetime, timedelta, timezone
+from email.message import EmailMessage
+from database import Database, load_database_settings
+from locks import FileLock
+
+# Canaux de notification des nouvelles violations
+CHANNEL_EMAIL = "email"
+CHANNEL_TWITTER = "twitter"
+NOTIFICATION_CHANNELS = (CHANNEL_EMAIL, CHANNEL_TWITTER)
+
+# Paramètres du worker d'envoi, surchargés par la section
+# 'notifications' de config.yaml
+DEFAULT_OUTBOX_SETTINGS = {
+    # Délai maximal entre deux passages du worker (secondes)
+    'poll_interval': 60,
+    # Nombre maximal de notifications traitées par passage
+    'batch_size': 100,
+    # Tentatives avant d'abandonner une notification
+    'max_attempts': 8,
+    # Délai avant la première nouvelle tentative, doublé à chaque échec
+    'retry_base_delay': 60,
+    'retry_max_delay': 3600,
+    'smtp_timeout': 30,
+    # Verrou partagé : un seul processus de l'hôte envoie à la fois
+    'lock_file': "db/outbox.lock",
+}
+
+TWITTER_REQUIRED_KEYS = ("api_key",
+                         "api_secret",
+                         "access_token",
+                         "access_token_secret")
+
+
+def utc_now():
+    """
+    :return: Date courante au format des colonnes de notification_outbox
+    """
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+
+def build_notification_email(new_violations_details, config):
+    """Construit l'email de notification avec
+     les détails des nouvelles violations.
+
+    :return: EmailMessage, ou None si la configuration est incomplète"""
+    recipient = (config or {}).get('email_recipient')
+    smtp_config = (config or {}).get('smtp_settings')
+    if not recipient or not smtp_config:
+        print("""Configuration email incomplète
+              (destinataire ou paramètres SMTP).""")
+        return None
+
+    subject = "Nouvelles contraventions détectées"
+    body_intro = (
+        "Bonjour,\n\n"
+        f"{len(new_violations_details)} nouvelle(s) contravention(s) "
+        "ont été détectée(s) depuis la dernière mise à jour :\n\n"
+    )
+    body_details = ""
+    for violation in new_violations_details:
+        body_details += (
+            f"- Établissement: {violation.get('etablissement', 'N/A')}\n"
+            f"  Date: {violation.get('date', 'N/A')}\n"
+            f"  Description: {violation.get('description', 'N/A')}\n"
+            f"  Adresse: {violation.get('adresse', 'N/A')}\n\n"
+        )
+
+    msg = EmailMessage()
+    msg.set_content(body_intro + body_details)
+    msg['Subject'] = subject
+    msg['From'] = smtp_config.get('username')
+    msg['To'] = recipient
+    return msg
+
+
+def build_tweet_text(new_violations_details):
+    """Construit le tweet listant le nom des établissements ayant de
+    nouvelles contraventions.
+
+    :return: Texte du tweet, ou None s'il n'y a aucun nom à publier"""
+    # Extraire les noms des établissements
+    establishment_names = set()
+    for violation in new_violations_details:
+        name = violation.get("etablissement")
+        if name:
+            establishment_names.add(name.strip())
+    if not establishment_names:
+        print("""Aucun nom d'établissement trouvé
+              dans les nouvelles violations.""")
+        return None
+    # Construire le message Twitter
+    prefix_message = "Nouvelle(s) contravention(s) détectées(s) pour : "
+    names_string = ""
+    char_limit = 250  # Limite de caractères pour Twitter moins une marge
+    names_list = sorted(list(establishment_names))
+    first_name = True
+    for name in names_list:
+        separator = "" if first_name else ", "
+        if len(names_string) + len(separator) + len(name) <= char_limit:
+            names_string += separator + name
+            first_name = False
+        else:
+            names_string += separator + "..."
+            break
+    return prefix_message + names_string
+
+
+class SmtpMailer:
+    """
+    Envoie des emails en réutilisant la même connexion SMTP (connexion,
+    STARTTLS et authentification une seule fois) tant qu'elle n'est pas
+    fermée par close() ou par le serveur.
+    """
+
+    def __init__(self, smtp_config, timeout=30):
+        self.smtp_config = smtp_config or {}
+        self.timeout = timeout
+        self._server = None
+
+    def _connect(self):
+        host = self.smtp_config.get('host')
+        port = self.smtp_config.get('port')
+        username = self.smtp_config.get('username')
+        password = self.smtp_config.get('password')
+        print(f"Tentative de connexion à {host}:{port}...")
+        server = smtplib.SMTP(host, port, timeout=self.timeout)
+        try:
+            if self.smtp_config.get('use_tls', False):
+                server.starttls()
+            if username and password:
+                print("Authentification SMTP...")
+                server.login(username, password)
+            else:
+                print("Connexion SMTP sans authentification.")
+        except Exception:
+            server.close()
+            raise
+        self._server = server
+
+    def send(self, message):
+        """
+        Envoie un email, en ouvrant la connexion au besoin.
+
+        :param message: EmailMessage à envoyer
+        :raises smtplib.SMTPException, OSError: En cas d'échec
+        """
+        if self._server is None:
+            self._connect()
+        try:
+            self._server.send_message(message)
+        except smtplib.SMTPServerDisconnected:
+            # Connexion fermée par le serveur depuis le dernier envoi
+            self._server = None
+            self._connect()
+            self._server.send_message(message)
+        print(f"Email envoyé avec succès à {message['To']}.")
+
+    def close(self):
+        """Ferme la connexion SMTP si elle est ouverte."""
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except (smtplib.SMTPException, OSError):
+            self._server.close()
+        self._server = None
+        print("Connexion SMTP fermée.")
+
+
+class OutboxWorker:
+    """
+    Envoie les notifications de la table notification_outbox, hors de
+    la synchronisation : un échec ou une lenteur du serveur SMTP ou de
+    l'API Twitter ne retarde plus la mise à jour des données.
+
+    Les notifications dues d'un même canal sont regroupées en un seul
+    envoi. Un envoi qui échoue est retenté plus tard, avec un délai
+    doublé à chaque échec, jusqu'à 'max_attempts' tentatives.
+    """
+
+    def __init__(self, config, db_settings=None, mailer=None,
+                 twitter_client=None):
+        """
+        :param config: Configuration chargée par settings.load_config()
+        :param db_settings: Paramètres de la base (voir
+        load_database_settings())
+        :param mailer: Objet ayant les méthodes send(message) et close()
+        (SmtpMailer par défaut)
+        :param twitter_client: Client ayant la méthode create_tweet(text)
+        (tweepy.Client créé à la demande par défaut)
+        """
+        self.config = config or {}
+        self.settings = dict(DEFAULT_OUTBOX_SETTINGS)
+        self.settings.update(self.config.get('notifications') or {})
+        self.db_settings = db_settings or load_database_settings()
+        self.mailer = mailer or SmtpMailer(self.config.get('smtp_settings'),
+                                           self.settings['smtp_timeout'])
+        self._twitter_client = twitter_client
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def deliver_pending(self, now=None):
+        """
+        Envoie les notifications dues, par lots de 'batch_size'.
+
+        :param now: Date courante (datetime UTC), pour les tests
+        :return: Nombre de notifications envoyées
+        """
+        lock = FileLock(self.settings['lock_file'])
+        if not lock.acquire():
+            # Un autre processus est en train d'envoyer
+            return 0
+        now = now or datetime.now(timezone.utc)
+        sent = 0
+        db = Database.for_writing(self.db_settings)
+        try:
+            while True:
+                due = db.get_due_notifications(
+                    now.isoformat(timespec='seconds'),
+                    self.settings['batch_size'])
+                if not due:
+                    break
+                for channel in dict.fromkeys(n['channel'] for n in due):
+                    group = [n for n in due if n['channel'] == channel]
+                    sent += self._deliver_group(db, channel, group, now)
+                if len(due) < self.settings['batch_size']:
+                    break
+        finally:
+            db.close_connection()
+            # Rien n'est dû avant le prochain passage
+            self.mailer.close()
+            lock.release()
+        return sent
+
+    def _deliver_group(self, db, channel, group, now):
+        """
+        Envoie en une fois les notifications d'un canal.
+
+        :return: Nombre de notifications envoyées (0 en cas d'échec)
+        """
+        ids = [notification['id'] for notification in group]
+        violation_ids = sorted({violation_id for notification in group
+                                for violation_id
+                                in notification['violation_ids']})
+        try:
+            details = db.get_violations_by_ids(violation_ids)
+            if details:
+                self._deliver(channel, details)
+        except Exception as e:
+            attempts = max(n['attempts'] for n in group) + 1
+            delay = min(self.settings['retry_base_delay']
+                        * 2 ** (attempts - 1),
+                        self.settings['retry_max_delay'])
+            next_attempt_at = now + timedelta(seconds=delay)
+            db.mark_notifications_failed(
+                ids, str(e), next_attempt_at.isoformat(timespec='seconds'),
+                self.settings['max_attempts'])
+            print(f"Échec de l'envoi {channel} (tentative {attempts}/"
+                  f"{self.settings['max_attempts']}) : {e}")
+            return 0
+        db.mark_notifications_sent(ids, utc_now())
+        print(f"Notification {channel} envoyée : {len(details)} "
+              f"nouvelle(s) contravention(s).")
+        return len(ids)
+
+    def _deliver(self, channel, details):
+        """
+        Envoie une notification sur un canal.
+
+        :param channel: Canal de notification
+        :param details: Liste des nouvelles violations
+        :raises Exception: En cas d'échec de l'envoi
+        """
+        if channel == CHANNEL_EMAIL:
+            message = build_notification_email(details, self.config)
+            if message is None:
+                raise ValueError("Configuration email incomplète.")
+            self.mailer.send(message)
+        elif channel == CHANNEL_TWITTER:
+            tweet_text = build_tweet_text(details)
+            if tweet_text is None:
+                return
+            response = self.twitter_client().create_tweet(text=tweet_text)
+            print(f"Tweet publié avec succès : {response.data['text']}")
+        else:
+            raise ValueError(f"Canal de notification inconnu : {channel}")
+
+    def twitter_client(self):
+        """
+        :return: Client Twitter, créé au premier envoi puis réutilisé
+        """
+        if self._twitter_client is None:
+            credentials = self.config.get("twitter_api_credentials") or {}
+            if not all(credentials.get(key)
+                       for key in TWITTER_REQUIRED_KEYS):
+                raise ValueError("Configuration Twitter incomplète.")
+            # Importé au premier tweet seulement : tweepy est lourd à
+            # charger et inutile tant que rien n'est publié
+            import tweepy
+            self._twitter_client = tweepy.Client(
+                consumer_key=credentials["api_key"],
+                consumer_secret=credentials["api_secret"],
+                access_token=credentials["access_token"],
+                access_token_secret=credentials["access_token_secret"]
+            )
+        return self._twitter_client
+
+    def start(self):
+        """Démarre le worker dans un thread en arrière-plan."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run,
+                                        name="outbox-worker", daemon=True)
+        self._thread.start()
+        print("Worker d'envoi des notifications démarré.")
+
+    def wake(self):
+        """Demande un passage immédiat (ex. après une synchronisation)."""
+        self._wake.set()
+
+    def stop(self, timeout=None):
+        """Arrête le worker après le passage en cours."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.deliver_pending()
+            except Exception as e:
+                print(f"Erreur du worker d'envoi des notifications : {e}")
+            self._wake.wait(self.settings['poll_interval'])
+            self._wake.clear()
@@ -0,0 +1,132 @@
+import os
+import yaml
+from dotenv import load_dotenv
+
+# Configuration commune à l'application web et à la synchronisation.
+# Ce module ne dépend que de PyYAML et python-dotenv : les workers web
+# peuvent lire la configuration sans importer la synchronisation ni les
+# notifications.
+
+CONFIG_FILE = "config.yaml"
+# Heure locale de la synchronisation quotidienne
+SYNC_HOUR = 0
+SYNC_MINUTE = 0
+# Coordination des synchronisations entre les processus de l'hôte,
+# surchargée par la section 'sync' de config.yaml
+DEFAULT_SYNC_SETTINGS = {
+    # Planificateur et envoi des notifications démarrés dans chaque
+    # processus de l'application web. À désactiver lorsqu'un processus
+    # dédié s'en charge (python data_sync.py --daemon, ou cron)
+    'run_in_web': True,
+    # Verrou partagé : un seul processus synchronise à la fois
+    'lock_file': "db/sync.lock",
+    # Délai minimal entre deux synchronisations planifiées (secondes)
+    'min_interval': 3600,
+    # Synchronisations gardées dans l'historique (tables sync_runs et
+    # sync_run_stages, voir python data_sync.py --report)
+    'keep_runs': 365,
+    # Versions du jeu de données dont les modifications sont gardées
+    # dans le journal dataset_changes (voir /changements)
+    'keep_versions': 90,
+    # Source du CSV : None pour le jeu de données de la Ville, ou URL
+    # ou chemin d'un fichier local de remplacement (essais)
+    'source': None,
+}
+
+
+def load_sync_settings(config):
+    """
+    Retourne les paramètres de coordination des synchronisations
+    (DEFAULT_SYNC_SETTINGS surchargés par la section 'sync' de la
+    configuration).
+    """
+    settings = dict(DEFAULT_SYNC_SETTINGS)
+    settings.update((config or {}).get('sync') or {})
+    return settings
+
+
+def load_config():
+    """
+    Charge la configuration :
+    - Paramètres non sensibles depuis config.yaml.
+    - Secrets (SMTP Auth, Twitter API) depuis les variables d'environnement.
+    """
+    # Charge les variables d'environnement si le fichier .env existe.
+    # Pour la version déployée, elles seront définies sur
+    # le server d'hébergement.
+    load_dotenv()
+    config = {}
+    # Charge la config non sensible depuis config.yaml
+    try:
+        with open(CONFIG_FILE, 'r') as f:
+            yaml_config = yaml.safe_load(f)
+            if yaml_config:
+                config.update(yaml_config)
+                if 'email_recipient' not in config:
+                    print(f"""ATTENTION: 'email_recipient'
+                          non trouvé dans '{CONFIG_FILE}'.""")
+                if ('smtp_settings' not in config or
+                    not all(k in config['smtp_settings']
+                            for k in ['host', 'port', 'use_tls'])):
+                    print(f"ATTENTION: Section 'smtp_settings' incomplète "
+                          f"(host, port, use_tls requis) dans '{CONFIG_FILE}'")
+            else:
+                print(f"ATTENTION: Fichier '{CONFIG_FILE}' est vide.")
+        print(f"Configuration non sensible chargée depuis '{CONFIG_FILE}'.")
+    except FileNotFoundError:
+        print(f"""ERREUR: Fichier de configuration '{CONFIG_FILE}' non trouvé.
+              Il est nécessaire pour les paramètres de base.""")
+        return None
+    except yaml.YAMLError as e:
+        print(f"""ERREUR: Impossible de parser le fichier YAML
+              '{CONFIG_FILE}': {e}""")
+        return None
+    except Exception as e:
+        print(f"Erreur inattendue lors de la lecture de '{CONFIG_FILE}': {e}")
+        return None
+    # Lecture des secrets depuis les variables d'environnement
+    print("Chargement des secrets depuis les variables d'environnement...")
+    smtp_settings = config.get('smtp_settings', {})
+    smtp_settings['username'] = os.environ.get('SMTP_USERNAME')
+    smtp_settings['password'] = os.environ.get('SMTP_PASSWORD')
+    config['smtp_settings'] = smtp_settings
+    # Crée le dict pour les clés Twitter s'il n'existe pas
+    twitter_creds = config.get('twitter_api_credentials', {})
+    twitter_creds['api_key'] = os.environ.get('TWITTER_API_KEY')
+    twitter_creds['api_secret'] = os.environ.get('TWITTER_API_SECRET')
+    twitter_creds['access_token'] = os.environ.get('TWITTER_ACCESS_TOKEN')
+    twitter_creds['access_token_secret'] = os.environ.get(
+        'TWITTER_ACCESS_TOKEN_SECRET'
+    )
+    config['twitter_api_credentials'] = twitter_creds
+    # Conversion et vérifications
+    try:
+        config['smtp_settings']['port'] = int(
+            config['smtp_settings'].get('port', 587))
+    except (ValueError, TypeError):
+        print(f"""ATTENTION: Port SMTP('{config['smtp_settings'].get('port')}')
+              invalide dans config.yaml. Utilisation de 587.""")
+        config['smtp_settings']['port'] = 587
+    try:
+        config['smtp_settings']['use_tls'] = bool(
+            config['smtp_settings'].get('use_tls', True))
+    except Exception:
+        print(f"""ATTENTION: Valeur use_tls ('{config['smtp_settings'].get(
+            'use_tls')}') invalide dans config.yaml. Utilisation de True.""")
+        config['smtp_settings']['use_tls'] = True
+    # Vérifie la présence des secrets lus depuis l'environnement
+    if not smtp_settings.get('username') or not smtp_settings.get('password'):
+        print("""ATTENTION: Identifiants SMTP (SMTP_USERNAME, SMTP_PASSWORD)
+              manquants dans les variables d'environnement.
+              L'envoi d'email échouera.""")
+    required_keys = [
+        'api_key',
+        'api_secret',
+        'access_token',
+        'access_token_secret'
+    ]
+    if not all(twitter_creds.get(k) for k in required_keys):
+        print("""ATTENTION: Clés API Twitter manquantes dans les variables
+        d'environnement. La publication Twitter échouera.""")
+    print("Configuration chargée.")
+    return config
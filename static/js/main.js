@@ -59,6 +59,144 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
 
+    // Autocomplétion des noms d'établissements
+    const searchTypeSelect = document.getElementById("search_type");
+    const suggestionList = document.getElementById("query-suggestions");
+    // Délai sans frappe avant de demander des suggestions
+    const SUGGESTION_DELAY_MS = 150;
+    const SUGGESTION_LIMIT = 8;
+    const suggestionCache = new Map();
+    let suggestionTimer = null;
+    let suggestionController = null;
+    let activeSuggestion = -1;
+
+    /**
+     * Masque la liste des suggestions.
+     */
+    function hideSuggestions() {
+        if (!suggestionList) return;
+        suggestionList.style.display = "none";
+        suggestionList.innerHTML = "";
+        activeSuggestion = -1;
+        queryInput.setAttribute("aria-expanded", "false");
+    }
+
+    /**
+     * Affiche les suggestions sous le champ de recherche.
+     * @param {Array<string>} names - Noms d'établissements suggérés.
+     */
+    function displaySuggestions(names) {
+        if (!names.length) {
+            hideSuggestions();
+            return;
+        }
+        suggestionList.innerHTML = names.map((name, position) => `
+            <button type="button" class="list-group-item list-group-item-action py-1"
+                    role="option" id="query-suggestion-${position}" data-name="${escapeHTML(name)}">
+                ${escapeHTML(name)}
+            </button>
+        `).join("");
+        activeSuggestion = -1;
+        suggestionList.style.display = "block";
+        queryInput.setAttribute("aria-expanded", "true");
+    }
+
+    /**
+     * Met en évidence une suggestion (navigation au clavier).
+     * @param {number} position - Position de la suggestion, -1 pour aucune.
+     */
+    function highlightSuggestion(position) {
+        const items = suggestionList.querySelectorAll(".list-group-item");
+        items.forEach((item, index) => item.classList.toggle("active", index === position));
+        activeSuggestion = position;
+        if (position >= 0) {
+            queryInput.setAttribute("aria-activedescendant", items[position].id);
+        } else {
+            queryInput.removeAttribute("aria-activedescendant");
+        }
+    }
+
+    /**
+     * Remplit le champ avec une suggestion et lance la recherche.
+     * @param {string} name - Nom d'établissement choisi.
+     */
+    function chooseSuggestion(name) {
+        queryInput.value = name;
+        hideSuggestions();
+        if (checkGenericSearchForm()) {
+            genericSearchForm.submit();
+        }
+    }
+
+    /**
+     * Demande les suggestions du terme saisi. Les réponses sont gardées
+     * en mémoire et une demande en cours est annulée par la suivante.
+     * @param {string} query - Terme saisi.
+     */
+    async function fetchSuggestions(query) {
+        if (suggestionCache.has(query)) {
+            displaySuggestions(suggestionCache.get(query));
+            return;
+        }
+        if (suggestionController) suggestionController.abort();
+        suggestionController = new AbortController();
+        const apiUrlSuggestions = `/etablissements/suggestions?q=${encodeURIComponent(query)}&limit=${SUGGESTION_LIMIT}`;
+        try {
+            const response = await fetch(apiUrlSuggestions, { signal: suggestionController.signal });
+            if (!response.ok) throw new Error(`Erreur HTTP ${response.status}`);
+            const names = await response.json();
+            suggestionCache.set(query, names);
+            // Ignore une réponse arrivée après une nouvelle saisie
+            if (queryInput.value.trim() === query) displaySuggestions(names);
+        } catch (error) {
+            if (error.name !== "AbortError") {
+                console.error("Erreur lors de la récupération des suggestions:", error);
+                hideSuggestions();
+            }
+        }
+    }
+
+    if (queryInput && suggestionList && searchTypeSelect) {
+        queryInput.addEventListener("input", function() {
+            clearTimeout(suggestionTimer);
+            const query = queryInput.value.trim();
+            // Suggestions des noms d'établissements seulement
+            if (!query || searchTypeSelect.value !== "etablissement") {
+                hideSuggestions();
+                return;
+            }
+            suggestionTimer = setTimeout(() => fetchSuggestions(query), SUGGESTION_DELAY_MS);
+        });
+
+        queryInput.addEventListener("keydown", function(event) {
+            const count = suggestionList.querySelectorAll(".list-group-item").length;
+            if (!count) return;
+            if (event.key === "ArrowDown") {
+                event.preventDefault();
+                highlightSuggestion((activeSuggestion + 1) % count);
+            } else if (event.key === "ArrowUp") {
+                event.preventDefault();
+                highlightSuggestion(activeSuggestion <= 0 ? count - 1 : activeSuggestion - 1);
+            } else if (event.key === "Enter" && activeSuggestion >= 0) {
+                event.preventDefault();
+                chooseSuggestion(suggestionList.children[activeSuggestion].dataset.name);
+            } else if (event.key === "Escape") {
+                hideSuggestions();
+            }
+        });
+
+        // mousedown précède la perte du focus du champ (blur)
+        suggestionList.addEventListener("mousedown", function(event) {
+            const item = event.target.closest(".list-group-item");
+            if (item) {
+                event.preventDefault();
+                chooseSuggestion(item.dataset.name);
+            }
+        });
+        queryInput.addEventListener("blur", hideSuggestions);
+        searchTypeSelect.addEventListener("change", hideSuggestions);
+    }
+
     // Gestionnaire de recherche par date 
     const dateSearchForm = document.getElementById('date-search-form');
     const resultsDisplayArea = document.getElementById('quick-search-results');
@@ -139,7 +277,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 resultsDisplayArea.innerHTML = '<p>Chargement du résumé des contraventions...</p>';
                 const startDate = startDateInput.value;
                 const endDate = endDateInput.value;
-                const apiUrlSummary = `/contrevenants?du=${startDate}&au=${endDate}`;
+                const apiUrlSummary = `/contrevenants/resume?du=${startDate}&au=${endDate}`;
 
                 try {
                     const response = await fetch(apiUrlSummary);
@@ -177,45 +315,43 @@ document.addEventListener('DOMContentLoaded', function() {
     /**
      * Affiche le tableau résumé (établissements + compte) basé sur la recherche par date.
      * Rend les noms d'établissements cliquables pour afficher les détails.
-     * @param {Array} summaryViolations - Le tableau des objets de contravention reçus de l'API /contrevenants.
+     * @param {Array} summaryEstablishments - Le résumé par établissement reçu de l'API /contrevenants/resume.
      */
-    function displaySummaryTable(summaryViolations) {
+    function displaySummaryTable(summaryEstablishments) {
          // Stocke ou met à jour les données pour le bouton retour
-         lastSummaryData = summaryViolations;
+         lastSummaryData = summaryEstablishments;
          // Vérification de sécurité pour les dates 
          if (!lastSearchStartDate || !lastSearchEndDate) {
              console.error("Dates de recherche manquantes lors de l'affichage du résumé.");
              resultsDisplayArea.innerHTML = '<p>Erreur interne: Impossible d\'afficher le résumé sans période définie.</p>';
              return;
          }
-        if (!summaryViolations || summaryViolations.length === 0) {
+        if (!summaryEstablishments || summaryEstablishments.length === 0) {
             resultsDisplayArea.innerHTML = `<p>Aucune contravention trouvée pour la période du ${lastSearchStartDate} au ${lastSearchEndDate}.</p>`;
             return;
         }
 
-        // Compte les occurrences par établissement
-        const establishmentCounts = {};
-        for (const violation of summaryViolations) {
-            const establishment = violation.etablissement || 'Établissement non spécifié';
-            establishmentCounts[establishment] = (establishmentCounts[establishment] || 0) + 1;
-        }
-        const establishmentNames = Object.keys(establishmentCounts).sort((a, b) => a.localeCompare(b));
+        // Les comptes sont calculés par le serveur, il ne reste qu'à trier
+        const establishments = [...summaryEstablishments].sort(
+            (a, b) => a.etablissement.localeCompare(b.etablissement));
 
         // Construit le tableau HTML du résumé
         let tableHTML = `
-            <h3>${establishmentNames.length} établissements trouvés</h3>
+            <h3>${establishments.length} établissements trouvés</h3>
             <div class="table-container border rounded">
             <table class="table table-striped table-hover table-sm mb-0">
                 <thead>
                     <tr>
                         <th>Établissement (Cliquez pour détails)</th>
                         <th>Nombre de contraventions</th>
+                        <th>Montant total</th>
+                        <th>Dernière contravention</th>
                     </tr>
                 </thead>
                 <tbody>
         `;
-        for (const establishmentName of establishmentNames) {
-            const count = establishmentCounts[establishmentName];
+        for (const establishment of establishments) {
+            const establishmentName = establishment.etablissement;
             // Bouton pour voir les détails
             tableHTML += `
                 <tr>
@@ -224,7 +360,9 @@ document.addEventListener('DOMContentLoaded', function() {
                             ${escapeHTML(establishmentName)}
                         </button>
                     </td>
-                    <td>${count}</td>
+                    <td>${establishment.nombre_infractions}</td>
+                    <td>${establishment.montant_total}$</td>
+                    <td>${escapeHTML(establishment.derniere_date)}</td>
                 </tr>
             `;
         }
@@ -0,0 +1,132 @@
+import threading
+import time
+from bisect import bisect_left
+
+from database import fold_text
+
+# Nombre de suggestions retournées par défaut et au plus
+DEFAULT_SUGGESTIONS = 10
+MAX_SUGGESTIONS = 50
+# Intervalle (secondes) entre deux vérifications de la version du jeu de
+# données : les autres recherches ne lisent que l'index en mémoire
+VERSION_CHECK_SECONDS = 60
+
+# Supérieur à tout caractère d'un texte normalisé par fold_text() (ASCII)
+_PREFIX_END = "\x7f"
+
+
+def _word_starts(folded_name):
+    """
+    :return: Suffixes du nom commençant à chacun de ses mots, sauf le
+    premier ("cafe du parc" donne "du parc" et "parc")
+    """
+    words = folded_name.split()
+    return [" ".join(words[position:]) for position in range(1, len(words))]
+
+
+def _prefix_range(keys, prefix):
+    """
+    :return: Bornes (début, fin) des clés triées commençant par prefix
+    """
+    start = bisect_left(keys, prefix)
+    return start, bisect_left(keys, prefix + _PREFIX_END, start)
+
+
+class SuggestionIndex:
+    """
+    Index en mémoire des noms d'établissements pour l'autocomplétion :
+    tableaux triés des noms normalisés (sans accents, en minuscules),
+    interrogés par recherche dichotomique sur le préfixe saisi. Les noms
+    dont le début correspond sont proposés avant ceux dont un autre mot
+    correspond ("parc" propose "Parc Deli" avant "Café du Parc").
+
+    L'index est reconstruit quand la version du jeu de données change,
+    vérifiée au plus toutes les VERSION_CHECK_SECONDS secondes (ou à la
+    recherche suivante après expire()).
+    """
+
+    def __init__(self, check_interval=VERSION_CHECK_SECONDS):
+        self.check_interval = check_interval
+        self.version = None
+        # (clés des noms, noms, clés des mots, noms des mots), remplacés
+        # d'un bloc à chaque reconstruction
+        self._arrays = ([], [], [], [])
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def is_stale(self):
+        """
+        :return: True si la version du jeu de données doit être vérifiée
+        """
+        checked_at = self._checked_at
+        return checked_at is None or \
+            time.monotonic() - checked_at >= self.check_interval
+
+    def expire(self):
+        """
+        Force la vérification de la version à la prochaine recherche
+        (après une synchronisation).
+        """
+        self._checked_at = None
+
+    def refresh(self, db):
+        """
+        Reconstruit l'index si la version du jeu de données a changé.
+
+        :param db: Instance de Database
+        :return: Version du jeu de données de l'index
+        """
+        with self._lock:
+            if not self.is_stale():
+                return self.version
+            version, _ = db.get_dataset_version()
+            if version != self.version:
+                self._arrays = self.build(db.get_establishment_names())
+                self.version = version
+            self._checked_at = time.monotonic()
+            return self.version
+
+    @staticmethod
+    def build(names):
+        """
+        :param names: Noms des établissements
+        :return: Tableaux triés de l'index
+        """
+        entries = []
+        word_entries = []
+        for name in names:
+            folded_name = " ".join(fold_text(name).split())
+            if not folded_name:
+                continue
+            entries.append((folded_name, name))
+            word_entries.extend((key, name)
+                                for key in _word_starts(folded_name))
+        entries.sort()
+        word_entries.sort()
+        return ([key for key, _ in entries], [name for _, name in entries],
+                [key for key, _ in word_entries],
+                [name for _, name in word_entries])
+
+    def lookup(self, query, limit=DEFAULT_SUGGESTIONS):
+        """
+        :param query: Début du nom recherché (accents et casse ignorés)
+        :param limit: Nombre maximal de suggestions
+        :return: Noms d'établissements, sans doublons
+        """
+        prefix = " ".join(fold_text(query).split())
+        if not prefix or limit <= 0:
+            return []
+        keys, names, word_keys, word_names = self._arrays
+        suggestions = []
+        seen = set()
+        for sorted_keys, sorted_names in ((keys, names),
+                                          (word_keys, word_names)):
+            start, end = _prefix_range(sorted_keys, prefix)
+            for position in range(start, end):
+                name = sorted_names[position]
+                if name not in seen:
+                    seen.add(name)
+                    suggestions.append(name)
+                    if len(suggestions) == limit:
+                        return suggestions
+        return suggestions
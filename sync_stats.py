@@ -0,0 +1,296 @@
+import cProfile
+import io
+import os
+import pstats
+import statistics
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Variable d'environnement activant le profilage des synchronisations
+# planifiées (équivalent de python data_sync.py --profile)
+PROFILE_ENV_VAR = "SYNC_PROFILE"
+# Nombre de fonctions et de lignes d'allocation affichées par le profilage
+PROFILE_TOP = 25
+
+# États d'une synchronisation de la table sync_runs
+RUN_SUCCESS = "success"
+RUN_UNCHANGED = "unchanged"
+RUN_FAILED = "failed"
+
+# Nombre de synchronisations précédentes comparées par le rapport
+REPORT_HISTORY = 20
+
+_DONE = object()
+
+
+def profiling_requested(flag=False):
+    """
+    :param flag: Option --profile de la ligne de commande
+    :return: True si le profilage est demandé par l'option ou par la
+    variable d'environnement SYNC_PROFILE
+    """
+    value = os.environ.get(PROFILE_ENV_VAR, "").strip().lower()
+    return flag or value not in ("", "0", "false", "non")
+
+
+def max_rss_kib():
+    """
+    :return: Pic de mémoire résidente du processus depuis son démarrage
+    (Kio), ou None si le système ne le fournit pas
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Octets sous macOS, Kio ailleurs
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+class SyncRun:
+    """
+    Mesure les étapes d'une synchronisation (téléchargement, parsing,
+    chargement, artefacts) : durée, temps CPU, mémoire et nombre de
+    lignes, enregistrés ensuite dans la table sync_runs.
+
+    Le pic de mémoire résidente du processus est relevé à la fin de
+    chaque étape. En mode profilage, le pic des allocations Python de
+    chaque étape est mesuré avec tracemalloc et la synchronisation est
+    profilée avec cProfile.
+    """
+
+    def __init__(self, profile=False, profile_dir=None):
+        """
+        :param profile: Active cProfile et tracemalloc
+        :param profile_dir: Dossier où enregistrer le profil (.prof)
+        """
+        self.profile = profile
+        self.profile_dir = profile_dir
+        self.started_at = None
+        self.stages = []
+        self.status = None
+        self.error = None
+        self.counts = {}
+        self.wall_seconds = None
+        self.cpu_seconds = None
+        self.max_rss_kib = None
+        self._start = None
+        self._profiler = None
+        self._current = None
+
+    def start(self):
+        self.started_at = datetime.now(timezone.utc).isoformat(
+            timespec='seconds')
+        self._start = (time.perf_counter(), time.process_time())
+        if self.profile:
+            tracemalloc.start()
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        return self
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Mesure une étape. Le dictionnaire produit permet d'en indiquer
+        le nombre de lignes (clé 'rows').
+        """
+        record = {'stage': name, 'rows': None, 'peak_kib': None}
+        parent, self._current = self._current, record
+        nested = {'wall': 0.0, 'cpu': 0.0}
+        record['_nested'] = nested
+        if self.profile:
+            tracemalloc.reset_peak()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            # Le temps des étapes imbriquées (iter_stage) n'est compté
+            # qu'une fois, dans leur propre mesure
+            record['wall_seconds'] = \
+                time.perf_counter() - wall - nested['wall']
+            record['cpu_seconds'] = \
+                time.process_time() - cpu - nested['cpu']
+            if self.profile:
+                record['peak_kib'] = \
+                    tracemalloc.get_traced_memory()[1] // 1024
+            record['max_rss_kib'] = max_rss_kib()
+            del record['_nested']
+            self._current = parent
+            self.stages.append(record)
+
+    def iter_stage(self, name, iterable):
+        """
+        Mesure une étape entrelacée avec l'étape en cours, comme le
+        parsing du CSV consommé ligne à ligne par le chargement : seul le
+        temps passé à produire les éléments lui est attribué (et retiré
+        de l'étape en cours).
+
+        :return: Générateur des éléments de iterable
+        """
+        record = {'stage': name, 'rows': 0, 'peak_kib': None,
+                  'wall_seconds': 0.0, 'cpu_seconds': 0.0}
+        nested = self._current['_nested'] if self._current else None
+        self.stages.append(record)
+        iterator = iter(iterable)
+        while True:
+            wall, cpu = time.perf_counter(), time.process_time()
+            item = next(iterator, _DONE)
+            wall = time.perf_counter() - wall
+            cpu = time.process_time() - cpu
+            record['wall_seconds'] += wall
+            record['cpu_seconds'] += cpu
+            if nested is not None:
+                nested['wall'] += wall
+                nested['cpu'] += cpu
+            if item is _DONE:
+                record['max_rss_kib'] = max_rss_kib()
+                return
+            record['rows'] += 1
+            yield item
+
+    def get_stage(self, name):
+        """
+        :return: Mesures de l'étape, ou None si elle n'a pas eu lieu
+        """
+        return next((stage for stage in self.stages
+                     if stage['stage'] == name), None)
+
+    def finish(self, status, error=None):
+        """
+        Termine la mesure et, en mode profilage, enregistre et affiche
+        le profil.
+
+        :param status: RUN_SUCCESS, RUN_UNCHANGED ou RUN_FAILED
+        :param error: Message d'erreur d'une synchronisation échouée
+        """
+        self.status = status
+        self.error = error
+        self.wall_seconds = time.perf_counter() - self._start[0]
+        self.cpu_seconds = time.process_time() - self._start[1]
+        self.max_rss_kib = max_rss_kib()
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._report_profile()
+            tracemalloc.stop()
+            self._profiler = None
+
+    def _report_profile(self):
+        stats = pstats.Stats(self._profiler, stream=io.StringIO())
+        if self.profile_dir:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            path = os.path.join(
+                self.profile_dir,
+                "sync_{}.prof".format(self.started_at.replace(":", "")))
+            stats.dump_stats(path)
+            print(f"Profil de la synchronisation enregistré dans {path} "
+                  "(python -m pstats).")
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(PROFILE_TOP)
+        print(stats.stream.getvalue())
+        print("Lignes ayant alloué le plus de mémoire encore utilisée :")
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, cProfile.__file__),
+            tracemalloc.Filter(False, tracemalloc.__file__)))
+        for line in snapshot.statistics('lineno')[:PROFILE_TOP]:
+            print(f"  {line}")
+
+    def as_record(self):
+        """
+        :return: Dictionnaire des colonnes de sync_runs, avec la liste
+        des étapes sous la clé 'stages'
+        """
+        return {
+            'started_at': self.started_at,
+            'status': self.status,
+            'mode': self.counts.get('mode'),
+            'version': self.counts.get('version'),
+            'rows': self.counts.get('rows'),
+            'inserted': self.counts.get('inserted'),
+            'updated': self.counts.get('updated'),
+            'deleted': self.counts.get('deleted'),
+            'wall_seconds': self.wall_seconds,
+            'cpu_seconds': self.cpu_seconds,
+            'max_rss_kib': self.max_rss_kib,
+            'profiled': int(self.profile),
+            'error': self.error,
+            'stages': self.stages,
+        }
+
+
+def _change(value, reference):
+    if value is None or not reference:
+        return ""
+    return f"{(value - reference) / reference * 100:+.0f} %"
+
+
+def _median(runs, key, stage=None):
+    values = []
+    for run in runs:
+        source = run
+        if stage is not None:
+            source = next((s for s in run['stages']
+                           if s['stage'] == stage), None)
+        if source is not None and source.get(key) is not None:
+            values.append(source[key])
+    return statistics.median(values) if values else None
+
+
+def _number(value, digits=2):
+    if value is None:
+        return "-"
+    return f"{value:.{digits}f}" if isinstance(value, float) else str(value)
+
+
+def format_report(runs):
+    """
+    Compare la dernière synchronisation à la médiane des précédentes de
+    même état (une synchronisation sans changement est bien plus courte
+    qu'un chargement) et profilées ou non comme elle.
+
+    :param runs: Synchronisations, la plus récente en premier (voir
+    Database.get_sync_runs())
+    :return: Texte du rapport
+    """
+    if not runs:
+        return "Aucune synchronisation enregistrée."
+    latest = runs[0]
+    history = [run for run in runs[1:]
+               if run['status'] == latest['status']
+               and run['profiled'] == latest['profiled']]
+    lines = [
+        f"Synchronisation n° {latest['id']} du {latest['started_at']} : "
+        f"{latest['status']}"
+        + (f" ({latest['error']})" if latest['error'] else ""),
+        f"Lignes : {_number(latest['rows'])} (ajoutées "
+        f"{_number(latest['inserted'])}, modifiées "
+        f"{_number(latest['updated'])}, retirées "
+        f"{_number(latest['deleted'])}), version "
+        f"{_number(latest['version'])}",
+        f"Comparaison avec la médiane de {len(history)} synchronisation(s) "
+        f"précédente(s) à l'état '{latest['status']}'"
+        + (", profilées." if latest['profiled'] else "."),
+        "",
+        f"{'Étape':<12}{'Durée (s)':>11}{'Médiane':>10}{'Écart':>9}"
+        f"{'CPU (s)':>10}{'Médiane':>10}{'RSS (Kio)':>12}{'Pic (Kio)':>11}"
+        f"{'Lignes':>10}",
+    ]
+    rows = [(stage['stage'], stage) for stage in latest['stages']]
+    rows.append(("total", latest))
+    for name, measure in rows:
+        stage = None if name == "total" else name
+        wall = _median(history, 'wall_seconds', stage)
+        cpu = _median(history, 'cpu_seconds', stage)
+        lines.append(
+            f"{name:<12}{_number(measure['wall_seconds']):>11}"
+            f"{_number(wall):>10}"
+            f"{_change(measure['wall_seconds'], wall):>9}"
+            f"{_number(measure['cpu_seconds']):>10}{_number(cpu):>10}"
+            f"{_number(measure['max_rss_kib']):>12}"
+            f"{_number(measure.get('peak_kib')):>11}"
+            f"{_number(measure.get('rows')):>10}")
+    return "\n".join(lines)
@@ -0,0 +1,41 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+# config.yaml des tests : chemins relatifs au dossier de travail
+# temporaire. Le port SMTP 1 est fermé : un envoi échoue sans délai.
+TEST_CONFIG = """\
+email_recipient: "inspection@example.com"
+smtp_settings:
+  host: "127.0.0.1"
+  port: 1
+  use_tls: false
+sync_mode: "incremental"
+metrics:
+  enabled: false
+"""
+
+SECRET_ENV_VARS = ("SMTP_USERNAME", "SMTP_PASSWORD", "TWITTER_API_KEY",
+                   "TWITTER_API_SECRET", "TWITTER_ACCESS_TOKEN",
+                   "TWITTER_ACCESS_TOKEN_SECRET")
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """
+    Dossier de travail temporaire contenant db/db.sql et config.yaml :
+    la base, la copie du CSV, son cache, les verrous et les artefacts
+    y sont créés.
+    """
+    os.makedirs(tmp_path / "db")
+    shutil.copy(os.path.join(REPO_DIR, "db", "db.sql"), tmp_path / "db")
+    (tmp_path / "config.yaml").write_text(TEST_CONFIG, encoding='utf-8')
+    for name in SECRET_ENV_VARS:
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
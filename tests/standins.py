@@ -0,0 +1,161 @@
+"""
+Services de remplacement des tests : CSV du jeu de données, serveur
+HTTP de la Ville, gestionnaire du serveur SMTP (aiosmtpd) et client
+Twitter.
+"""
+import csv
+import io
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from database import VIOLATION_COLUMNS
+
+
+def make_violation(id_poursuite, **fields):
+    """
+    :return: Ligne du CSV de la contravention id_poursuite
+    """
+    row = {
+        'id_poursuite': id_poursuite,
+        'business_id': 1000 + id_poursuite,
+        'date': '20240105',
+        'description': "Les lieux n'étaient pas propres.",
+        'adresse': f"{id_poursuite} Rue Ontario",
+        'date_jugement': '20240301',
+        'etablissement': f"Restaurant {id_poursuite}",
+        'montant': 500,
+        'proprietaire': f"Propriétaire {id_poursuite}",
+        'ville': 'Montréal',
+        'statut': 'Ouvert',
+        'date_statut': '20240101',
+        'categorie': 'Restaurant',
+    }
+    row.update(fields)
+    return row
+
+
+def csv_content(violation_ids):
+    """
+    :return: Contenu (bytes) d'un CSV au format du jeu de données de la
+    Ville, avec une contravention par ID
+    """
+    output = io.StringIO(newline='')
+    writer = csv.DictWriter(output, fieldnames=VIOLATION_COLUMNS)
+    writer.writeheader()
+    for id_poursuite in violation_ids:
+        writer.writerow(make_violation(id_poursuite))
+    return output.getvalue().encode('utf-8')
+
+
+def write_csv(path, violation_ids):
+    """
+    Écrit un CSV de remplacement du jeu de données (voir --source).
+
+    :return: Chemin du fichier
+    """
+    with open(path, 'wb') as f:
+        f.write(csv_content(violation_ids))
+    return str(path)
+
+
+class DatasetServer:
+    """
+    Serveur HTTP local publiant un CSV comme data.montreal.ca : ETag et
+    Last-Modified, 304 si If-None-Match correspond à l'ETag courant.
+    Chaque requête est enregistrée dans `requests` (en-têtes reçus et
+    statut de la réponse).
+    """
+
+    def __init__(self, body, etag, last_modified):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.requests = []
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0),
+                                           self._handler_class())
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/violations.csv"
+
+    def _handler_class(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status = 200
+                if self.headers.get('If-None-Match') == standin.etag:
+                    status = 304
+                standin.requests.append({
+                    'if_none_match': self.headers.get('If-None-Match'),
+                    'if_modified_since':
+                        self.headers.get('If-Modified-Since'),
+                    'status': status,
+                })
+                self.send_response(status)
+                self.send_header('ETag', standin.etag)
+                self.send_header('Last-Modified', standin.last_modified)
+                if status == 304:
+                    self.end_headers()
+                    return
+                self.send_header('Content-Type', 'text/csv')
+                self.send_header('Content-Length', str(len(standin.body)))
+                self.end_headers()
+                self.wfile.write(standin.body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class RecordingSmtpHandler:
+    """
+    Gestionnaire aiosmtpd qui conserve les messages reçus et l'adresse
+    du client de chaque message (une adresse par connexion). Si `fail`
+    est vrai, les messages sont refusés (erreur temporaire 451).
+    """
+
+    def __init__(self):
+        self.messages = []
+        self.peers = []
+        self.fail = False
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.fail:
+            return "451 Service temporairement indisponible"
+        self.messages.append(envelope.content.decode('utf-8'))
+        self.peers.append(session.peer)
+        return "250 Message accepted for delivery"
+
+
+class FakeTwitterClient:
+    """
+    Remplace tweepy.Client : conserve les tweets publiés, ou lève une
+    exception si `fail` est vrai.
+    """
+
+    class Response:
+        def __init__(self, text):
+            self.data = {'id': "1", 'text': text}
+
+    def __init__(self):
+        self.tweets = []
+        self.fail = False
+
+    def create_tweet(self, text):
+        if self.fail:
+            raise ConnectionError("API Twitter indisponible")
+        self.tweets.append(text)
+        return self.Response(text)
@@ -0,0 +1,39 @@
+import pytest
+
+import data_sync
+from app import create_app
+from standins import write_csv
+
+
+@pytest.fixture
+def client(workdir):
+    data_sync.update_db(
+        source=write_csv(workdir / "violations.csv", [1, 2, 3]))
+    app = create_app({'sync': {'run_in_web': False},
+                      'events': {'enabled': False}})
+    return app.test_client()
+
+
+def test_if_none_match_uses_weak_comparison(client):
+    url = '/contrevenants?du=2024-01-01&au=2024-12-31'
+    response = client.get(url)
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    assert etag.startswith('"')
+
+    assert client.get(url, headers={'If-None-Match': etag}) \
+        .status_code == 304
+    # ETag affaibli par un proxy qui compresse les réponses
+    weak = client.get(url, headers={'If-None-Match': f"W/{etag}"})
+    assert weak.status_code == 304
+    assert weak.headers['ETag'] == etag
+    assert client.get(url, headers={'If-None-Match': 'W/"autre"'}) \
+        .status_code == 200
+
+
+@pytest.mark.parametrize('cursor', ["%%%", "bm90LWpzb24", "WzFd"])
+def test_invalid_cursor_error_hides_decoder_details(client, cursor):
+    response = client.get('/contrevenants?du=2024-01-01&au=2024-12-31'
+                          f'&limit=2&after={cursor}')
+    assert response.status_code == 400
+    assert response.get_json() == {'error': "Curseur invalide."}
@@ -0,0 +1,116 @@
+import hashlib
+import json
+import sqlite3
+
+import pytest
+
+import data_sync
+from database import Database
+from standins import DatasetServer, csv_content
+
+LAST_MODIFIED = "Thu, 15 May 2025 04:00:00 GMT"
+
+
+@pytest.fixture
+def load_calls(monkeypatch):
+    """
+    Enregistre les appels au parsing du CSV et aux deux chargements de
+    la table violations.
+    """
+    calls = []
+
+    def spy(name, function):
+        def wrapper(*args, **kwargs):
+            calls.append(name)
+            return function(*args, **kwargs)
+        return wrapper
+
+    monkeypatch.setattr(data_sync, 'parse_csv_content',
+                        spy('parse', data_sync.parse_csv_content))
+    for name in ('sync_violations', 'insert_data_to_db'):
+        monkeypatch.setattr(Database, name,
+                            spy(name, getattr(Database, name)))
+    monkeypatch.setenv('NO_PROXY', '127.0.0.1')
+    return calls
+
+
+def read_dataset_cache():
+    with open(data_sync.DATASET_CACHE_FILEPATH) as f:
+        return json.load(f)
+
+
+def database_snapshot():
+    """
+    :return: Contenu des tables écrites par un chargement
+    """
+    connection = sqlite3.connect("db/database.db")
+    try:
+        return {table: connection.execute(f"SELECT * FROM {table}")
+                .fetchall()
+                for table in ('violations', 'dataset_versions',
+                              'dataset_changes', 'notification_outbox')}
+    finally:
+        connection.close()
+
+
+def sync_statuses():
+    db = Database.for_writing()
+    try:
+        return [run['status'] for run in reversed(db.get_sync_runs(10))]
+    finally:
+        db.close_connection()
+
+
+def test_unchanged_dataset_is_neither_parsed_nor_written(workdir,
+                                                         load_calls):
+    body = csv_content([1, 2, 3])
+    checksum = hashlib.sha256(body).hexdigest()
+    with DatasetServer(body, '"v1"', LAST_MODIFIED) as server:
+        data_sync.update_db(source=server.url)
+        assert load_calls == ['parse', 'sync_violations']
+        assert read_dataset_cache() == {'etag': '"v1"',
+                                        'last_modified': LAST_MODIFIED,
+                                        'sha256': checksum}
+        loaded = database_snapshot()
+        assert [row[0] for row in loaded['violations']] == [1, 2, 3]
+
+        # 304 : les validateurs du cache sont envoyés
+        load_calls.clear()
+        data_sync.update_db(source=server.url)
+        assert server.requests[-1] == {'if_none_match': '"v1"',
+                                       'if_modified_since': LAST_MODIFIED,
+                                       'status': 304}
+        assert load_calls == []
+        assert database_snapshot() == loaded
+
+        # Même contenu republié sous un nouvel ETag : la somme de
+        # contrôle évite le chargement, le cache prend le nouvel ETag
+        server.etag = '"v2"'
+        data_sync.update_db(source=server.url)
+        assert server.requests[-1]['status'] == 200
+        assert load_calls == []
+        assert database_snapshot() == loaded
+        assert read_dataset_cache() == {'etag': '"v2"',
+                                        'last_modified': LAST_MODIFIED,
+                                        'sha256': checksum}
+
+    with open(data_sync.DATASET_FILEPATH, 'rb') as f:
+        assert f.read() == body
+    assert sync_statuses() == ['success', 'unchanged', 'unchanged']
+
+
+def test_cache_is_saved_only_after_a_successful_load(workdir, load_calls):
+    with DatasetServer(b"colonne\nvaleur\n", '"v1"',
+                       LAST_MODIFIED) as server:
+        data_sync.update_db(source=server.url)
+        assert not (workdir / data_sync.DATASET_CACHE_FILEPATH).exists()
+
+        # Le téléchargement suivant n'est pas conditionnel
+        server.body = csv_content([1, 2])
+        data_sync.update_db(source=server.url)
+        assert server.requests[-1]['if_none_match'] is None
+        assert server.requests[-1]['status'] == 200
+
+    assert read_dataset_cache()['etag'] == '"v1"'
+    assert [row[0] for row in database_snapshot()['violations']] == [1, 2]
+    assert sync_statuses() == ['failed', 'success']
@@ -0,0 +1,201 @@
+import json
+import os
+import queue
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+from app import create_app
+from events import EVENT_NEW_VIOLATIONS, EVENT_RESYNC, EventBroadcaster
+from events import load_events_settings
+from standins import write_csv
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EVENT_TIMEOUT = 10
+
+
+def sync(workdir, name, violation_ids):
+    """
+    Synchronise la base avec un CSV local, comme un processus de
+    synchronisation dédié : python data_sync.py --source <fichier.csv>
+    """
+    path = write_csv(workdir / f"{name}.csv", violation_ids)
+    subprocess.run([sys.executable, os.path.join(REPO_DIR, "data_sync.py"),
+                    "--source", path],
+                   cwd=workdir, check=True, capture_output=True)
+
+
+def parse_event(text):
+    """
+    :return: Dictionnaire 'id', 'event' et 'data' d'un événement
+    Server-Sent Events
+    """
+    fields = dict(line.split(": ", 1) for line in text.strip().split("\n"))
+    return {'id': int(fields['id']), 'event': fields['event'],
+            'data': json.loads(fields['data'])}
+
+
+def drain(subscriber):
+    """
+    :return: Événements déjà dans la file d'un abonné
+    """
+    events = []
+    while True:
+        try:
+            events.append(parse_event(subscriber.get_nowait()))
+        except queue.Empty:
+            return events
+
+
+def violation_ids(event):
+    return [violation['id_poursuite']
+            for violation in event['data']['violations']]
+
+
+@pytest.fixture
+def synced(workdir):
+    """
+    Importation initiale (version 1, non diffusée), puis deux versions
+    qui ajoutent des violations : 4 et 5 (version 2), puis 6 (version 3).
+    """
+    sync(workdir, "initial", [1, 2, 3])
+    sync(workdir, "v2", [1, 2, 3, 4, 5])
+    sync(workdir, "v3", [1, 2, 3, 4, 5, 6])
+    return workdir
+
+
+@pytest.fixture
+def make_broadcaster():
+    broadcasters = []
+
+    def make(**settings):
+        settings = load_events_settings({'events': settings})
+        broadcaster = EventBroadcaster("db/database.db", settings)
+        broadcasters.append(broadcaster)
+        return broadcaster
+
+    yield make
+    for broadcaster in broadcasters:
+        broadcaster.stop(timeout=EVENT_TIMEOUT)
+
+
+def test_reconnecting_clients_receive_missed_events(synced,
+                                                    make_broadcaster):
+    broadcaster = make_broadcaster()
+    new_client = broadcaster.subscribe()
+    assert drain(new_client) == []
+
+    reconnected = broadcaster.subscribe(last_event_id=1)
+    missed = drain(reconnected)
+    assert [(event['id'], event['event']) for event in missed] == \
+        [(2, EVENT_NEW_VIOLATIONS), (3, EVENT_NEW_VIOLATIONS)]
+    assert [violation_ids(event) for event in missed] == [[4, 5], [6]]
+    assert [event['data']['nombre'] for event in missed] == [2, 1]
+
+    assert [event['id'] for event in
+            drain(broadcaster.subscribe(last_event_id=2))] == [3]
+    assert drain(broadcaster.subscribe(last_event_id=3)) == []
+
+    # Une nouvelle version est diffusée à tous les abonnés
+    sync(synced, "v4", [1, 2, 3, 4, 5, 6, 7])
+    broadcaster.wake()
+    for subscriber in (new_client, reconnected):
+        event = parse_event(subscriber.get(timeout=EVENT_TIMEOUT))
+        assert event['id'] == 4
+        assert violation_ids(event) == [7]
+
+
+def test_evicted_history_sends_a_resynchronisation(synced,
+                                                   make_broadcaster):
+    broadcaster = make_broadcaster(history=1)
+    assert [event['id'] for event in
+            drain(broadcaster.subscribe(last_event_id=2))] == [3]
+    resync = drain(broadcaster.subscribe(last_event_id=1))
+    assert [(event['id'], event['event']) for event in resync] == \
+        [(3, EVENT_RESYNC)]
+
+    # La version 4 évince la version 3 de l'historique
+    live = broadcaster.subscribe()
+    sync(synced, "v4", [1, 2, 3, 4, 5, 6, 7])
+    broadcaster.wake()
+    assert parse_event(live.get(timeout=EVENT_TIMEOUT))['id'] == 4
+    assert [(event['id'], event['event']) for event in
+            drain(broadcaster.subscribe(last_event_id=2))] == \
+        [(4, EVENT_RESYNC)]
+    assert [event['id'] for event in
+            drain(broadcaster.subscribe(last_event_id=3))] == [4]
+
+
+def test_deleted_violations_are_not_announced(synced, make_broadcaster):
+    # La violation 6 de la version 3 est retirée par la version 4
+    sync(synced, "v4", [1, 2, 3, 4, 5])
+    broadcaster = make_broadcaster()
+    assert [event['id'] for event in
+            drain(broadcaster.subscribe(last_event_id=1))] == [2]
+
+
+def test_event_stream_route(synced):
+    app = create_app({'sync': {'run_in_web': False},
+                      'events': {'max_subscribers': 1}})
+    client = app.test_client()
+    try:
+        response = client.get('/evenements',
+                              headers={'Last-Event-ID': "2"},
+                              buffered=False)
+        assert response.status_code == 200
+        assert response.mimetype == "text/event-stream"
+        stream = iter(response.response)
+        assert next(stream).startswith(b"retry: ")
+        event = parse_event(next(stream).decode('utf-8'))
+        assert (event['id'], violation_ids(event)) == (3, [6])
+
+        # Nombre maximal d'abonnés atteint
+        refused = client.get('/evenements')
+        assert refused.status_code == 503
+        assert refused.headers['Retry-After']
+
+        # La fermeture de la connexion désinscrit l'abonné
+        response.close()
+        broadcaster = app.extensions['event_broadcaster']
+        assert broadcaster.subscriber_count() == 0
+    finally:
+        app.extensions['event_broadcaster'].stop(timeout=EVENT_TIMEOUT)
+
+
+def copy_database(source, destination):
+    """Copie une base SQLite en place (API de sauvegarde de SQLite)."""
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(destination)
+    try:
+        src.backup(dst)
+    finally:
+        src.close()
+        dst.close()
+
+
+def test_restored_database_resets_the_history(workdir, make_broadcaster):
+    sync(workdir, "initial", [1, 2, 3])
+    sync(workdir, "v2", [1, 2, 3, 4, 5])
+    copy_database("db/database.db", "db/backup.db")
+    sync(workdir, "v3", [1, 2, 3, 4, 5, 6])
+    broadcaster = make_broadcaster()
+    live = broadcaster.subscribe()
+
+    # Restauration de la sauvegarde : la version revient de 3 à 2
+    copy_database("db/backup.db", "db/database.db")
+    broadcaster.wake()
+    event = parse_event(live.get(timeout=EVENT_TIMEOUT))
+    assert (event['id'], event['event']) == (2, EVENT_RESYNC)
+    assert [(event['id'], event['event']) for event in
+            drain(broadcaster.subscribe(last_event_id=3))] == \
+        [(2, EVENT_RESYNC)]
+    assert [event['id'] for event in
+            drain(broadcaster.subscribe(last_event_id=1))] == [2]
+
+    # Les versions suivantes sont de nouveau diffusées
+    sync(workdir, "v3-bis", [1, 2, 3, 4, 5, 8])
+    broadcaster.wake()
+    event = parse_event(live.get(timeout=EVENT_TIMEOUT))
+    assert (event['id'], violation_ids(event)) == (3, [8])
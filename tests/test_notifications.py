@@ -0,0 +1,188 @@
+import socket
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import data_sync
+from database import Database, load_database_settings
+from notifications import NOTIFICATION_CHANNELS, OutboxWorker
+from standins import FakeTwitterClient, RecordingSmtpHandler, write_csv
+
+OUTBOX_QUERY = """
+    SELECT channel, version, violation_ids, status, attempts,
+           next_attempt_at, last_error
+    FROM notification_outbox ORDER BY id
+"""
+
+
+def sync(workdir, name, violation_ids):
+    """Synchronise la base avec un CSV local (voir --source)."""
+    data_sync.update_db(
+        source=write_csv(workdir / f"{name}.csv", violation_ids))
+
+
+def query(sql, params=()):
+    connection = sqlite3.connect("db/database.db")
+    connection.row_factory = sqlite3.Row
+    try:
+        return [dict(row) for row in connection.execute(sql, params)]
+    finally:
+        connection.close()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    """
+    Serveur SMTP local (aiosmtpd) ; retourne son gestionnaire, dont
+    l'attribut port donne le port d'écoute.
+    """
+    controller_module = pytest.importorskip("aiosmtpd.controller")
+    handler = RecordingSmtpHandler()
+    handler.port = free_port()
+    controller = controller_module.Controller(handler, hostname='127.0.0.1',
+                                              port=handler.port)
+    controller.start()
+    yield handler
+    controller.stop()
+
+
+@pytest.fixture
+def pending_notifications(workdir):
+    """
+    Importation initiale puis trois synchronisations qui ajoutent
+    chacune deux violations : trois notifications en file par canal.
+    """
+    sync(workdir, "initial", [1, 2, 3])
+    for last_id in (5, 7, 9):
+        sync(workdir, f"v{last_id}", range(1, last_id + 1))
+    return query(OUTBOX_QUERY)
+
+
+def make_worker(smtp_server, twitter_client, **settings):
+    config = {
+        'email_recipient': "inspection@example.com",
+        'smtp_settings': {'host': "127.0.0.1", 'port': smtp_server.port,
+                          'use_tls': False},
+        'notifications': settings,
+    }
+    return OutboxWorker(config, load_database_settings(),
+                        twitter_client=twitter_client)
+
+
+def test_sync_enqueues_notifications_in_the_load_transaction(workdir,
+                                                             monkeypatch):
+    sync(workdir, "initial", [1, 2, 3])
+    # Importation initiale : aucune notification
+    assert query(OUTBOX_QUERY) == []
+
+    sync(workdir, "v2", [1, 2, 3, 4, 5])
+    version = query("SELECT MAX(version) AS v FROM dataset_versions")[0]['v']
+    outbox = query(OUTBOX_QUERY)
+    assert [row['channel'] for row in outbox] == list(NOTIFICATION_CHANNELS)
+    for row in outbox:
+        assert row['version'] == version
+        assert row['violation_ids'] == "[4, 5]"
+        assert (row['status'], row['attempts']) == ("pending", 0)
+
+    # Un échec après la mise en file annule aussi le chargement
+    enqueue = Database._enqueue_notifications
+
+    def enqueue_then_fail(cursor, changes, channels):
+        enqueue(cursor, changes, channels)
+        raise sqlite3.OperationalError("disque plein")
+
+    monkeypatch.setattr(Database, '_enqueue_notifications',
+                        staticmethod(enqueue_then_fail))
+    before = {table: query(f"SELECT * FROM {table}")
+              for table in ('violations', 'dataset_versions',
+                            'notification_outbox')}
+    sync(workdir, "v3", [1, 2, 3, 4, 5, 6])
+    assert {table: query(f"SELECT * FROM {table}")
+            for table in before} == before
+
+
+def test_batches_are_sent_over_one_smtp_connection(pending_notifications,
+                                                   smtp_server):
+    twitter = FakeTwitterClient()
+    worker = make_worker(smtp_server, twitter, batch_size=2)
+    assert worker.deliver_pending() == 6
+
+    # Un lot par version (email et tweet) : trois emails, une connexion
+    assert len(smtp_server.messages) == 3
+    assert len(set(smtp_server.peers)) == 1
+    assert "Restaurant 4" in smtp_server.messages[0]
+    assert "Restaurant 9" in smtp_server.messages[2]
+    assert len(twitter.tweets) == 3
+    assert {(row['status'], row['attempts'])
+            for row in query(OUTBOX_QUERY)} == {("sent", 1)}
+
+    # Rien n'est dû : aucune nouvelle connexion
+    assert worker.deliver_pending() == 0
+    assert len(smtp_server.messages) == 3
+
+
+def test_due_notifications_of_a_channel_are_grouped(pending_notifications,
+                                                    smtp_server):
+    twitter = FakeTwitterClient()
+    worker = make_worker(smtp_server, twitter)
+    assert worker.deliver_pending() == 6
+
+    assert len(smtp_server.messages) == 1
+    assert "6 nouvelle(s) contravention(s)" in smtp_server.messages[0]
+    assert twitter.tweets == [
+        "Nouvelle(s) contravention(s) détectées(s) pour : Restaurant 4, "
+        "Restaurant 5, Restaurant 6, Restaurant 7, Restaurant 8, "
+        "Restaurant 9"]
+
+
+def test_failed_deliveries_are_retried_then_abandoned(workdir, smtp_server):
+    sync(workdir, "initial", [1, 2, 3])
+    sync(workdir, "v2", [1, 2, 3, 4])
+    smtp_server.fail = True
+    twitter = FakeTwitterClient()
+    twitter.fail = True
+    worker = make_worker(smtp_server, twitter, max_attempts=3,
+                         retry_base_delay=60, retry_max_delay=100)
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+
+    def attempts():
+        return {row['channel']: (row['status'], row['attempts'],
+                                 row['next_attempt_at'])
+                for row in query(OUTBOX_QUERY)}
+
+    def at(seconds):
+        return (now + timedelta(seconds=seconds)).isoformat()
+
+    assert worker.deliver_pending(now) == 0
+    assert attempts() == {'email': ("pending", 1, at(60)),
+                          'twitter': ("pending", 1, at(60))}
+    assert all(row['last_error'] for row in query(OUTBOX_QUERY))
+
+    # Pas encore dû
+    assert worker.deliver_pending(now + timedelta(seconds=59)) == 0
+    assert attempts()['email'] == ("pending", 1, at(60))
+
+    # Délai doublé, plafonné à retry_max_delay
+    assert worker.deliver_pending(now + timedelta(seconds=60)) == 0
+    assert attempts() == {'email': ("pending", 2, at(160)),
+                          'twitter': ("pending", 2, at(160))}
+
+    # Troisième tentative : Twitter répond, l'email est abandonné
+    twitter.fail = False
+    assert worker.deliver_pending(now + timedelta(seconds=160)) == 1
+    assert attempts()['email'][:2] == ("failed", 3)
+    assert attempts()['twitter'][:2] == ("sent", 3)
+    assert twitter.tweets == [
+        "Nouvelle(s) contravention(s) détectées(s) pour : Restaurant 4"]
+
+    # Une notification abandonnée n'est plus retentée
+    smtp_server.fail = False
+    assert worker.deliver_pending(now + timedelta(days=1)) == 0
+    assert smtp_server.messages == []
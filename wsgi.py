@@ -0,0 +1,4 @@
+from app import create_app
+
+# Point d'entrée des serveurs WSGI (gunicorn wsgi:app, PythonAnywhere)
+app = create_app()